@@ -1,14 +1,72 @@
 import os.path
+import time
 from enum import Enum
-from PySide6.QtCore import QDateTime
+from PySide6.QtCore import QAbstractTableModel, QDateTime, QModelIndex, Qt, QTimer
 from PySide6.QtWidgets import QDialog, QPushButton, QVBoxLayout, QGroupBox, QLabel, QTextEdit, QHBoxLayout, QComboBox, \
-    QLineEdit, QRadioButton, QCheckBox, QFileDialog
+    QLineEdit, QRadioButton, QCheckBox, QFileDialog, QProgressBar, QMessageBox, QTableView, QHeaderView
 from AppFile import singleton
-from AppFile.Utility import fileUtility
+from AppFile.Utility import fileUtility, tagIndex
 from AppFile.Utility.exportUtility import Exporter
+from AppFile.Utility.exportWatcher import ExportWatcher
+from AppFile.Utility.tagFilter import FilterSyntaxError, compile_filter
+from AppFile.Utility.workerUtility import Worker
 
 MetaRule = Enum('MetaRule', ['NONE', 'NOTES', 'ALL'])
 
+# Milliseconds the filter has to stay unchanged before the preview is planned again
+PREVIEW_DELAY_MS = 150
+# Seconds the folder listings of the preview are reused, a later plan reads the source folder again
+LISTING_CACHE_SECONDS = 5
+
+
+class ManifestModel(QAbstractTableModel):
+    """
+    Rows of an export manifest, the included files in export order followed by the excluded items
+    """
+
+    HEADERS = ('File', 'Size', 'Status')
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.source_dir = ''
+        self.files = []
+        self.excluded = []
+
+    def set_manifest(self, manifest, source_dir):
+        self.beginResetModel()
+        self.source_dir = source_dir
+        self.files = manifest.files if manifest is not None else []
+        self.excluded = manifest.excluded if manifest is not None else []
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.files) + len(self.excluded)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+
+        row = index.row()
+        if row < len(self.files):
+            path, size = self.files[row]
+            value = ('{:,}'.format(size), 'included')[index.column() - 1] if index.column() else path
+        else:
+            path, rule = self.excluded[row - len(self.files)]
+            value = ('', 'excluded: %s' % rule)[index.column() - 1] if index.column() else path
+
+        if index.column() == 0:
+            return os.path.relpath(value, self.source_dir)
+        return value
+
 
 class AdvancedExportMenu(QDialog):
     def __init__(self):
@@ -24,6 +82,8 @@ class AdvancedExportMenu(QDialog):
         self.file_name = 'export_' + QDateTime.currentDateTime().toString('MM_dd_HHmm') + '.txt'
         self.meta_rule = MetaRule.NONE
         self.filter_rule = ''
+        self.worker = None
+        self.close_when_stopped = False
 
         directory_frame = QGroupBox('Directory')
         ordering_frame = QGroupBox('Ordering')
@@ -92,14 +152,50 @@ class AdvancedExportMenu(QDialog):
         v_filter.addWidget(self.filter_rule_edit)
         filer_frame.setLayout(v_filter)
 
+        # Preview
+        preview_frame = QGroupBox('Preview')
+        v_preview = QVBoxLayout()
+        self.preview_label = QLabel()
+        self.preview_model = ManifestModel(self)
+        self.preview_view = QTableView()
+        self.preview_view.setModel(self.preview_model)
+        self.preview_view.verticalHeader().hide()
+        self.preview_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        v_preview.addWidget(self.preview_label)
+        v_preview.addWidget(self.preview_view)
+        preview_frame.setLayout(v_preview)
+
+        # Folder listings of the source path, a changed filter is planned from them without reading the disk
+        self.listing_cache = {}
+        self.listing_time = 0.0
+        self.plan_worker = None
+        self.plan_pending = False
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DELAY_MS)
+        self.preview_timer.timeout.connect(self.start_plan)
+        singleton.SingletonMainWin().file_operations.job_finished.connect(self.source_files_changed)
+
+        # Options
+        self.incremental_box = QCheckBox('Reuse output of unchanged folders from the last export')
+        self.force_box = QCheckBox('Export even if nothing changed since the last export')
+
+        # Progress
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+
         # Buttons
         h_button = QHBoxLayout()
-        cancel_button = QPushButton('Cancel')
-        cancel_button.clicked.connect(self.close)
-        h_button.addWidget(cancel_button)
-        export_button = QPushButton('Export')
-        export_button.clicked.connect(self.call_export)
-        h_button.addWidget(export_button)
+        self.cancel_button = QPushButton('Cancel')
+        self.cancel_button.clicked.connect(self.cancel_clicked)
+        h_button.addWidget(self.cancel_button)
+        self.export_button = QPushButton('Export')
+        self.export_button.clicked.connect(self.call_export)
+        h_button.addWidget(self.export_button)
+        self.watch_button = QPushButton('Export and watch')
+        self.watch_button.setToolTip('Keep the export current while the source folder changes')
+        self.watch_button.clicked.connect(self.call_watch)
+        h_button.addWidget(self.watch_button)
 
         # Display Frame
         v_layout = QVBoxLayout()
@@ -107,9 +203,15 @@ class AdvancedExportMenu(QDialog):
         # v_layout.addWidget(ordering_frame)
         # v_layout.addWidget(content_frame)
         v_layout.addWidget(filer_frame)
+        v_layout.addWidget(preview_frame)
+        v_layout.addWidget(self.incremental_box)
+        v_layout.addWidget(self.force_box)
+        v_layout.addWidget(self.progress_bar)
         v_layout.addLayout(h_button)
         self.setLayout(v_layout)
 
+        self.preview_timer.start()
+
     # Function Definition
     def source_path_option_changed(self):
         index = self.source_path_option.currentIndex()
@@ -123,6 +225,7 @@ class AdvancedExportMenu(QDialog):
                 self.source_path_button.setEnabled(True)
 
         self.source_path_label.setText('Exporting from path: %s' % self.source_path)
+        self.source_path_changed()
 
     def call_custom_source_path(self):
         file_dialog = QFileDialog()
@@ -131,6 +234,7 @@ class AdvancedExportMenu(QDialog):
         if path:
             self.source_path = path
             self.source_path_label.setText('Exporting from path: %s' % self.source_path)
+            self.source_path_changed()
 
     def call_custom_dest_path(self):
         file_dialog = QFileDialog()
@@ -157,12 +261,173 @@ class AdvancedExportMenu(QDialog):
 
     def set_filter_rule(self):
         self.filter_rule = self.filter_rule_edit.text()
-        print(self.filter_rule)
+        self.preview_timer.start()
+
+    def source_path_changed(self):
+        self.listing_cache = {}
+        self.preview_timer.start()
+
+    def source_files_changed(self, job):
+        # A move, delete, import or tag edit may have changed the source folder
+        self.source_path_changed()
+
+    def start_plan(self):
+        """
+        Plan the export on a background thread, one plan at a time with the latest filter and source path
+        """
+
+        if self.plan_worker is not None:
+            self.plan_pending = True
+            return
+
+        try:
+            tag_filter = compile_filter(self.filter_rule)
+        except FilterSyntaxError as e:
+            self.preview_label.setText('Invalid filter rule: %s' % e)
+            return
+
+        source_path = self.source_path
+        if not os.path.isdir(source_path):
+            self.preview_model.set_manifest(None, source_path)
+            self.preview_label.setText('No source directory')
+            return
+
+        target_file = os.path.join(self.dest_path, self.file_name)
+        tag_index = tagIndex.index_for(source_path)
+        now = time.monotonic()
+        if now - self.listing_time > LISTING_CACHE_SECONDS:
+            # Files may have changed outside the application since the listings were read
+            self.listing_cache = {}
+        if not self.listing_cache:
+            self.listing_time = now
+        listing_cache = self.listing_cache
+
+        def plan_task(progress, cancel_event):
+            exporter = Exporter(source_path, target_file, tag_filter, tag_index=tag_index, cancel_event=cancel_event)
+            return exporter.plan(listing_cache)[0]
+
+        self.plan_worker = Worker(plan_task)
+        self.plan_worker.signals.finished.connect(lambda manifest: self.plan_finished(manifest, source_path))
+        self.plan_worker.signals.failed.connect(self.plan_failed)
+        self.plan_worker.signals.cancelled.connect(self.plan_stopped)
+        if not listing_cache:
+            self.preview_label.setText('Reading %s...' % source_path)
+        self.plan_worker.start()
+
+    def plan_finished(self, manifest, source_path):
+        self.preview_model.set_manifest(manifest, source_path)
+        self.preview_label.setText('%d files, %.1f MB, %d items excluded' % (
+            len(manifest.files), manifest.total_bytes / (1024 * 1024), len(manifest.excluded)))
+        self.plan_stopped()
+
+    def plan_failed(self, message):
+        self.preview_label.setText('Preview failed: %s' % message)
+        self.plan_stopped()
+
+    def plan_stopped(self):
+        self.plan_worker = None
+        if self.plan_pending:
+            self.plan_pending = False
+            self.start_plan()
 
     def call_export(self):
-        if self.filter_rule:
-            filter_list = self.filter_rule.split(',')
+        try:
+            tag_filter = compile_filter(self.filter_rule)
+        except FilterSyntaxError as e:
+            QMessageBox.warning(self, 'Filter Error', 'Invalid filter rule: %s' % e)
+            return
+
+        source_path = self.source_path
+        if not os.path.isdir(source_path):
+            QMessageBox.warning(self, 'Export Error', 'No source directory: %s' % source_path)
+            return
+
+        target_file = os.path.join(self.dest_path, self.file_name)
+        tag_index = tagIndex.index_for(source_path)
+        incremental = self.incremental_box.isChecked()
+        force = self.force_box.isChecked()
+
+        def export_task(progress, cancel_event):
+            exporter = Exporter(source_path, target_file, tag_filter, tag_index=tag_index, incremental=incremental,
+                                force=force, progress_callback=progress, cancel_event=cancel_event)
+            exporter.export()
+            return exporter
+
+        self.worker = Worker(export_task)
+        self.worker.signals.progress.connect(self.export_progress)
+        self.worker.signals.finished.connect(self.export_finished)
+        self.worker.signals.failed.connect(self.export_failed)
+        self.worker.signals.cancelled.connect(self.export_cancelled)
+
+        self.export_button.setEnabled(False)
+        self.cancel_button.setText('Stop export')
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.worker.start()
+
+    def call_watch(self):
+        try:
+            tag_filter = compile_filter(self.filter_rule)
+        except FilterSyntaxError as e:
+            QMessageBox.warning(self, 'Filter Error', 'Invalid filter rule: %s' % e)
+            return
+
+        source_path = self.source_path
+        if not os.path.isdir(source_path):
+            QMessageBox.warning(self, 'Export Error', 'No source directory: %s' % source_path)
+            return
+
+        # Watching updates the export in place from the output of each folder, which is what incremental keeps
+        exporter = Exporter(source_path, os.path.join(self.dest_path, self.file_name), tag_filter,
+                            tag_index=tagIndex.index_for(source_path), incremental=True)
+        singleton.SingletonMainWin().watch_export(ExportWatcher(exporter))
+        self.close()
+
+    def export_progress(self, done, total, bytes_written):
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(done)
+        singleton.SingletonMainWin().show_progress(
+            'Exporting %d of %d files, %.1f MB' % (done, total, bytes_written / (1024 * 1024)), done, total)
+
+    def export_finished(self, exporter):
+        self.worker = None
+        singleton.SingletonMainWin().clear_progress(exporter.stats.summary())
+        self.close()
+
+    def export_failed(self, message):
+        self.export_stopped()
+        singleton.SingletonMainWin().clear_progress('Export failed: %s' % message)
+        QMessageBox.warning(self, 'Export Error', 'Error exporting: %s' % message)
+
+    def export_cancelled(self):
+        self.export_stopped()
+        singleton.SingletonMainWin().clear_progress('Export cancelled')
+
+    def export_stopped(self):
+        self.worker = None
+        self.progress_bar.hide()
+        self.export_button.setEnabled(True)
+        self.cancel_button.setText('Cancel')
+        if self.close_when_stopped:
+            self.close()
+
+    def cancel_clicked(self):
+        if self.worker is not None:
+            self.worker.cancel()
         else:
-            filter_list = []
-        Exporter(self.source_path, os.path.join(self.dest_path, self.file_name), filter_list).export()
-        self.close()
\ No newline at end of file
+            self.close()
+
+    def done(self, result):
+        if self.plan_worker is not None:
+            self.plan_pending = False
+            self.plan_worker.cancel()
+        super().done(result)
+
+    def reject(self):
+        # Closing the dialog stops a running export, the dialog closes once the worker has cleaned up
+        if self.worker is not None:
+            self.close_when_stopped = True
+            self.worker.cancel()
+            return
+
+        super().reject()
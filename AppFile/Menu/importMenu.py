@@ -0,0 +1,56 @@
+import os.path
+from PySide6.QtWidgets import QDialog, QPushButton, QVBoxLayout, QLabel, QHBoxLayout, QLineEdit, QCheckBox
+from AppFile import singleton
+from AppFile.Utility.importUtility import DEFAULT_CONVERT_EXTENSIONS, Importer
+
+
+class ImportMenu(QDialog):
+    def __init__(self, source_path):
+        super().__init__()
+
+        self.setWindowTitle('Import Folder')
+
+        self.source_path = source_path
+        self.target_path = singleton.SingletonCurrentDir().absolutePath()
+
+        v_layout = QVBoxLayout()
+        v_layout.addWidget(QLabel('Importing from path: %s' % self.source_path))
+        v_layout.addWidget(QLabel('Importing to path: %s' %
+                                  os.path.join(self.target_path, os.path.basename(self.source_path))))
+
+        h_convert = QHBoxLayout()
+        self.convert_box = QCheckBox('Convert text files to .txt:')
+        self.convert_box.setChecked(True)
+        self.convert_edit = QLineEdit(', '.join(DEFAULT_CONVERT_EXTENSIONS))
+        self.convert_box.toggled.connect(self.convert_edit.setEnabled)
+        h_convert.addWidget(self.convert_box)
+        h_convert.addWidget(self.convert_edit)
+        v_layout.addLayout(h_convert)
+
+        self.context_config_box = QCheckBox('Make imported folders context folders')
+        v_layout.addWidget(self.context_config_box)
+
+        h_button = QHBoxLayout()
+        cancel_button = QPushButton('Cancel')
+        cancel_button.clicked.connect(self.reject)
+        h_button.addWidget(cancel_button)
+        import_button = QPushButton('Import')
+        import_button.clicked.connect(self.call_import)
+        h_button.addWidget(import_button)
+        v_layout.addLayout(h_button)
+
+        self.setLayout(v_layout)
+
+    def convert_extensions(self):
+        if not self.convert_box.isChecked():
+            return ()
+
+        extensions = (extension.strip() for extension in self.convert_edit.text().split(','))
+        return tuple(extension if extension.startswith('.') else '.' + extension for extension in extensions if extension)
+
+    def call_import(self):
+        # Runs as a job of the file operation queue, progress and cancelling are in the status bar
+        importer = Importer(self.source_path, self.target_path, self.convert_extensions(),
+                            self.context_config_box.isChecked())
+        singleton.SingletonMainWin().file_operations.enqueue(importer)
+        self.accept()
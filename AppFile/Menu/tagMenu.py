@@ -0,0 +1,88 @@
+import os.path
+from PySide6.QtWidgets import QDialog, QPushButton, QVBoxLayout, QLabel, QHBoxLayout, QLineEdit, QCheckBox, \
+    QComboBox, QMessageBox
+from AppFile import singleton
+from AppFile.Utility.tagEditUtility import ADD, REMOVE, RENAME, TagEditor, validate_tag
+
+
+class TagMenu(QDialog):
+    def __init__(self, paths):
+        super().__init__()
+
+        self.setWindowTitle('Edit Tags')
+
+        self.paths = paths
+
+        v_layout = QVBoxLayout()
+        if len(paths) == 1:
+            v_layout.addWidget(QLabel('Editing tags of: %s' % paths[0]))
+        else:
+            v_layout.addWidget(QLabel('Editing tags of %d items in: %s' % (
+                len(paths), os.path.commonpath([os.path.abspath(path) for path in paths]))))
+
+        h_tag = QHBoxLayout()
+        self.operation_box = QComboBox()
+        self.operation_box.addItem('Add tag', ADD)
+        self.operation_box.addItem('Remove tag', REMOVE)
+        self.operation_box.addItem('Rename tag', RENAME)
+        self.operation_box.currentIndexChanged.connect(self.operation_changed)
+        h_tag.addWidget(self.operation_box)
+        self.tag_edit = QLineEdit()
+        self.tag_edit.setPlaceholderText('tag')
+        h_tag.addWidget(self.tag_edit)
+        self.new_tag_label = QLabel('to')
+        h_tag.addWidget(self.new_tag_label)
+        self.new_tag_edit = QLineEdit()
+        self.new_tag_edit.setPlaceholderText('new tag')
+        h_tag.addWidget(self.new_tag_edit)
+        v_layout.addLayout(h_tag)
+
+        self.files_box = QCheckBox('Edit file tags (%Tag)')
+        self.files_box.setChecked(True)
+        v_layout.addWidget(self.files_box)
+        self.folders_box = QCheckBox('Edit context folder tags (.context.ini)')
+        self.folders_box.setChecked(True)
+        v_layout.addWidget(self.folders_box)
+        self.recursive_box = QCheckBox('Include subfolders')
+        self.recursive_box.setChecked(True)
+        v_layout.addWidget(self.recursive_box)
+        self.add_headers_box = QCheckBox('Add a metadata header to files without one')
+        v_layout.addWidget(self.add_headers_box)
+
+        h_button = QHBoxLayout()
+        cancel_button = QPushButton('Cancel')
+        cancel_button.clicked.connect(self.reject)
+        h_button.addWidget(cancel_button)
+        apply_button = QPushButton('Apply')
+        apply_button.clicked.connect(self.call_edit)
+        h_button.addWidget(apply_button)
+        v_layout.addLayout(h_button)
+
+        self.setLayout(v_layout)
+        self.operation_changed()
+
+    def operation(self):
+        return self.operation_box.currentData()
+
+    def operation_changed(self):
+        is_rename = self.operation() == RENAME
+        self.new_tag_label.setEnabled(is_rename)
+        self.new_tag_edit.setEnabled(is_rename)
+        self.add_headers_box.setEnabled(self.operation() == ADD)
+
+    def call_edit(self):
+        try:
+            validate_tag(self.tag_edit.text())
+            if self.operation() == RENAME:
+                validate_tag(self.new_tag_edit.text())
+        except ValueError as e:
+            QMessageBox.warning(self, 'Invalid Tag', str(e))
+            return
+
+        # Runs as a job of the file operation queue, progress and cancelling are in the status bar
+        editor = TagEditor(self.paths, self.operation(), self.tag_edit.text(), self.new_tag_edit.text(),
+                           recursive=self.recursive_box.isChecked(), edit_files=self.files_box.isChecked(),
+                           edit_folders=self.folders_box.isChecked(),
+                           add_headers=self.add_headers_box.isChecked() and self.operation() == ADD)
+        singleton.SingletonMainWin().file_operations.enqueue(editor)
+        self.accept()
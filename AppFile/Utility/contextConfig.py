@@ -0,0 +1,221 @@
+import configparser
+import os
+import stat
+import sys
+import threading
+from typing import Callable
+from AppFile.Utility.metadataCache import TAG_DELIMINATOR
+from AppFile.Utility.tempFileUtility import create_temp_file, remove_temp_file
+
+BRANCH_TAGS = "tags"
+INI_NAME = ".context.ini"
+CONFIG_HEADER = "Context Folder Configuration"
+CONFIG_PRIORITY_NAME = "priority"
+
+
+class ContextRecord:
+    """
+    Parsed .context.ini of one context folder
+    """
+
+    __slots__ = ("priority", "tags", "mtime_ns", "size")
+
+    def __init__(self, priority: int, tags: frozenset[str], mtime_ns: int = 0, size: int = 0):
+        self.priority = priority
+        self.tags = tags
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+
+def parse_context_ini(settings_path: str) -> tuple[int, frozenset[str]]:
+    config = configparser.ConfigParser()
+    try:
+        with open(settings_path, "r") as f:
+            config.read_file(f)
+    except (configparser.Error, UnicodeDecodeError):
+        return 0, frozenset()
+
+    try:
+        priority = config.getint(CONFIG_HEADER, CONFIG_PRIORITY_NAME, fallback=0)
+    except ValueError:
+        # Read like a missing priority rather than failing every walk over the folder
+        priority = 0
+    tags = config.get(CONFIG_HEADER, BRANCH_TAGS, fallback="").split(TAG_DELIMINATOR)
+
+    return priority, frozenset(sys.intern(tag) for tag in map(lambda tag: tag.strip("\n "), tags) if tag)
+
+
+def write_context_ini(directory: str, priority: int = 0, tags: tuple[str, ...] = ()) -> None:
+    """
+    Make directory a context folder, replacing any .context.ini it has through a rename
+    """
+
+    config = configparser.ConfigParser()
+    config[CONFIG_HEADER] = {
+        CONFIG_PRIORITY_NAME: str(priority),
+        BRANCH_TAGS: TAG_DELIMINATOR.join(tags),  # comma separated
+    }
+    settings_path = os.path.join(directory, INI_NAME)
+    fd, temp_path = create_temp_file(settings_path)
+    try:
+        with open(fd, "w") as file:
+            config.write(file)
+        os.replace(temp_path, settings_path)
+    except BaseException:
+        remove_temp_file(temp_path)
+        raise
+
+
+def _is_option_line(line: str) -> bool:
+    # Blank lines, comments and the indented continuation lines of a value are not
+    stripped = line.strip()
+    return bool(stripped) and not line[0].isspace() and not stripped.startswith(("#", ";"))
+
+
+def set_ini_option(text: str, section: str, option: str, value: str) -> str:
+    """
+    Set one option in the text of an ini file, adding it and its section if missing; all other lines, comments
+    included, are kept as they are
+
+    :return: The new text
+    """
+
+    lines = text.splitlines(keepends=True)
+    current = None
+    insert_at = None  # after the last option of section
+    for number, line in enumerate(lines):
+        if not _is_option_line(line):
+            continue
+
+        header = configparser.ConfigParser.SECTCRE.match(line.strip())
+        if header:
+            current = header.group("header")
+            if current == section:
+                insert_at = number + 1
+            continue
+        if current != section:
+            continue
+
+        end = number + 1
+        while end < len(lines) and lines[end].strip() and lines[end][0].isspace():
+            end += 1
+        match = configparser.ConfigParser.OPTCRE.match(line.strip())
+        if match and match.group("option").strip().lower() == option:
+            newline = line[len(line.rstrip("\r\n")):] or "\n"
+            return "".join(lines[:number] + ["%s = %s%s" % (option, value, newline)] + lines[end:])
+        insert_at = end
+
+    if lines and not lines[-1].endswith(("\n", "\r")):
+        lines[-1] += "\n"
+    if insert_at is None:
+        lines.append("[%s]\n" % section)
+        insert_at = len(lines)
+    lines.insert(insert_at, "%s = %s\n" % (option, value))
+    return "".join(lines)
+
+
+def edit_context_tags(directory: str, edit: Callable[[tuple[str, ...]], tuple[str, ...] | None]) -> bool:
+    """
+    Replace the branch tags of a context folder with edit(tags); only the tags line of its .context.ini is
+    rewritten, comments and the other options stay as they are. The file is written to a temporary name and
+    renamed into place
+
+    :param edit: Called with the current tags in file order, returns the new tags or None to leave them
+    :return: Whether the .context.ini was rewritten
+    """
+
+    settings_path = os.path.join(directory, INI_NAME)
+    with open(settings_path, "r", newline="") as f:
+        text = f.read()
+    config = configparser.ConfigParser()
+    config.read_string(text)
+
+    tags = config.get(CONFIG_HEADER, BRANCH_TAGS, fallback="").split(TAG_DELIMINATOR)
+    new_tags = edit(tuple(tag for tag in map(lambda tag: tag.strip("\n "), tags) if tag))
+    if new_tags is None:
+        return False
+
+    text = set_ini_option(text, CONFIG_HEADER, BRANCH_TAGS, TAG_DELIMINATOR.join(new_tags))
+    fd, temp_path = create_temp_file(settings_path)
+    try:
+        with open(fd, "w", newline="") as file:
+            file.write(text)
+        os.replace(temp_path, settings_path)
+    except BaseException:
+        remove_temp_file(temp_path)
+        raise
+
+    return True
+
+
+class ContextFolderConfig:
+    """
+    Store of parsed .context.ini files, a record is reparsed only when its file's mtime or size changes
+    """
+
+    def __init__(self):
+        self.parses = 0
+
+        self._records = {}  # directory : ContextRecord
+        self._lock = threading.Lock()
+
+    def get(self, directory: str) -> ContextRecord | None:
+        """
+        :return: Record of the context folder, None if directory is not a context folder
+        """
+
+        stat_result = self.stat(directory)
+        if stat_result is None:
+            return None
+
+        record = self.lookup(directory, stat_result)
+        if record is None:
+            record = self.load(directory, stat_result)
+
+        return record
+
+    def stat(self, directory: str) -> os.stat_result | None:
+        try:
+            stat_result = os.stat(os.path.join(directory, INI_NAME))
+        except OSError:
+            self.invalidate(directory)
+            return None
+
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+
+        return stat_result
+
+    def lookup(self, directory: str, stat_result: os.stat_result) -> ContextRecord | None:
+        with self._lock:
+            record = self._records.get(directory)
+
+        if record is None or record.mtime_ns != stat_result.st_mtime_ns or record.size != stat_result.st_size:
+            return None
+
+        return record
+
+    def load(self, directory: str, stat_result: os.stat_result) -> ContextRecord:
+        priority, tags = parse_context_ini(os.path.join(directory, INI_NAME))
+        record = ContextRecord(priority, tags, stat_result.st_mtime_ns, stat_result.st_size)
+
+        with self._lock:
+            self._records[directory] = record
+            self.parses += 1
+
+        return record
+
+    def is_context_folder(self, directory: str) -> bool:
+        return self.stat(directory) is not None
+
+    def invalidate(self, directory: str) -> None:
+        with self._lock:
+            self._records.pop(directory, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+# Process-wide store shared by the exporter and the tree view
+context_config = ContextFolderConfig()
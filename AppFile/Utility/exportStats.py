@@ -0,0 +1,107 @@
+import heapq
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PHASES = ("index", "list", "ini", "header", "filter", "read", "write")
+SLOWEST_FILE_COUNT = 10
+
+
+class ExportStats:
+    """
+    Timings and counters of one Exporter run
+
+    Phase times are summed over every call, so with read workers "read" can exceed the wall time of the export.
+    """
+
+    def __init__(self):
+        self.total_seconds = 0.0
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        # Filesystem calls issued, keyed by call name ("scandir", "stat", "open", ...)
+        self.syscalls = Counter()
+
+        self.dirs_visited = 0
+        self.files_visited = 0
+        self.files_included = 0
+        self.dirs_included = 0
+        # Items left out of the export, keyed by the rule that excluded them
+        self.excluded = Counter()
+
+        self.ini_parses = 0
+        self.header_parses = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        # Targets left as they were because their inputs did not change, and the time spent finding out
+        self.targets_skipped = 0
+        self.check_seconds = 0.0
+
+        self._slowest_files = []  # min-heap of (seconds, path)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phase_seconds[name] += seconds
+
+    def record_file(self, path: str, seconds: float, bytes_read: int) -> None:
+        with self._lock:
+            self.bytes_read += bytes_read
+            if len(self._slowest_files) < SLOWEST_FILE_COUNT:
+                heapq.heappush(self._slowest_files, (seconds, path))
+            elif seconds > self._slowest_files[0][0]:
+                heapq.heapreplace(self._slowest_files, (seconds, path))
+
+    def add_check(self, check: "ExportStats") -> None:
+        """
+        Count the stat pass that fingerprinted the targets, run with its own stats, as part of this export
+        """
+
+        self.check_seconds += check.total_seconds
+        for name, seconds in check.phase_seconds.items():
+            self.add_time(name, seconds)
+        self.syscalls.update(check.syscalls)
+        self.ini_parses += check.ini_parses
+        self.header_parses += check.header_parses
+
+    def slowest_files(self) -> list[tuple[str, float]]:
+        return [(path, seconds) for seconds, path in sorted(self._slowest_files, reverse=True)]
+
+    def summary(self) -> str:
+        """
+        One line for the status bar
+        """
+
+        if self.targets_skipped and not self.dirs_visited:
+            return "Export unchanged since the last one, checked in %.2f s" % self.total_seconds
+
+        return "Exported %d files from %d folders, %.1f MB in %.2f s (%s)" % (
+            self.files_included, self.dirs_visited, self.bytes_written / (1024 * 1024), self.total_seconds,
+            ", ".join("%s %.2f s" % (name, seconds) for name, seconds in self.phase_seconds.items() if seconds >= 0.01)
+            or "no phase over 0.01 s")
+
+    def to_dict(self) -> dict:
+        return {
+            "total_seconds": self.total_seconds,
+            "phase_seconds": dict(self.phase_seconds),
+            "syscalls": dict(self.syscalls),
+            "dirs_visited": self.dirs_visited,
+            "dirs_included": self.dirs_included,
+            "files_visited": self.files_visited,
+            "files_included": self.files_included,
+            "excluded": dict(self.excluded),
+            "ini_parses": self.ini_parses,
+            "header_parses": self.header_parses,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "targets_skipped": self.targets_skipped,
+            "check_seconds": self.check_seconds,
+            "slowest_files": [{"path": path, "seconds": seconds} for path, seconds in self.slowest_files()],
+        }
@@ -1,213 +1,1010 @@
-import configparser
+import errno
+import hashlib
+import json
+import mmap
 import os
-from typing import Mapping
-
-BRANCH_TAGS = "tags"
-FILE_TAGS = "%Tag"
-TAG_DELIMINATOR = ","
-INI_NAME = ".context.ini"
-META_START_SIGNAL = "#METADATA_START"
-META_END_SIGNAL = "#METADATA_END"
-CONFIG_HEADER = "Context Folder Configuration"
-CONFIG_PRIORITY_NAME = "priority"
+import shutil
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+from AppFile.Utility.metadataCache import FileHeader, metadata_cache, get_file_metadata
+from AppFile.Utility.contextConfig import ContextRecord, context_config
+from AppFile.Utility.exportStats import ExportStats
+from AppFile.Utility.tagIndex import TagIndex
+from AppFile.Utility.tempFileUtility import create_temp_file
+from AppFile.Utility.tagFilter import TagFilter, compile_filter
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_MAX_INFLIGHT_BYTES = 64 * 1024 * 1024
+# Minimum seconds between two progress reports
+PROGRESS_INTERVAL = 0.1
+# Bodies at least this large are copied file to file by the kernel instead of being read into memory
+STREAM_THRESHOLD = 256 * 1024
+# Changes whenever the export output changes for the same inputs, so older fingerprints stop matching
+FINGERPRINT_VERSION = 1
+# Errors telling that copy_file_range or sendfile cannot be used between these two files
+_ZERO_COPY_ERRORS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EBADF, errno.EPERM,
+                     getattr(errno, "EOPNOTSUPP", errno.EINVAL), getattr(errno, "ENOTSUP", errno.EINVAL)}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def check_source_dir(source_dir: str) -> None:
+    """
+    :raise NotADirectoryError: If source_dir is not a directory
+    """
+
+    if not os.path.isdir(source_dir):
+        raise NotADirectoryError(errno.ENOTDIR, "Source is not a directory", source_dir)
 
 
 def get_priority(directory: str) -> int:
-    assert os.path.isdir(directory)
-    settings_path = os.path.join(directory, INI_NAME)
-    if os.path.isfile(settings_path):
-        config = configparser.ConfigParser()
-        config.read(settings_path)
-         
-        priority = config[CONFIG_HEADER][CONFIG_PRIORITY_NAME]
-
-        return int(priority)
-    else:
-        return -1
+    record = context_config.get(directory)
+    return record.priority if record else -1
 
 
 def get_branch_tags(directory: str) -> list[str]:
-    assert os.path.isdir(directory)
-    settings_path = os.path.join(directory, INI_NAME)
-    if os.path.isfile(settings_path):
-        config = configparser.ConfigParser()
-        config.read(settings_path)
-        tags = config["Context Folder Configuration"][BRANCH_TAGS].split(TAG_DELIMINATOR)
-        return list(map(lambda tag: tag.strip("\n "), tags))
-    else:
-        return None
+    record = context_config.get(directory)
+    return sorted(record.tags) if record else None
 
 
 def get_file_tags(file_path: str) -> list[str]:
+    return list(get_file_metadata(file_path).tags)
 
-    with open(file_path, "r") as f:
-        first_line = f.readline().rstrip("\n")
-        has_metadata = first_line.strip("- ") == META_START_SIGNAL
-        if not has_metadata:
-            return []
 
-        tags = []
-        while True:
-            next_line = f.readline().split(":", 1)
-            next_line[0] = next_line[0].strip(" -\n")
+def normalize_newlines(data: bytes) -> bytes:
+    """
+    data with its "\r\n" and lone "\r" line ends turned into "\n", as exports have always been written
+    """
 
-            if next_line[0] == META_END_SIGNAL:
-                break
+    return data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+
+def has_carriage_return(fd: int, offset: int) -> bool:
+    """
+    Whether the file of fd has a "\r" from offset on, found through a memory map instead of reading the file
+    """
+
+    try:
+        if os.fstat(fd).st_size <= offset:
+            return False
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped.find(b"\r", offset) != -1
+    except (OSError, ValueError):
+        # Cannot be mapped, the copy that normalizes is right in any case
+        return True
+
+
+def copy_normalized(source_fd: int, out, offset: int, buffer: bytearray, syscalls: Counter = None) -> int:
+    """
+    Write the bytes of source_fd from offset to its end into the binary stream out with normalized line ends
+
+    :return: Number of bytes written
+    """
 
-            next_data, value = next_line[0], next_line[1]
-            if next_data == FILE_TAGS:
-                tags = list(map(lambda tag: tag.strip("\n "), value.split(TAG_DELIMINATOR)))
+    if syscalls is None:
+        syscalls = Counter()
+
+    written = 0
+    carried = b""
+    view = memoryview(buffer)
+    os.lseek(source_fd, offset, os.SEEK_SET)
+    with open(source_fd, "rb", buffering=0, closefd=False) as source:
+        while True:
+            syscalls["read"] += 1
+            count = source.readinto(buffer)
+            if not count:
                 break
 
-        return tags
+            data = carried + view[:count].tobytes()
+            # A "\r" at the end may be the first half of a "\r\n" split by the buffer
+            carried = b"\r" if data.endswith(b"\r") else b""
+            data = normalize_newlines(data[:len(data) - len(carried)])
+            out.write(data)
+            written += len(data)
+
+    if carried:
+        out.write(b"\n")
+        written += 1
+    return written
 
 
-def parse_tag_filter(tag_filters: list[str]) -> tuple[list[str], list[str], Mapping[str, str]]:
-    file_whitelist = [] # tag : dir/file/all
-    dir_whitelist = []
-    blacklist = {}
+def copy_range(source_fd: int, out_fd: int, offset: int, buffer: bytearray, syscalls: Counter = None) -> int:
+    """
+    Append the bytes of source_fd from offset to its end at the current position of out_fd
 
-    print(tag_filters)
+    The kernel copies the data with copy_file_range, or sendfile where that is unavailable, and only when both
+    fail are the bytes moved through buffer with readinto, so memory use does not depend on the file size.
 
-    for filter_item in tag_filters:
-        filter_item = filter_item.strip()
-        filter_params = str.split(filter_item, ":")
+    :return: Number of bytes copied
+    """
 
-        if len(filter_params) == 0:
+    if syscalls is None:
+        syscalls = Counter()
+
+    copied = 0
+    for call in ("copy_file_range", "sendfile"):
+        if not hasattr(os, call):
             continue
 
-        if len(filter_params) > 2 and filter_params[2] == "not":
-            if filter_params[0] in blacklist:
-                blacklist[filter_params[0]] = "all"
-            else:
-                blacklist[filter_params[0]] = len(filter_params) > 1 and filter_params[1] or "all"
+        try:
+            while True:
+                syscalls[call] += 1
+                if call == "copy_file_range":
+                    count = os.copy_file_range(source_fd, out_fd, 1 << 30, offset + copied)
+                else:
+                    count = os.sendfile(out_fd, source_fd, offset + copied, 1 << 30)
+                if not count:
+                    return copied
+                copied += count
+        except OSError as e:
+            if e.errno not in _ZERO_COPY_ERRORS:
+                raise
+
+    view = memoryview(buffer)
+    os.lseek(source_fd, offset + copied, os.SEEK_SET)
+    with open(source_fd, "rb", buffering=0, closefd=False) as source:
+        while True:
+            syscalls["read"] += 1
+            count = source.readinto(buffer)
+            if not count:
+                return copied
+            syscalls["write"] += 1
+            written = 0
+            while written < count:
+                written += os.write(out_fd, view[written:count])
+            copied += count
 
-        else:
-            filter_object = len(filter_params) > 1 and filter_params[1] or "all"
-            if filter_object == "file" or filter_object == "all":
-                file_whitelist.append(filter_params[0])
-            if filter_object == "dir" or filter_object == "all":
-                dir_whitelist.append(filter_params[0])
 
-    return file_whitelist, dir_whitelist, blacklist
+class ExportTarget:
+    """
+    One output of an export: the file written, the filter choosing what goes in and whether headers are kept
+    """
+
+    __slots__ = ("target_file", "tag_filter", "include_meta")
+
+    def __init__(self, target_file: str, tag_filter: "str | list[str] | TagFilter" = None, include_meta: bool = False):
+        self.target_file = target_file
+        self.tag_filter = compile_filter(tag_filter)
+        self.include_meta = include_meta
+
+    @property
+    def chunk_dir(self) -> str:
+        """
+        Folder next to target_file holding the rendered output of each exported folder for incremental exports
+        """
+
+        target_dir, target_name = os.path.split(os.path.abspath(self.target_file))
+        return os.path.join(target_dir, ".%s.chunks" % target_name)
+
+    @property
+    def fingerprint_file(self) -> str:
+        """
+        Sidecar next to target_file with the fingerprint of the inputs of its last export
+        """
+
+        target_dir, target_name = os.path.split(os.path.abspath(self.target_file))
+        return os.path.join(target_dir, ".%s.fingerprint" % target_name)
+
+    def body_offset(self, header: FileHeader) -> int:
+        return 0 if self.include_meta else header.body_offset
+
 
-def export_file(source_file: str, target_file: str) -> None:
-    with open(source_file, "r") as sf, open(target_file, 'a') as tf:
-        source_content = sf.read()
+class ExportManifest:
+    """
+    What an export of one target would write: its files in export order and every item left out
+    """
 
-        tf.write(f"{source_content}\n")
+    def __init__(self, target_file: str):
+        self.target_file = target_file
+        self.files = []  # (path, bytes written, before line ends are normalized) in export order
+        self.excluded = []  # (path, rule that excluded it)
+        # Fed with the settings of the target and the path, size and mtime of everything included
+        self.digest = hashlib.sha1()
+
+    @property
+    def total_bytes(self) -> int:
+        # Every file is followed by a newline
+        return sum(size for path, size in self.files) + len(self.files)
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Hash of the inputs of the export, the output is the same for as long as the fingerprint is
+        """
 
-def _organize_dir_list(dir_list: list[str]) -> list[str]:
-    return sorted(dir_list, key=get_priority)
+        return self.digest.hexdigest()
 
 
 class Exporter:
-    def __init__(self, source_dir: str, target_file: str, tag_filter: list[str] = None, include_meta: bool = False):
+    def __init__(self, source_dir: str, target_file: str = None, tag_filter: str | list[str] = None,
+                 include_meta: bool = False, buffer_size: int = DEFAULT_BUFFER_SIZE, workers: int = 0,
+                 max_inflight_bytes: int = DEFAULT_MAX_INFLIGHT_BYTES, tag_index: TagIndex = None,
+                 incremental: bool = False, progress_callback: Callable[[int, int, int], None] = None,
+                 cancel_event: threading.Event = None,
+                 targets: "list[ExportTarget | tuple[str, str | list[str] | TagFilter, bool]]" = None,
+                 force: bool = False):
         """
         :param source_dir: Directory path to export
         :param target_file: File path to export to
-        :param tag_filter: List of tags to filter in the form "<tag>:<dir_type>:<not?>"
+        :param tag_filter: Filter rule, either tags in the form "<tag>:<dir_type>:<not?>" (a list or comma-separated)
+            or a boolean expression, see tagFilter.TagFilter
         :param include_meta: Whether to include metadata in export
+        :param buffer_size: Size in bytes of the write buffer of the export output
+        :param workers: Number of threads reading files ahead of the writer, 0 to read and write serially
+        :param max_inflight_bytes: Upper bound on the bytes read ahead but not yet written when workers > 0
+        :param tag_index: Project tag index to take listings, tags and priorities from instead of the files
+        :param incremental: Reuse the rendered output of folders whose files did not change since the last export
+        :param progress_callback: Called with (items written, total items, bytes written) while exporting
+        :param cancel_event: Set from another thread to stop the export, which then raises ExportCancelled
+        :param targets: Several outputs written from one walk instead of target_file, tag_filter and include_meta,
+            as ExportTarget or (target_file, tag_filter, include_meta); each folder is listed and each file read
+            once, however many outputs include it
+        :param force: Export also the targets whose inputs did not change since their last export, which are
+            otherwise left as they are
         """
 
-        assert os.path.isdir(source_dir)
+        check_source_dir(source_dir)
+
+        if targets is None:
+            targets = [ExportTarget(target_file, tag_filter, include_meta)]
+        self.targets = [target if isinstance(target, ExportTarget) else ExportTarget(*target) for target in targets]
+        if not self.targets:
+            raise ValueError("No export target")
+        if len({os.path.abspath(target.target_file) for target in self.targets}) != len(self.targets):
+            raise ValueError("Two export targets write the same file")
 
         self.source_dir = source_dir
-        self.target_file = target_file
+        self.target_file = self.targets[0].target_file
+
+        self.buffer_size = buffer_size
+        self.workers = workers
+        self.max_inflight_bytes = max_inflight_bytes
+        self.tag_index = tag_index
+        self.incremental = incremental
+        self.force = force
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event or threading.Event()
+
+        # Timings and counters of the last export
+        self.stats = ExportStats()
+        # Targets the last export left as they were, their inputs had not changed
+        self.skipped_targets = []
+
+        self._outs = []  # output stream of each target being written, None for those skipped
+        self._manifests = None  # manifest of each target while planning
+        self._listing_cache = None
+        self._copy_buffer = None
+        self._index = None
+        self._skipped_names = {}  # folder : names of earlier exports in it
+        self._used_chunks = set()
+        self._layouts = {}  # target index : (chunk path and size of each folder, size, mtime_ns) of the last update
+        self._progress_done = 0
+        self._progress_total = 0
+        self._progress_time = 0.0
+
+    @property
+    def syscalls(self) -> Counter:
+        """
+        Filesystem calls issued by the last export, keyed by call name ("scandir", "stat", "open", ...)
+        """
 
-        self.include_meta = include_meta
+        return self.stats.syscalls
 
-        if tag_filter:
-            self._file_whitelist, self._dir_whitelist, self._blacklist = parse_tag_filter(tag_filter)
-        else:
-            self._file_whitelist = []
-            self._dir_whitelist = []
-            self._blacklist = {}
+    @property
+    def bytes_written(self) -> int:
+        return self.stats.bytes_written
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
 
-    def set_tag_filter(self, tag_filter: list[str]) -> None:
-        self._file_whitelist, self._dir_whitelist, self._blacklist = parse_tag_filter(tag_filter)
+    @property
+    def include_meta(self) -> bool:
+        return self.targets[0].include_meta
+
+    @property
+    def tag_filter(self) -> TagFilter:
+        return self.targets[0].tag_filter
+
+    def set_tag_filter(self, tag_filter: str | list[str]) -> None:
+        self.targets[0].tag_filter = compile_filter(tag_filter)
 
     def export(self) -> None:
-        assert os.path.isdir(self.source_dir)
+        check_source_dir(self.source_dir)
+
+        self.stats = ExportStats()
+        self.skipped_targets = []
+        start = time.perf_counter()
+
+        # Everything goes through one buffered stream per target to a temp file, the old exports stay readable
+        # until the new ones are complete and replace them
+        temp_paths = []  # (target index, temp file)
+        try:
+            # A stat pass fingerprints the inputs of each target, the export walk reuses its listings
+            listing_cache = {}
+            manifests = self._check_targets(listing_cache)
+            stale = self._stale_targets(manifests)
+            if not stale:
+                return
+
+            self._listing_cache = listing_cache
+            self._start_walk(sync_index=False)
+            self._used_chunks.clear()
+            if self.incremental:
+                for index in stale:
+                    os.makedirs(self.targets[index].chunk_dir, exist_ok=True)
+
+            with ExitStack() as stack:
+                self._outs = [None] * len(self.targets)
+                for index in stale:
+                    fd, temp_path = create_temp_file(self.targets[index].target_file)
+                    temp_paths.append((index, temp_path))
+                    self._outs[index] = stack.enter_context(open(fd, "wb", buffering=self.buffer_size))
+
+                export_files = self._export_recursive(self.source_dir, "", stale)
+                if self.progress_callback is not None:
+                    # Plan the whole walk first so progress has a total
+                    export_files = list(export_files)
+                    self._start_progress(len(export_files))
+
+                if self.workers > 0 and not self.incremental:
+                    self._export_concurrent(export_files)
+                else:
+                    for file_path, header, size, outputs in export_files:
+                        self._check_cancelled()
+                        self._export_file(file_path, header, size, outputs)
+                        self._advance_progress()
+
+            self._check_cancelled()
+
+            for index, temp_path in temp_paths:
+                target = self.targets[index]
+                if os.path.isfile(target.target_file):
+                    shutil.copymode(target.target_file, temp_path)
+                os.replace(temp_path, target.target_file)
+                self._write_fingerprint(target, manifests[index].fingerprint)
+
+            if self.incremental:
+                self._remove_unused_chunks(stale)
+        except BaseException:
+            for index, temp_path in temp_paths:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            raise
+        finally:
+            self._outs = []
+            self._listing_cache = None
+            self._copy_buffer = None
+            self.stats.total_seconds = time.perf_counter() - start
+
+    def update(self) -> None:
+        """
+        Bring the targets up to date in place, for readers that keep them open
 
-        if os.path.exists(self.target_file) and os.path.isfile(self.target_file):
-            os.remove(self.target_file)
+        Unlike export, a target is not replaced but rewritten where it is, and only from the first folder whose
+        output changed since the last update by this exporter up to the last one that changed; a target written
+        by anyone else in between is rewritten whole. Needs incremental, as the folder chunks are what is
+        compared and copied.
+        """
 
-        self._export_recursive(self.source_dir)
+        if not self.incremental:
+            raise ValueError("Updating in place needs an incremental export")
+        check_source_dir(self.source_dir)
+
+        self.stats = ExportStats()
+        self.skipped_targets = []
+        start = time.perf_counter()
+        try:
+            listing_cache = {}
+            manifests = self._check_targets(listing_cache)
+            stale = self._stale_targets(manifests)
+            if not stale:
+                return
+
+            self._listing_cache = listing_cache
+            self._start_walk(sync_index=False)
+            self._used_chunks.clear()
+            for index in stale:
+                os.makedirs(self.targets[index].chunk_dir, exist_ok=True)
+
+            layouts = {index: [] for index in stale}
+            for chunk_path, header, size, outputs in self._export_recursive(self.source_dir, "", stale):
+                layouts[outputs[0]].append((chunk_path, size))
+            self._check_cancelled()
+
+            for index in stale:
+                self._write_in_place(index, layouts[index])
+                self._write_fingerprint(self.targets[index], manifests[index].fingerprint)
+
+            self._remove_unused_chunks(stale)
+        finally:
+            self._listing_cache = None
+            self._copy_buffer = None
+            self.stats.total_seconds = time.perf_counter() - start
+
+    def plan(self, listing_cache: dict = None) -> list[ExportManifest]:
+        """
+        Dry run of export, the manifest of each target from the same walk without reading or writing any body
 
-    def _export_recursive(self, exported_dir: str) -> None:
-        child_dirs = list(map((lambda child_dir: os.path.join(exported_dir, child_dir)), os.listdir(exported_dir)))
-        file_paths = [path for path in child_dirs if os.path.isfile(path)
-                      and path.endswith(".txt") and not self._in_blacklist(path) and self._in_whitelist(path)]
-        dir_paths = [path for path in child_dirs if os.path.isdir(path) and get_priority(path) != -1
-                     and not self._in_blacklist(path) and self._in_whitelist(path)]
+        :param listing_cache: Folder listings read by this plan are added to it and those already in it are
+            reused, so planning the same tree again with another filter needs no disk access at all; pass a new
+            dict once the tree may have changed
+        :return: Manifests in the order of targets
+        """
 
-        for file_path in file_paths:
-            if os.path.splitext(file_path)[1] == ".txt":
-                self._export_file(file_path)
+        check_source_dir(self.source_dir)
+
+        self.stats = ExportStats()
+        start = time.perf_counter()
+        self._listing_cache = {} if listing_cache is None else listing_cache
+        self._start_walk(sync_index=not self._listing_cache)
+        self._manifests = [ExportManifest(target.target_file) for target in self.targets]
+        for target, manifest in zip(self.targets, self._manifests):
+            manifest.digest.update(("%d\0%s\0%s\0%r\n" % (FINGERPRINT_VERSION, os.path.abspath(self.source_dir),
+                                                          target.tag_filter.key, target.include_meta))
+                                   .encode(errors="surrogateescape"))
+        try:
+            for _ in self._export_recursive(self.source_dir, "", tuple(range(len(self.targets)))):
+                pass
+            return self._manifests
+        finally:
+            self._manifests = None
+            self._listing_cache = None
+            self.stats.total_seconds = time.perf_counter() - start
+
+    @property
+    def chunk_dir(self) -> str:
+        return self.targets[0].chunk_dir
+
+    def _check_targets(self, listing_cache: dict) -> list[ExportManifest]:
+        """
+        Plan every target into listing_cache, counting the plan as part of the running export
+        """
 
-        dir_paths = _organize_dir_list(dir_paths)
+        stats = self.stats
+        try:
+            manifests = self.plan(listing_cache)
+        finally:
+            check_stats, self.stats = self.stats, stats
+        stats.add_check(check_stats)
+        return manifests
 
-        for dir_path in dir_paths:
-            child_path = os.path.join(exported_dir, dir_path)
-            self._export_recursive(child_path)
+    def _stale_targets(self, manifests: list[ExportManifest]) -> tuple[int, ...]:
+        """
+        :return: Indexes of the targets to write, all of them when forced
+        """
 
-    def _export_file(self, source_file: str) -> None:
+        stale = tuple(index for index, (target, manifest) in enumerate(zip(self.targets, manifests))
+                      if self.force or not self._is_current(target, manifest.fingerprint))
+        self.skipped_targets = [target for index, target in enumerate(self.targets) if index not in stale]
+        self.stats.targets_skipped = len(self.skipped_targets)
+        return stale
 
-        with open(source_file, "r") as sf, open(self.target_file, 'a') as tf:
-            source_content = sf.read()
+    def _is_current(self, target: ExportTarget, fingerprint: str) -> bool:
+        """
+        Whether target_file is still the output of an export of inputs with this fingerprint
+        """
 
-            if not self.include_meta and source_content.startswith(META_START_SIGNAL):
-                meta_end_index = source_content.find(META_END_SIGNAL)
-                source_content = source_content[source_content.find("\n", meta_end_index)+1:]
+        try:
+            with open(target.fingerprint_file, "r") as f:
+                sidecar = json.load(f)
+            stat_result = os.stat(target.target_file)
+        except (OSError, ValueError):
+            return False
 
-                tf.write(f"{source_content}\n")
+        # A target edited or replaced since its export no longer matches its sidecar
+        return isinstance(sidecar, dict) and sidecar.get("fingerprint") == fingerprint and \
+            sidecar.get("size") == stat_result.st_size and sidecar.get("mtime_ns") == stat_result.st_mtime_ns
+
+    def _write_fingerprint(self, target: ExportTarget, fingerprint: str) -> None:
+        # Without a sidecar the next export is simply not skipped, so failing to write one is no error
+        try:
+            stat_result = os.stat(target.target_file)
+            fd, temp_path = create_temp_file(target.fingerprint_file)
+            with open(fd, "w") as f:
+                json.dump({"fingerprint": fingerprint, "size": stat_result.st_size,
+                           "mtime_ns": stat_result.st_mtime_ns}, f)
+            os.replace(temp_path, target.fingerprint_file)
+        except OSError:
+            pass
+
+    def _start_walk(self, sync_index: bool) -> None:
+        # A stat-only revalidation of the index, after which the walk is index queries instead of
+        # header and ini reads
+        self._index = None
+        if self.tag_index is not None and self.tag_index.relative_path(self.source_dir) is not None:
+            if sync_index:
+                with self.stats.phase("index"):
+                    self.tag_index.sync(self.source_dir)
+            self._index = self.tag_index
+
+        # Earlier exports inside the source tree are not part of the new ones
+        self._skipped_names = {}
+        for target in self.targets:
+            target_dir, target_name = os.path.split(os.path.abspath(target.target_file))
+            self._skipped_names.setdefault(target_dir, set()).add(target_name)
+
+    def _export_recursive(self, exported_dir: str, rel_dir: str = "", active: tuple[int, ...] = (0,)) \
+            -> Iterator[tuple[str, FileHeader | None, int, tuple[int, ...]]]:
+        """
+        Yield (path, header, bytes to read, targets) of every exported file in export order
+
+        :param rel_dir: exported_dir relative to source_dir, "/"-separated, for path: filter atoms
+        :param active: Indexes of the targets that include exported_dir
+
+        Each file is yielded once with the targets whose filter accepts it. In incremental mode each folder's
+        own files are yielded as one rendered chunk per target, with a None header.
+        """
+
+        self._check_cancelled()
+
+        stats = self.stats
+        stats.dirs_visited += 1
+
+        files, dirs, plain_dirs = self._listing(exported_dir)
+        stats.excluded["not a context folder"] += len(plain_dirs)
+
+        manifests = self._manifests
+        if manifests is not None:
+            for path in plain_dirs:
+                for index in active:
+                    manifests[index].excluded.append((path, "not a context folder"))
+
+        skipped_names = self._skipped_names.get(os.path.abspath(exported_dir))
+        if skipped_names:
+            files = [item for item in files if os.path.basename(item[0]) not in skipped_names]
+        stats.files_visited += len(files)
+
+        filters = [(index, self.targets[index].tag_filter.exclusion_rule) for index in active]
+        uses_paths = any(self.targets[index].tag_filter.uses_paths for index in active)
+        # Targets keeping headers, a file is read from its start when any of them includes it
+        meta_targets = frozenset(index for index in active if self.targets[index].include_meta)
+        with stats.phase("filter"):
+            file_paths = []
+            for path, header, size, mtime_ns in files:
+                rel_path = uses_paths and rel_dir + os.path.basename(path) or ""
+                outputs = []
+                for index, rule_for in filters:
+                    rule = rule_for(header.tags, "file", rel_path)
+                    if rule is None:
+                        outputs.append(index)
+                    else:
+                        stats.excluded[rule] += 1
+                        if manifests is not None:
+                            manifests[index].excluded.append((path, rule))
+                if outputs:
+                    outputs = tuple(outputs)
+                    body_size = max(size - header.body_offset, 0)
+                    read_size = size if meta_targets and not meta_targets.isdisjoint(outputs) else body_size
+                    file_paths.append((path, header, read_size, outputs))
+                    if manifests is not None:
+                        entry = ("%s\0%d\0%d\n" % (path, size, mtime_ns)).encode(errors="surrogateescape")
+                        for index in outputs:
+                            manifests[index].files.append((path, size if index in meta_targets else body_size))
+                            manifests[index].digest.update(entry)
+
+            dir_paths = []
+            for path, record in dirs:
+                rel_path = uses_paths and rel_dir + os.path.basename(path) or ""
+                outputs = []
+                for index, rule_for in filters:
+                    rule = rule_for(record.tags, "dir", rel_path)
+                    if rule is None:
+                        outputs.append(index)
+                    else:
+                        stats.excluded[rule] += 1
+                        if manifests is not None:
+                            manifests[index].excluded.append((path, rule))
+                if outputs:
+                    dir_paths.append((path, record, tuple(outputs)))
+                    if manifests is not None:
+                        # What the .context.ini says, its formatting and comments do not change the export
+                        entry = ("%s\0%d\0%s\n" % (path, record.priority, ",".join(sorted(record.tags)))) \
+                            .encode(errors="surrogateescape")
+                        for index in outputs:
+                            manifests[index].digest.update(entry)
+
+        stats.files_included += len(file_paths)
+        stats.dirs_included += len(dir_paths)
+
+        if self.incremental and manifests is None:
+            if file_paths:
+                yield from self._get_chunks(exported_dir, files, file_paths)
+        else:
+            yield from file_paths
+
+        for dir_path, record, outputs in sorted(dir_paths, key=lambda item: item[1].priority):
+            yield from self._export_recursive(dir_path, rel_dir + os.path.basename(dir_path) + "/", outputs)
+
+    def _listing(self, exported_dir: str) -> tuple[list[tuple[str, FileHeader, int, int]],
+                                                     list[tuple[str, ContextRecord]], list[str]]:
+        """
+        :return: (path, header, size, mtime_ns) of each .txt file, (path, record) of each context folder and
+            the path of each other folder, from the listing cache while planning
+        """
+
+        if self._listing_cache is not None:
+            listing = self._listing_cache.get(exported_dir)
+            if listing is not None:
+                return listing
+
+        plain_dirs = []
+        if self._index is not None:
+            self.syscalls["index_query"] += 1
+            with self.stats.phase("index"):
+                files, dirs = self._index.list_dir(exported_dir, plain_dirs)
+        else:
+            files, dirs = self._list_dir(exported_dir, plain_dirs)
+
+        listing = files, dirs, plain_dirs
+        if self._listing_cache is not None:
+            self._listing_cache[exported_dir] = listing
+        return listing
 
+    def _list_dir(self, exported_dir: str, plain_dirs: list[str] = None) \
+            -> tuple[list[tuple[str, FileHeader, int, int]], list[tuple[str, ContextRecord]]]:
+        """
+        Read the children of a folder from disk in name order
+
+        :param plain_dirs: Receives the path of each folder that is not a context folder
+        :return: (path, header, size, mtime_ns) of each .txt file and (path, record) of each context folder
+        """
+
+        # One scandir per directory; entry types come from the cached DirEntry, never from a second stat
+        self.syscalls["scandir"] += 1
+        with self.stats.phase("list"), os.scandir(exported_dir) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+
+        files = []
+        dirs = []
+        for entry in entries:
+            if entry.name.endswith(".txt") and entry.is_file():
+                header = self._get_file_header(entry)
+                stat_result = entry.stat()
+                files.append((entry.path, header, stat_result.st_size, stat_result.st_mtime_ns))
+
+            elif entry.is_dir():
+                record = self._get_context_record(entry.path)
+                # A priority of -1 leaves a context folder out of exports, as if it had no .context.ini
+                if record is not None and record.priority != -1:
+                    dirs.append((entry.path, record))
+                elif plain_dirs is not None:
+                    plain_dirs.append(entry.path)
+
+        return files, dirs
+
+    def _get_chunks(self, exported_dir: str, files: list[tuple[str, FileHeader, int, int]],
+                    file_paths: list[tuple[str, FileHeader, int, tuple[int, ...]]]) \
+            -> list[tuple[str, None, int, tuple[int]]]:
+        """
+        Find the rendered output of a folder's own files for each target including any of them, rendering the
+        missing ones first from one read of each file
+
+        A chunk is named after everything its content depends on: the folder, the name, size and mtime of
+        each of its .txt files, the tag filter and include_meta. An unchanged folder therefore maps to an
+        existing chunk and none of its files are read.
+        """
+
+        chunks = []
+        missing = {}  # target index : chunk path
+        for index in sorted({index for *_, outputs in file_paths for index in outputs}):
+            target = self.targets[index]
+            key = hashlib.sha1()
+            key.update(os.path.abspath(exported_dir).encode(errors="surrogateescape"))
+            key.update(("\0%r\0%s" % (target.include_meta, target.tag_filter.key)).encode())
+            for path, header, size, mtime_ns in files:
+                key.update(("\0%s\0%d\0%d" % (os.path.basename(path), size, mtime_ns)).encode(errors="surrogateescape"))
+
+            chunk_path = os.path.join(target.chunk_dir, key.hexdigest() + ".chunk")
+            self._used_chunks.add(chunk_path)
+
+            try:
+                self.syscalls["stat"] += 1
+                chunks.append((chunk_path, None, os.stat(chunk_path).st_size, (index,)))
+            except FileNotFoundError:
+                missing[index] = chunk_path
+
+        if not missing:
+            return chunks
+
+        self.syscalls["chunk_render"] += len(missing)
+        temp_paths = []
+        try:
+            with ExitStack() as stack:
+                outs = {}
+                for index, chunk_path in missing.items():
+                    fd, temp_path = create_temp_file(chunk_path)
+                    temp_paths.append(temp_path)
+                    outs[index] = stack.enter_context(open(fd, "wb", buffering=self.buffer_size))
+
+                for file_path, header, size, outputs in file_paths:
+                    outputs = tuple(index for index in outputs if index in outs)
+                    if not outputs:
+                        continue
+
+                    self.syscalls["open"] += 1
+                    if size >= STREAM_THRESHOLD:
+                        for index in outputs:
+                            self._stream_body(file_path, self.targets[index].body_offset(header), outs[index])
+                            outs[index].write(b"\n")
+                    else:
+                        content = self._read_body(file_path, self._read_offset(header, outputs))
+                        for index, body in self._bodies(content, header, outputs):
+                            outs[index].write(body)
+                            outs[index].write(b"\n")
+
+                chunk_sizes = {index: out.tell() for index, out in outs.items()}
+
+            for temp_path, (index, chunk_path) in zip(temp_paths, missing.items()):
+                os.replace(temp_path, chunk_path)
+                chunks.append((chunk_path, None, chunk_sizes[index], (index,)))
+        except BaseException:
+            for temp_path in temp_paths:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            raise
+
+        return chunks
+
+    def _write_in_place(self, index: int, chunks: list[tuple[str, int]]) -> None:
+        """
+        Make the target of index the concatenation of chunks, writing only the range that differs from the
+        layout of its last update
+        """
+
+        target_file = self.targets[index].target_file
+        first, last = 0, len(chunks)
+        old_chunks, old_size, old_mtime_ns = self._layouts.get(index, ((), -1, -1))
+        try:
+            stat_result = os.stat(target_file)
+            unchanged = (stat_result.st_size, stat_result.st_mtime_ns) == (old_size, old_mtime_ns)
+        except FileNotFoundError:
+            unchanged = False
+
+        offset = 0
+        if unchanged:
+            while first < min(len(chunks), len(old_chunks)) and chunks[first] == old_chunks[first]:
+                offset += chunks[first][1]
+                first += 1
+            # With the same total size, the unchanged chunks at the end are still at their place
+            if sum(size for chunk_path, size in chunks) == old_size:
+                while last > first and len(old_chunks) - len(chunks) + last > first and \
+                        chunks[last - 1] == old_chunks[len(old_chunks) - len(chunks) + last - 1]:
+                    last -= 1
+
+        if self._copy_buffer is None:
+            self._copy_buffer = bytearray(self.buffer_size)
+
+        with self.stats.phase("write"):
+            fd = os.open(target_file, os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o666)
+            try:
+                os.lseek(fd, offset, os.SEEK_SET)
+                for chunk_path, size in chunks[first:last]:
+                    self.syscalls["open"] += 1
+                    chunk_fd = os.open(chunk_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+                    try:
+                        self.stats.bytes_written += copy_range(chunk_fd, fd, 0, self._copy_buffer, self.syscalls)
+                    finally:
+                        os.close(chunk_fd)
+                os.ftruncate(fd, sum(size for chunk_path, size in chunks))
+            finally:
+                os.close(fd)
+
+        stat_result = os.stat(target_file)
+        self._layouts[index] = (chunks, stat_result.st_size, stat_result.st_mtime_ns)
+
+    def _remove_unused_chunks(self, indexes: tuple[int, ...]) -> None:
+        for index in indexes:
+            with os.scandir(self.targets[index].chunk_dir) as it:
+                for entry in it:
+                    if entry.path not in self._used_chunks:
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+
+    def _export_concurrent(self, export_files: Iterator[tuple[str, FileHeader, int, tuple[int, ...]]]) -> None:
+        """
+        Read files on a thread pool ahead of the writer, which still writes them one by one in export order
+
+        Bodies of at least STREAM_THRESHOLD bytes are not read ahead, the writer streams them itself in turn.
+        """
+
+        pending = deque()  # (future or None, file path, header, size, targets) in export order
+        inflight_bytes = 0
+
+        def write_next() -> int:
+            self._check_cancelled()
+            future, file_path, header, size, outputs = pending.popleft()
+            if future is None:
+                self._export_file(file_path, header, size, outputs)
+                size = 0
             else:
-                tf.write(f"{source_content}\n")
+                self._write_content(future.result(), header, outputs)
+            self._advance_progress()
+            return size
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            try:
+                for file_path, header, size, outputs in export_files:
+                    if size >= STREAM_THRESHOLD:
+                        pending.append((None, file_path, header, size, outputs))
+                        continue
+
+                    # Always allow one file in flight, however large, so oversized files cannot stall the pipeline
+                    while pending and inflight_bytes + size > self.max_inflight_bytes:
+                        inflight_bytes -= write_next()
+
+                    self.syscalls["open"] += 1
+                    future = pool.submit(self._read_body, file_path, self._read_offset(header, outputs))
+                    pending.append((future, file_path, header, size, outputs))
+                    inflight_bytes += size
+
+                while pending:
+                    write_next()
+            except BaseException:
+                for future, *_ in pending:
+                    if future is not None:
+                        future.cancel()
+                raise
+
+    def _check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise ExportCancelled()
+
+    def _start_progress(self, total: int) -> None:
+        self._progress_done = 0
+        self._progress_total = total
+        self._progress_time = 0.0
+        self.progress_callback(0, total, 0)
+
+    def _advance_progress(self) -> None:
+        if self.progress_callback is None:
+            return
+
+        self._progress_done += 1
+        now = time.perf_counter()
+        if now - self._progress_time >= PROGRESS_INTERVAL or self._progress_done == self._progress_total:
+            self._progress_time = now
+            self.progress_callback(self._progress_done, self._progress_total, self.stats.bytes_written)
+
+    def _get_file_header(self, entry: os.DirEntry) -> FileHeader:
+        with self.stats.phase("header"):
+            self.syscalls["stat"] += 1
+            stat_result = entry.stat()
+
+            header = metadata_cache.lookup(entry.path, stat_result)
+            if header is None:
+                self.syscalls["open"] += 1
+                self.stats.header_parses += 1
+                header = metadata_cache.load(entry.path, stat_result)
+
+        return header
+
+    def _get_context_record(self, directory: str) -> ContextRecord | None:
+        """
+        :return: Record of the context folder, None if directory is not a context folder
+        """
 
-                return 
+        with self.stats.phase("ini"):
+            self.syscalls["stat"] += 1
+            stat_result = context_config.stat(directory)
+            if stat_result is None:
+                return None
 
-    def _in_blacklist(self, item_path: str) -> bool:
-        
-        if os.path.isfile(item_path):
-            print(f"————————{item_path}————————")
-            for tag in get_file_tags(item_path):
-                print(tag)
-                if tag in self._blacklist and (self._blacklist[tag] == "file" or self._blacklist[tag] == "all"):
-                    return True
+            record = context_config.lookup(directory, stat_result)
+            if record is None:
+                self.syscalls["open"] += 1
+                self.stats.ini_parses += 1
+                record = context_config.load(directory, stat_result)
 
-            return False
+        return record
+
+    def _read_offset(self, header: FileHeader, outputs: tuple[int, ...]) -> int:
+        """
+        Offset a file is read from to serve all of outputs, 0 if any of them keeps headers
+        """
 
-        elif os.path.isdir(item_path):
-            for tag in get_branch_tags(item_path):
-                if tag in self._blacklist and (self._blacklist[tag] == "dir" or self._blacklist[tag] == "all"):
-                    return True
+        return min(self.targets[index].body_offset(header) for index in outputs)
 
-            return False
+    def _export_file(self, source_file: str, header: FileHeader | None, size: int = 0,
+                     outputs: tuple[int, ...] = (0,)) -> None:
+        self.syscalls["open"] += 1
 
-    def _in_whitelist(self, item_path: str) -> bool:
+        if header is None:
+            # A rendered chunk, already separated and normalized
+            self.stats.bytes_written += self._stream_body(source_file, 0, self._outs[outputs[0]], normalize=False)
+            return
 
-        if os.path.isfile(item_path):
-            if not self._file_whitelist:
-                return True
-            
-            for tag in get_file_tags(item_path):
-                if tag in self._file_whitelist:
-                    return True
+        if size >= STREAM_THRESHOLD:
+            for index in outputs:
+                out = self._outs[index]
+                self.stats.bytes_written += self._stream_body(source_file, self.targets[index].body_offset(header), out)
+                with self.stats.phase("write"):
+                    out.write(b"\n")
+                self.stats.bytes_written += 1
+            return
 
-            return False
+        self._write_content(self._read_body(source_file, self._read_offset(header, outputs)), header, outputs)
 
-        elif os.path.isdir(item_path):
-            if not self._dir_whitelist:
-                return True
-            
-            for tag in get_branch_tags(item_path):
-                if tag in self._dir_whitelist:
-                    return True
+    def _stream_body(self, source_file: str, offset: int, out, normalize: bool = True) -> int:
+        """
+        Copy source_file from offset into the buffered binary stream out without holding it in memory
+
+        The kernel copies a body without "\r", one with "\r" line ends goes through the copy buffer to normalize
+        them.
+
+        :return: Number of bytes copied
+        """
+
+        if self._copy_buffer is None:
+            self._copy_buffer = bytearray(self.buffer_size)
+
+        start = time.perf_counter()
+        with self.stats.phase("write"):
+            fd = os.open(source_file, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+            try:
+                if normalize:
+                    self.syscalls["mmap"] += 1
+                if normalize and has_carriage_return(fd, offset):
+                    copied = copy_normalized(fd, out, offset, self._copy_buffer, self.syscalls)
+                else:
+                    # Whatever is still buffered has to reach the file before the kernel appends behind it
+                    out.flush()
+                    copied = copy_range(fd, out.fileno(), offset, self._copy_buffer, self.syscalls)
+            finally:
+                os.close(fd)
+
+        self.stats.record_file(source_file, time.perf_counter() - start, copied)
+        return copied
+
+    def _read_body(self, source_file: str, offset: int) -> bytes:
+        start = time.perf_counter()
+        with open(source_file, "rb") as sf:
+            if offset:
+                sf.seek(offset)
+
+            source_content = sf.read()
+
+        elapsed = time.perf_counter() - start
+        self.stats.add_time("read", elapsed)
+        self.stats.record_file(source_file, elapsed, len(source_content))
+        return source_content
+
+    def _write_content(self, source_content: bytes, header: FileHeader, outputs: tuple[int, ...] = (0,)) -> None:
+        """
+        Write the content read for outputs to each of them, less the header for outputs that leave it out
+        """
+
+        with self.stats.phase("write"):
+            for index, body in self._bodies(source_content, header, outputs):
+                self._outs[index].write(body)
+                self._outs[index].write(b"\n")
+                self.stats.bytes_written += len(body) + 1
+
+    def _bodies(self, source_content: bytes, header: FileHeader, outputs: tuple[int, ...]) \
+            -> Iterator[tuple[int, "bytes | memoryview"]]:
+        """
+        Yield (target index, what it writes) from the content read for outputs, with normalized line ends
+        """
+
+        offset = self._read_offset(header, outputs)
+        content = memoryview(source_content)
+        # Only content with "\r" in it is copied to normalize it
+        normalize = b"\r" in source_content
+        for index in outputs:
+            body = content[self.targets[index].body_offset(header) - offset:]
+            yield index, normalize_newlines(body.tobytes()) if normalize else body
 
-            return False
-        
 
 # export_dir = '/Users/robert/Desktop/UFV/COMP370/Project/Testing_folder'
 # target_file_test = '/Users/robert/Desktop/UFV/COMP370/Project/ExportedProject.txt'
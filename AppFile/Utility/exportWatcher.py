@@ -0,0 +1,335 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable
+from AppFile.Utility.contextConfig import INI_NAME
+from AppFile.Utility.exportUtility import ExportCancelled, Exporter
+
+DEFAULT_DEBOUNCE = 0.3
+# Longest a continuous stream of changes can hold back an update
+MAX_DEBOUNCE = 2.0
+# Seconds between two stat passes when the tree cannot be watched
+DEFAULT_POLL_INTERVAL = 2.0
+# Polling takes at most this share of the time, a slow stat pass on a huge tree polls less often
+MAX_POLL_LOAD = 0.2
+# Seconds a wait blocks before checking for cancellation
+WAIT_SLICE = 0.2
+# Update errors kept, a long watch over a tree that keeps failing would hold every one of them
+MAX_ERRORS = 100
+INOTIFY = "inotify"
+POLLING = "polling"
+
+# linux/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+_libc = None
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        _libc = None
+
+
+def _watch_error_reason(error: OSError) -> str:
+    if error.errno == errno.ENOSPC:
+        return "more folders than inotify watches left, see fs.inotify.max_user_watches"
+    return error.strerror or str(error)
+
+
+class InotifyWatcher:
+    """
+    Watches every folder of a tree with one inotify watch each
+
+    Adding a watch beyond the user's inotify watch limit raises OSError with ENOSPC, from the constructor or from
+    wait when a folder is added to the tree; the tree then has to be polled instead.
+    """
+
+    def __init__(self, root: str, is_relevant: Callable[[str, str, bool], bool]):
+        """
+        :param is_relevant: Called with (folder, name, is folder) of a changed item, False to ignore the change
+        """
+
+        if _libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+
+        self.fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        self.is_relevant = is_relevant
+        self.folders = {}  # watch descriptor : folder
+        try:
+            self.add_tree(root)
+        except BaseException:
+            self.close()
+            raise
+
+    def add_tree(self, directory: str) -> None:
+        for current, dirs, files in os.walk(directory):
+            wd = _libc.inotify_add_watch(self.fd, os.fsencode(current), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error in (errno.ENOENT, errno.ENOTDIR):
+                    # Gone again already, its parent reports that
+                    continue
+                raise OSError(error, os.strerror(error), current)
+            # A folder moved inside the tree keeps its watch descriptor, under its new path
+            self.folders[wd] = current
+
+    def wait(self, timeout: float) -> bool:
+        """
+        :return: Whether a relevant change happened within timeout seconds
+        """
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+                name = os.fsdecode(data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0"))
+                offset += _EVENT.size + length
+
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost, anything may have changed
+                    changed = True
+                    continue
+                if mask & IN_IGNORED:
+                    self.folders.pop(wd, None)
+                    continue
+
+                folder = self.folders.get(wd)
+                if folder is None or not name:
+                    continue
+                is_dir = bool(mask & IN_ISDIR)
+                if is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(os.path.join(folder, name))
+                if self.is_relevant(folder, name, is_dir):
+                    changed = True
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """
+    Reports a possible change every poll interval, the update's own stat pass then finds out what changed
+    """
+
+    def __init__(self, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.next_poll = time.monotonic() + poll_interval
+
+    def checked(self, seconds: float) -> None:
+        # Called with the duration of each update, so a slow stat pass does not keep the tree busy
+        self.next_poll = time.monotonic() + max(self.poll_interval, seconds / MAX_POLL_LOAD)
+
+    def wait(self, timeout: float) -> bool:
+        remaining = self.next_poll - time.monotonic()
+        if remaining > timeout:
+            time.sleep(timeout)
+            return False
+
+        time.sleep(max(remaining, 0))
+        self.next_poll = time.monotonic() + self.poll_interval
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class ExportWatcher:
+    """
+    Keeps the targets of an exporter current while the source tree changes
+
+    Changes are picked up through inotify where it is available and enough watches are left for the tree,
+    otherwise by polling. A burst of changes is waited out for debounce seconds, then the targets are updated
+    in place with Exporter.update, which only rewrites the output of the folders that changed.
+
+    run has the task interface of workerUtility.Worker and returns once cancel_event is set.
+    """
+
+    def __init__(self, exporter: Exporter, debounce: float = DEFAULT_DEBOUNCE,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL):
+        """
+        :param exporter: Incremental exporter of the targets to keep current, it is updated from the watch thread
+        :param debounce: Seconds without changes before an update starts, at most MAX_DEBOUNCE in all
+        :param poll_interval: Seconds between two checks when the tree is polled
+        """
+
+        if not exporter.incremental:
+            raise ValueError("Watching needs an incremental export")
+
+        self.exporter = exporter
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.description = "Watching %s" % os.path.basename(os.path.abspath(exporter.source_dir))
+
+        self.mode = None  # INOTIFY or POLLING
+        self.poll_reason = None
+        self.updates = 0
+        self.errors = deque(maxlen=MAX_ERRORS)  # (time, message), the latest MAX_ERRORS
+        # Seconds from the first change of a burst to its output being written, and of the update alone
+        self.last_latency = 0.0
+        self.last_seconds = 0.0
+        self.last_time = None
+
+        self._progress_callback = None
+        self._skipped = set()
+        for target in exporter.targets:
+            self._skipped.add(os.path.split(os.path.abspath(target.target_file)))
+
+    def status(self) -> str:
+        """
+        One line for the status bar
+        """
+
+        text = "%s (%s)" % (self.description, self.mode or "starting")
+        if self.poll_reason:
+            text = "%s (%s, %s)" % (self.description, self.mode, self.poll_reason)
+        if self.last_time is not None:
+            text += ": updated %s, %d ms after the change (export %d ms)" % (
+                time.strftime("%H:%M:%S", time.localtime(self.last_time)), self.last_latency * 1000,
+                self.last_seconds * 1000)
+        if self.errors:
+            text += ", last error: %s" % self.errors[-1][1]
+        return text
+
+    def run(self, progress_callback: Callable[[int, float, str], None] = None,
+            cancel_event: threading.Event = None) -> "ExportWatcher":
+        """
+        :param progress_callback: Called with (updates written, latency of the last one in seconds, status) after
+                                  each update that wrote anything and whenever the status changes otherwise
+        :param cancel_event: Set from another thread to stop watching
+        """
+
+        self._progress_callback = progress_callback
+        cancel_event = cancel_event or threading.Event()
+        self.exporter.cancel_event = cancel_event
+
+        watcher = self._open_watcher()
+        try:
+            self._update(time.perf_counter())
+            if not self.updates:
+                self._report()
+            if self.mode == POLLING:
+                watcher.checked(self.last_seconds)
+
+            while not cancel_event.is_set():
+                try:
+                    if not watcher.wait(WAIT_SLICE):
+                        continue
+
+                    # A poll sees changes that are over already, only inotify events come in bursts
+                    first = last = time.perf_counter()
+                    while self.mode == INOTIFY and not cancel_event.is_set() and last - first < MAX_DEBOUNCE:
+                        if watcher.wait(min(self.debounce, WAIT_SLICE)):
+                            last = time.perf_counter()
+                        elif time.perf_counter() - last >= self.debounce:
+                            break
+                except OSError as e:
+                    # Out of watches for a new folder, the whole tree is polled from now on
+                    watcher.close()
+                    watcher = self._polling_watcher(_watch_error_reason(e))
+                    first = time.perf_counter()
+
+                if not cancel_event.is_set():
+                    self._update(first)
+                    if self.mode == POLLING:
+                        watcher.checked(self.last_seconds)
+        except ExportCancelled:
+            pass
+        finally:
+            watcher.close()
+
+        return self
+
+    def _open_watcher(self) -> InotifyWatcher | PollingWatcher:
+        try:
+            watcher = InotifyWatcher(os.path.abspath(self.exporter.source_dir), self._is_relevant)
+        except OSError as e:
+            return self._polling_watcher(_watch_error_reason(e))
+
+        self.mode = INOTIFY
+        return watcher
+
+    def _polling_watcher(self, reason: str) -> PollingWatcher:
+        self.mode = POLLING
+        self.poll_reason = reason
+        self._report()
+        return PollingWatcher(self.poll_interval)
+
+    def _is_relevant(self, folder: str, name: str, is_dir: bool) -> bool:
+        if (folder, name) in self._skipped:
+            return False
+        if is_dir:
+            # The chunks of incremental exports are kept in hidden folders next to their target
+            return not (name.startswith(".") and name.endswith(".chunks"))
+        return name.endswith(".txt") or name == INI_NAME
+
+    def _update(self, changed_at: float) -> None:
+        start = time.perf_counter()
+        try:
+            self.exporter.update()
+        except ExportCancelled:
+            raise
+        except OSError as e:
+            # Typically a file removed while it was read, the next change updates again
+            self.errors.append((time.time(), "%s: %s" % (e.filename or self.exporter.source_dir, e.strerror or e)))
+            self._report()
+            return
+        except Exception as e:
+            # Anything else, like a file changing between its header and its body being read, must not end the watch
+            traceback.print_exc()
+            self.errors.append((time.time(), str(e) or type(e).__name__))
+            self._report()
+            return
+
+        end = time.perf_counter()
+        self.last_seconds = end - start
+        if self.exporter.stats.targets_skipped == len(self.exporter.targets):
+            return
+
+        self.updates += 1
+        self.last_latency = end - changed_at
+        self.last_time = time.time()
+        self._report()
+
+    def _report(self) -> None:
+        if self._progress_callback is not None:
+            self._progress_callback(self.updates, self.last_latency, self.status())
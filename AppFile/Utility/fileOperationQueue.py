@@ -0,0 +1,264 @@
+import errno
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from typing import Callable
+from PySide6.QtCore import QObject, Signal
+from AppFile.Utility import searchIndex, tagIndex
+from AppFile.Utility.workerUtility import Worker
+
+MOVE = "move"
+DELETE = "delete"
+# Minimum seconds between two progress reports
+PROGRESS_INTERVAL = 0.1
+
+
+class OperationCancelled(Exception):
+    pass
+
+
+def is_case_rename(source: str, destination: str) -> bool:
+    """
+    :return: True if destination only differs from source in case and names the same entry, which happens on a
+             case-insensitive filesystem
+    """
+
+    source_name = os.path.basename(source)
+    destination_name = os.path.basename(destination)
+    if source_name == destination_name or source_name.casefold() != destination_name.casefold():
+        return False
+
+    try:
+        return os.path.samestat(os.lstat(source), os.lstat(destination))
+    except OSError:
+        return False
+
+
+class FileOperation:
+    """
+    One job of the file operation queue: moving (or renaming) or deleting a batch of files and folders
+
+    Items are processed in order, an item that fails is recorded and the job goes on with the next one. A
+    cancelled job stops between two files: items already done stay done, a folder half-copied to another
+    filesystem is removed again and its source is left in place.
+    """
+
+    def __init__(self, kind: str, items: list[tuple[str, str | None]], description: str = ""):
+        """
+        :param kind: MOVE or DELETE
+        :param items: (source, destination) pairs, destination is the full new path and None for DELETE
+        :param description: Shown in the status bar while the job runs
+        """
+
+        self.kind = kind
+        self.items = items
+        self.description = description or ("Moving" if kind == MOVE else "Deleting")
+
+        self.completed = []  # items done
+        self.errors = []  # (path, message)
+        self.cancelled = False
+
+        self._progress_callback = None
+        self._cancel_event = None
+        self._progress_done = 0
+        self._progress_total = 0
+        self._progress_bytes = 0
+        self._progress_time = 0.0
+
+    def summary(self) -> str:
+        verb = "Moved" if self.kind == MOVE else "Deleted"
+        text = "%s %d of %d items" % (verb, len(self.completed), len(self.items))
+        if self.cancelled:
+            text += ", cancelled"
+        if self.errors:
+            text += ", %d failed" % len(self.errors)
+        return text
+
+    def run(self, progress_callback: Callable[[int, int, int], None] = None,
+            cancel_event: threading.Event = None) -> "FileOperation":
+        """
+        :param progress_callback: Called with (files done, total files, bytes copied) while running, the total
+                                  grows when an item turns out to be a folder that has to be walked
+        :param cancel_event: Set from another thread to stop the job after the current file
+        """
+
+        self._progress_callback = progress_callback
+        self._cancel_event = cancel_event or threading.Event()
+        self._progress_total = len(self.items)
+
+        try:
+            for source, destination in self.items:
+                self._check_cancelled()
+                try:
+                    if self.kind == MOVE:
+                        self._move(source, destination)
+                        tagIndex.notify_moved(source, destination)
+                        searchIndex.notify_moved(source, destination)
+                    else:
+                        self._delete(source)
+                        tagIndex.notify_removed(source)
+                        searchIndex.notify_removed(source)
+                except OSError as e:
+                    self.errors.append((source, e.strerror or str(e)))
+                    self._notify_partial(source, destination)
+                except OperationCancelled:
+                    self._notify_partial(source, destination)
+                    raise
+                else:
+                    self.completed.append((source, destination))
+                self._advance_progress()
+        except OperationCancelled:
+            self.cancelled = True
+
+        return self
+
+    def _move(self, source: str, destination: str) -> None:
+        if os.path.lexists(destination) and not is_case_rename(source, destination):
+            raise FileExistsError(errno.EEXIST, "Destination exists", destination)
+
+        try:
+            os.rename(source, destination)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+        # Another filesystem, copy everything and only then delete the source
+        try:
+            if os.path.isdir(source) and not os.path.islink(source):
+                self._add_total(sum(len(files) for _, _, files in os.walk(source)))
+                shutil.copytree(source, destination, symlinks=True, copy_function=self._copy_file)
+            else:
+                shutil.copy2(source, destination, follow_symlinks=False)
+        except BaseException:
+            if os.path.isdir(destination) and not os.path.islink(destination):
+                shutil.rmtree(destination, ignore_errors=True)
+            elif os.path.lexists(destination):
+                os.remove(destination)
+            raise
+
+        self._delete(source, cancellable=False)
+
+    def _copy_file(self, source: str, destination: str) -> str:
+        self._check_cancelled()
+        shutil.copy2(source, destination, follow_symlinks=False)
+        self._progress_bytes += os.path.getsize(destination) if not os.path.islink(destination) else 0
+        self._advance_progress()
+        return destination
+
+    def _delete(self, path: str, cancellable: bool = True) -> None:
+        if not os.path.isdir(path) or os.path.islink(path):
+            os.remove(path)
+            return
+
+        for current, dirs, files in os.walk(path, topdown=False):
+            if cancellable:
+                self._add_total(len(files))
+            for name in files:
+                if cancellable:
+                    self._check_cancelled()
+                os.remove(os.path.join(current, name))
+                if cancellable:
+                    self._advance_progress()
+            for name in dirs:
+                dir_path = os.path.join(current, name)
+                if os.path.islink(dir_path):
+                    os.remove(dir_path)
+                else:
+                    os.rmdir(dir_path)
+        os.rmdir(path)
+
+    @staticmethod
+    def _notify_partial(source: str, destination: str | None) -> None:
+        """
+        Reindex the folders around an item that failed or was cancelled partway, part of it may be gone or copied
+        """
+
+        parents = {os.path.dirname(source)}
+        if destination is not None:
+            parents.add(os.path.dirname(destination))
+        for parent in parents:
+            tagIndex.notify_changed(parent)
+            searchIndex.notify_changed(parent)
+
+    def _check_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            raise OperationCancelled()
+
+    def _add_total(self, count: int) -> None:
+        self._progress_total += count
+
+    def _advance_progress(self) -> None:
+        if self._progress_callback is None:
+            return
+
+        self._progress_done += 1
+        now = time.perf_counter()
+        if now - self._progress_time >= PROGRESS_INTERVAL or self._progress_done == self._progress_total:
+            self._progress_time = now
+            self._progress_callback(self._progress_done, self._progress_total, self._progress_bytes)
+
+
+class FileOperationQueue(QObject):
+    """
+    Runs file operations one job at a time on the worker pool, so jobs never race on the same paths
+
+    A job is a FileOperation or anything with the same run, summary, kind, items, completed and errors, like
+    importUtility.Importer.
+
+    job_finished is emitted once per job, also when it was cancelled or failed, with the job telling which
+    items were done.
+    """
+
+    job_started = Signal(object)
+    job_progress = Signal(object, object, object, object)  # job, done, total, bytes
+    job_finished = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.pending = deque()
+        self.current = None
+        self.worker = None
+
+    def is_busy(self) -> bool:
+        return self.current is not None
+
+    def enqueue(self, job: FileOperation) -> None:
+        self.pending.append(job)
+        self._start_next()
+
+    def cancel_all(self) -> None:
+        self.pending.clear()
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def _start_next(self) -> None:
+        if self.current is not None or not self.pending:
+            return
+
+        job = self.current = self.pending.popleft()
+        self.worker = Worker(job.run)
+        self.worker.signals.progress.connect(lambda done, total, size: self.job_progress.emit(job, done, total, size))
+        self.worker.signals.finished.connect(self._job_done)
+        self.worker.signals.failed.connect(lambda message: self._job_failed(job, message))
+        self.worker.signals.cancelled.connect(lambda: self._job_cancelled(job))
+        self.job_started.emit(job)
+        self.worker.start()
+
+    def _job_failed(self, job: FileOperation, message: str) -> None:
+        job.errors.append(("", message))
+        self._job_done(job)
+
+    def _job_cancelled(self, job: FileOperation) -> None:
+        # The job raised after being cancelled instead of returning, it did not get to record that itself
+        job.cancelled = True
+        self._job_done(job)
+
+    def _job_done(self, job: FileOperation) -> None:
+        self.current = None
+        self.worker = None
+        self.job_finished.emit(job)
+        self._start_next()
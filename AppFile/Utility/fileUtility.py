@@ -1,12 +1,14 @@
-import configparser
 import os
-import shutil
 from PySide6.QtCore import QDir
 from PySide6.QtWidgets import QFileDialog, QInputDialog, QMessageBox
 from AppFile import singleton
-from AppFile.WorkArea.PreviewTab.textEditTab import TextEditTab
+from AppFile.Menu.importMenu import ImportMenu
+from AppFile.Menu.tagMenu import TagMenu
+from AppFile.Utility import searchIndex, tagIndex
+from AppFile.Utility.contextConfig import INI_NAME, context_config, write_context_ini
+from AppFile.Utility.fileOperationQueue import DELETE, MOVE, FileOperation
 
-CONFIG_FILE_NAME = '.context.ini'
+CONFIG_FILE_NAME = INI_NAME
 
 
 def open_folder():
@@ -25,6 +27,10 @@ def open_folder():
         main_win.delegate_root_dir_changed()
         current_dir.cd(path)
 
+        tagIndex.open_index(path).sync_in_background()
+
+        searchIndex.open_index(path).sync_in_background()
+
 
 def new_folder():
     main_win = singleton.SingletonMainWin()
@@ -38,6 +44,8 @@ def new_folder():
 
     if ok and folder_name:
         index = sys_model.mkdir(parent_index, folder_name)
+        tagIndex.notify_changed(sys_model.filePath(index))
+        searchIndex.notify_changed(sys_model.filePath(index))
         return sys_model.filePath(index)
     else:
         return None
@@ -49,19 +57,14 @@ def new_context_folder():
 
 
 def create_config_file_at_path(path, prio=0):
-    file_path = os.path.join(path, CONFIG_FILE_NAME)
-
-    config = configparser.ConfigParser()
-    config['Context Folder Configuration'] = {
-        'priority': str(prio),
-        'tags': '',  # comma separated
-    }
-    with open(file_path, 'w') as file:
-        config.write(file)
+    write_context_ini(path, prio)
+    context_config.invalidate(path)
+    tagIndex.notify_changed(path)
+    searchIndex.notify_changed(path)
 
 
 def is_path_context_folder(path):
-    return os.path.exists(os.path.join(path, CONFIG_FILE_NAME))
+    return context_config.is_context_folder(path)
 
 
 def new_file():
@@ -76,10 +79,33 @@ def new_file():
         file_name = file_name_in_txt(file_name)
         file_path = os.path.join(parent_path, file_name)
         open(file_path, 'w').close()
+        tagIndex.notify_changed(file_path)
+        searchIndex.notify_changed(file_path)
 
 
 def import_dir():
-    pass
+    main_win = singleton.SingletonMainWin()
+
+    file_dialog = QFileDialog()
+    path = file_dialog.getExistingDirectory(main_win, 'Folder to import', QDir.homePath())
+
+    if path:
+        ImportMenu(path).exec()
+
+
+def edit_tags(paths=None):
+    """
+    Add, remove or rename a tag in the files and context folders at paths and below, in the background
+
+    :param paths: A path or a list of paths, the current directory if None
+    """
+
+    if paths is None:
+        paths = [singleton.SingletonCurrentDir().absolutePath()]
+    elif isinstance(paths, str):
+        paths = [paths]
+
+    TagMenu(paths).exec()
 
 
 def rename(current_file_path=None):
@@ -93,46 +119,60 @@ def rename(current_file_path=None):
 
     if ok and new_name:
         new_file_path = os.path.join(os.path.dirname(current_file_path), new_name)
-        shutil.move(current_file_path, new_file_path)
+        main_win.file_operations.enqueue(FileOperation(
+            MOVE, [(current_file_path, new_file_path)], 'Renaming %s' % os.path.basename(current_file_path)))
 
 
-def remove(current_file_path=None):
+def remove(paths=None):
+    """
+    Delete the files and folders at paths in the background after one confirmation
+
+    :param paths: A path or a list of paths, the current directory if None
+    """
+
     main_win = singleton.SingletonMainWin()
     current_dir = singleton.SingletonCurrentDir()
-    sys_model = singleton.SingletonSysModel()
 
-    if current_file_path is None:
-        current_file_path = current_dir.absolutePath
-
-    index = sys_model.index(current_file_path)
-
-    if os.path.isdir(current_file_path):
-        if os.listdir(current_dir.absolutePath()):
-            ok = QMessageBox.warning(main_win, 'Delete non empty directory %s' % current_file_path, 'confirm?', QMessageBox.Yes | QMessageBox.No)
-            if ok:
-                sys_model.remove(index)
-        else:
-            ok = QMessageBox.question(main_win, 'Delete empty directory %s' % current_file_path, 'confirm?', QMessageBox.Yes | QMessageBox.No)
-            if ok:
-                sys_model.rmdir(index)
+    if paths is None:
+        paths = [current_dir.absolutePath()]
+    elif isinstance(paths, str):
+        paths = [paths]
+
+    if len(paths) > 1:
+        title = 'Delete %d items' % len(paths)
+    elif os.path.isdir(paths[0]):
+        title = 'Delete %s directory %s' % ('non empty' if os.listdir(paths[0]) else 'empty', paths[0])
     else:
-        ok = QMessageBox.warning(main_win, 'Delete file at %s' % current_file_path, 'confirm?', QMessageBox.Yes | QMessageBox.No)
-        if ok:
-            sys_model.remove(index)
+        title = 'Delete file at %s' % paths[0]
+
+    ok = QMessageBox.warning(main_win, title, 'confirm?', QMessageBox.Yes | QMessageBox.No)
+    if ok == QMessageBox.Yes:
+        main_win.file_operations.enqueue(FileOperation(
+            DELETE, [(path, None) for path in paths], 'Deleting %d items' % len(paths)))
+
 
+def move_to(paths=None):
+    """
+    Move the files and folders at paths into a chosen directory in the background
+
+    :param paths: A path or a list of paths, the current directory if None
+    """
 
-def move_to(current_file_path=None):
     main_win = singleton.SingletonMainWin()
     current_dir = singleton.SingletonCurrentDir()
 
-    if current_file_path is None:
-        current_file_path = current_dir.absolutePath
+    if paths is None:
+        paths = [current_dir.absolutePath()]
+    elif isinstance(paths, str):
+        paths = [paths]
 
     file_dialog = QFileDialog()
     target_path = file_dialog.getExistingDirectory(main_win, 'Destination directory', current_dir.absolutePath())
 
     if target_path:
-        shutil.move(current_file_path, target_path)
+        main_win.file_operations.enqueue(FileOperation(
+            MOVE, [(path, os.path.join(target_path, os.path.basename(path))) for path in paths],
+            'Moving %d items to %s' % (len(paths), target_path)))
 
 
 def file_name_in_txt(file_name):
@@ -150,22 +190,5 @@ def open_file(current_file_path):
         preview_area = main_win.preview_area
 
         if not os.path.isdir(current_file_path):
-            if check_file_opened_in_tab(preview_area, current_file_path):
-                pass
-            else:
-                new_tab = TextEditTab(current_file_path)
-                preview_area.addTab(new_tab, os.path.basename(current_file_path))
-                preview_area.setCurrentWidget(new_tab)
-
-
-def check_file_opened_in_tab(preview_area, path):
-    for index in range(preview_area.count()):
-        widget_at_index = preview_area.widget(index)
-
-        if isinstance(widget_at_index, TextEditTab):
-            if widget_at_index.file_path == path:
-                # File is already open, highlight the existing tab
-                preview_area.setCurrentIndex(index)
-                return True
-
-    return False
+            # Highlights the existing tab if the file is already open
+            preview_area.open_tab(current_file_path)
@@ -0,0 +1,360 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterator, TypeVar
+from AppFile.Utility import searchIndex, tagIndex
+from AppFile.Utility.contextConfig import INI_NAME, context_config, write_context_ini
+from AppFile.Utility.exportUtility import DEFAULT_BUFFER_SIZE, copy_range
+from AppFile.Utility.tempFileUtility import create_temp_file, remove_temp_file
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+IMPORT = "import"
+DEFAULT_WORKERS = 4
+DEFAULT_CONVERT_EXTENSIONS = (".md", ".markdown", ".rst", ".text", ".asc")
+# Minimum seconds between two progress reports
+PROGRESS_INTERVAL = 0.1
+# Bytes read when checking that a file to convert is text
+TEXT_PROBE_SIZE = 8 * 1024
+# linux/fs.h, the constant is only exposed by fcntl from Python 3.12
+FICLONE = getattr(fcntl, "FICLONE", 0x40049409)
+# Indexes of a source folder that is a project itself, with their -wal and -shm files
+INDEX_NAMES = (tagIndex.INDEX_NAME, searchIndex.INDEX_NAME)
+
+T = TypeVar("T")
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+def file_digest(path: str, buffer: bytearray) -> bytes:
+    digest = hashlib.blake2b()
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                return digest.digest()
+            digest.update(view[:count])
+
+
+def is_text(path: str) -> bool:
+    """
+    :return: False if the start of the file has a NUL byte, like binary files
+    """
+
+    with open(path, "rb") as f:
+        return b"\0" not in f.read(TEXT_PROBE_SIZE)
+
+
+def converted_chunks(path: str, encoding: str) -> Iterator[bytes]:
+    """
+    The text of a file read as encoding, in UTF-8 chunks with "\n" line ends
+
+    :raise UnicodeDecodeError: At the first chunk that is not valid in encoding
+    """
+
+    with open(path, "rb") as f:
+        text = io.TextIOWrapper(f, encoding=encoding, newline=None)
+        while True:
+            chunk = text.read(DEFAULT_BUFFER_SIZE)
+            if not chunk:
+                return
+            yield chunk.encode("utf-8")
+
+
+def convert_to_text(path: str, consume: Callable[[Iterator[bytes]], T]) -> T:
+    """
+    Stream a text file as UTF-8 with "\n" line ends, read as UTF-8 or, if it is not, as Latin-1
+
+    :param consume: Called with the chunks; after a decode error it is called again with the Latin-1 chunks from
+                    the start, so it has to start over
+    :return: What consume returned
+    """
+
+    try:
+        return consume(converted_chunks(path, "utf-8-sig"))
+    except UnicodeDecodeError:
+        return consume(converted_chunks(path, "latin-1"))
+
+
+def chunks_digest(chunks: Iterator[bytes]) -> tuple[int, bytes]:
+    """
+    :return: (size, digest) of the chunks, comparable to the size and file_digest of a file
+    """
+
+    digest = hashlib.blake2b()
+    size = 0
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    return size, digest.digest()
+
+
+def write_chunks(out: io.BufferedIOBase, chunks: Iterator[bytes]) -> int:
+    """
+    Replace the content of out with the chunks
+
+    :return: Number of bytes written
+    """
+
+    out.seek(0)
+    out.truncate()
+    size = 0
+    for chunk in chunks:
+        out.write(chunk)
+        size += len(chunk)
+    return size
+
+
+def clone_or_copy(source_fd: int, out_fd: int, buffer: bytearray) -> int:
+    """
+    Copy all of source_fd into the empty out_fd, sharing the blocks through a reflink where the filesystem
+    supports it, else through copy_range
+
+    :return: Number of bytes copied
+    """
+
+    if fcntl is not None and sys.platform.startswith("linux"):
+        try:
+            fcntl.ioctl(out_fd, FICLONE, source_fd)
+            return os.fstat(out_fd).st_size
+        except OSError:
+            pass
+
+    return copy_range(source_fd, out_fd, 0, buffer)
+
+
+class Importer:
+    """
+    Copies a folder tree into a project folder with a pool of copy workers
+
+    Files whose copy already exists with the same size and content are skipped, so importing the same folder
+    again only brings in what changed; a changed file replaces its copy. Every file is written to a temporary
+    name and renamed into place, a cancelled import never leaves a partial file behind.
+    """
+
+    def __init__(self, source_dir: str, target_dir: str, convert_extensions: tuple[str, ...] = (),
+                 create_context_config: bool = False, workers: int = DEFAULT_WORKERS):
+        """
+        :param source_dir: Folder to import, it is copied as a whole into target_dir
+        :param target_dir: Project folder receiving the copy
+        :param convert_extensions: Text files with these extensions are imported as UTF-8 .txt files
+        :param create_context_config: Give every imported folder without one a default .context.ini
+        :param workers: Files copied in parallel
+        """
+
+        self.kind = IMPORT
+        self.source_dir = os.path.abspath(source_dir)
+        self.target_root = os.path.join(os.path.abspath(target_dir), os.path.basename(self.source_dir))
+        self.convert_extensions = tuple(extension.lower() for extension in convert_extensions)
+        self.create_context_config = create_context_config
+        self.workers = max(workers, 1)
+        self.description = "Importing %s" % os.path.basename(self.source_dir)
+
+        self.items = [(self.source_dir, self.target_root)]
+        self.completed = []
+        self.errors = []  # (path, message)
+        self.cancelled = False
+
+        self.files_copied = 0
+        self.files_skipped = 0
+        self.files_converted = 0
+        self.bytes_copied = 0
+
+        self._progress_callback = None
+        self._cancel_event = None
+        self._progress_done = 0
+        self._progress_total = 0
+        self._progress_time = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def summary(self) -> str:
+        text = "Imported %d files (%d converted), %d unchanged, %.1f MB" % (
+            self.files_copied, self.files_converted, self.files_skipped, self.bytes_copied / (1024 * 1024))
+        if self.cancelled:
+            text += ", cancelled"
+        if self.errors:
+            text += ", %d failed" % len(self.errors)
+        return text
+
+    def run(self, progress_callback: Callable[[int, int, int], None] = None,
+            cancel_event: threading.Event = None) -> "Importer":
+        """
+        :param progress_callback: Called with (files done, total files, bytes copied) while importing
+        :param cancel_event: Set from another thread to stop the import after the files being copied
+        """
+
+        self._progress_callback = progress_callback
+        self._cancel_event = cancel_event or threading.Event()
+
+        if self.target_root == self.source_dir or self.target_root.startswith(os.path.join(self.source_dir, "")):
+            self.errors.append((self.source_dir, "Cannot import a folder into itself"))
+            return self
+
+        try:
+            directories, files = self._plan()
+            for source, directory in directories:
+                os.makedirs(directory, exist_ok=True)
+            if self.create_context_config:
+                for source, directory in directories:
+                    # A folder that is a context folder already keeps its own .context.ini
+                    if not os.path.exists(os.path.join(source, INI_NAME)) and \
+                            not os.path.exists(os.path.join(directory, INI_NAME)):
+                        write_context_ini(directory)
+                        context_config.invalidate(directory)
+
+            self._progress_total = len(files)
+            self._copy_all(files)
+        except ImportCancelled:
+            self.cancelled = True
+        except OSError as e:
+            self.errors.append((e.filename or self.source_dir, e.strerror or str(e)))
+        finally:
+            if os.path.isdir(self.target_root):
+                # Also after a cancelled import, the files copied so far stay
+                self.completed.append((self.target_root, None))
+                # One update for the whole imported tree
+                tagIndex.notify_changed(self.target_root)
+                searchIndex.notify_changed(self.target_root)
+
+        return self
+
+    def _plan(self) -> tuple[list[tuple[str, str]], list[tuple[str, str, bool]]]:
+        """
+        A converted file whose .txt name is already taken by another file or folder is left out and reported,
+        among converted files of the same stem the first by name is imported.
+
+        :return: (source, target) of every folder in creation order, (source, target, convert) of every file
+        """
+
+        directories = []
+        files = []
+        pending = [(self.source_dir, self.target_root)]
+        while pending:
+            self._check_cancelled()
+            source, target = pending.pop()
+            directories.append((source, target))
+            taken = {}  # target name : source path
+            converted = []
+            with os.scandir(source) as it:
+                for entry in it:
+                    if entry.name.startswith(INDEX_NAMES):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        taken[entry.name] = entry.path
+                        pending.append((entry.path, os.path.join(target, entry.name)))
+                    elif entry.is_file():
+                        stem, extension = os.path.splitext(entry.name)
+                        if extension.lower() in self.convert_extensions:
+                            converted.append((entry.name, stem + ".txt", entry.path))
+                        else:
+                            taken[entry.name] = entry.path
+                            files.append((entry.path, os.path.join(target, entry.name), False))
+
+            for name, target_name, path in sorted(converted):
+                if target_name in taken:
+                    self.errors.append((path, "Not imported, %s is already imported from %s" % (
+                        target_name, os.path.basename(taken[target_name]))))
+                else:
+                    taken[target_name] = path
+                    files.append((path, os.path.join(target, target_name), True))
+
+        return directories, files
+
+    def _copy_all(self, files: list[tuple[str, str, bool]]) -> None:
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            queued = iter(files)
+            running = set()
+            try:
+                while True:
+                    # Keep a few files per worker in flight, so cancelling does not wait for a long queue
+                    for source, target, convert in queued:
+                        running.add(pool.submit(self._import_file, source, target, convert))
+                        if len(running) >= self.workers * 2:
+                            break
+                    if not running:
+                        return
+
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                        self._advance_progress()
+            finally:
+                for future in running:
+                    future.cancel()
+
+    def _import_file(self, source: str, target: str, convert: bool) -> None:
+        self._check_cancelled()
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = bytearray(DEFAULT_BUFFER_SIZE)
+
+        try:
+            stat_result = os.stat(source)
+            if convert and not is_text(source):
+                # Not text after all, imported unchanged under its own name
+                convert = False
+                target = os.path.join(os.path.dirname(target), os.path.basename(source))
+
+            if self._is_identical(source, target, stat_result.st_size, convert, buffer):
+                with self._lock:
+                    self.files_skipped += 1
+                return
+
+            fd, temp_path = create_temp_file(target)
+            try:
+                with open(fd, "wb") as out:
+                    if convert:
+                        copied = convert_to_text(source, lambda chunks: write_chunks(out, chunks))
+                    else:
+                        with open(source, "rb") as f:
+                            copied = clone_or_copy(f.fileno(), out.fileno(), buffer)
+                os.utime(temp_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+                os.replace(temp_path, target)
+            except BaseException:
+                remove_temp_file(temp_path)
+                raise
+        except OSError as e:
+            with self._lock:
+                self.errors.append((source, e.strerror or str(e)))
+            return
+
+        with self._lock:
+            self.files_copied += 1
+            self.files_converted += convert
+            self.bytes_copied += copied
+
+    def _is_identical(self, source: str, target: str, size: int, convert: bool, buffer: bytearray) -> bool:
+        try:
+            target_size = os.stat(target).st_size
+        except OSError:
+            return False
+
+        if convert:
+            return convert_to_text(source, chunks_digest) == (target_size, file_digest(target, buffer))
+
+        return target_size == size and file_digest(source, buffer) == file_digest(target, buffer)
+
+    def _check_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            raise ImportCancelled()
+
+    def _advance_progress(self) -> None:
+        if self._progress_callback is None:
+            return
+
+        self._progress_done += 1
+        now = time.perf_counter()
+        if now - self._progress_time >= PROGRESS_INTERVAL or self._progress_done == self._progress_total:
+            self._progress_time = now
+            self._progress_callback(self._progress_done, self._progress_total, self.bytes_copied)
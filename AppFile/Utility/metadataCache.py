@@ -0,0 +1,195 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+FILE_TAGS = "%Tag"
+FILE_NOTES = "%Note"
+TAG_DELIMINATOR = ","
+META_START_SIGNAL = "#METADATA_START"
+META_END_SIGNAL = "#METADATA_END"
+# Header given to a file without one, with the values of its %Tag line filled in
+META_HEADER_TEMPLATE = (META_START_SIGNAL + "-" * 66 + " \n " + FILE_TAGS + ": {}\n\n " + FILE_NOTES + ": \n " +
+                        "-" * 66 + META_END_SIGNAL + "\n")
+
+# Only this many bytes from the start of a file are read when looking for the metadata header, the first read
+# takes HEADER_PROBE_SIZE bytes and only a header running past them is read further
+HEADER_PROBE_SIZE = 4 * 1024
+HEADER_SCAN_LIMIT = 64 * 1024
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Rough per-entry bookkeeping cost used for the memory cap, on top of the stored strings
+ENTRY_OVERHEAD = 256
+
+
+class FileHeader:
+    """
+    Parsed #METADATA_START/#METADATA_END header of a text file
+    """
+
+    __slots__ = ("has_metadata", "tags", "notes", "body_offset")
+
+    def __init__(self, has_metadata: bool = False, tags: tuple[str, ...] = (), notes: str = "",
+                 body_offset: int = 0):
+        """
+        :param has_metadata: Whether the file starts with a metadata header
+        :param tags: Values of the %Tag line
+        :param notes: Value of the %Note line and the lines following it
+        :param body_offset: Byte offset of the first byte after the header, 0 if there is none
+        """
+
+        self.has_metadata = has_metadata
+        self.tags = tags
+        self.notes = notes
+        self.body_offset = body_offset
+
+
+EMPTY_HEADER = FileHeader()
+
+
+def header_end(head: bytes) -> int:
+    """
+    :return: Offset of the first byte after the line of the end signal, 0 if head has no end signal
+    """
+
+    end_index = head.find(META_END_SIGNAL.encode())
+    if end_index == -1:
+        return 0
+
+    line_end = head.find(b"\n", end_index)
+    return line_end + 1 if line_end != -1 else len(head)
+
+
+def parse_header(head: bytes) -> FileHeader:
+    """
+    Parse the metadata header from the first bytes of a file
+
+    The first line of a header is the start signal, also between dashes and spaces, and its tags are those of
+    its first %Tag line. Only the header of a file starting with the start signal itself is left out of exports
+    and gets a body_offset, any other header is part of the body.
+    """
+
+    line_end = head.find(b"\n")
+    first_line = head[:line_end if line_end != -1 else len(head)].decode(errors="replace")
+    has_metadata = first_line.strip("- \r") == META_START_SIGNAL
+    starts_with_signal = head.startswith(META_START_SIGNAL.encode())
+    if not has_metadata and not starts_with_signal:
+        return EMPTY_HEADER
+
+    end = header_end(head)
+    if not end:
+        return EMPTY_HEADER
+
+    tags = None
+    notes = []
+    in_notes = False
+    for line in head[:end].decode(errors="replace").splitlines()[1:]:
+        key, _, value = line.partition(":")
+        key = key.strip(" -\r")
+
+        if key.endswith(META_END_SIGNAL):
+            break
+        elif key == FILE_TAGS:
+            if tags is None:
+                tags = tuple(sys.intern(tag) for tag in map(lambda tag: tag.strip("\r\n "),
+                                                            value.split(TAG_DELIMINATOR)) if tag)
+            in_notes = False
+        elif key == FILE_NOTES:
+            notes.append(value.strip())
+            in_notes = True
+        elif key.startswith("%"):
+            in_notes = False
+        elif in_notes and line.strip():
+            notes.append(line.strip())
+
+    return FileHeader(has_metadata, tags if has_metadata and tags else (), "\n".join(notes).strip(),
+                      end if starts_with_signal else 0)
+
+
+def _header_incomplete(head: bytes) -> bool:
+    if not head.lstrip(b"- ").startswith(META_START_SIGNAL.encode()):
+        return False
+
+    end_index = head.find(META_END_SIGNAL.encode())
+    return end_index == -1 or head.find(b"\n", end_index) == -1
+
+
+def read_header(file_path: str) -> FileHeader:
+    with open(file_path, "rb", buffering=0) as f:
+        head = f.read(HEADER_PROBE_SIZE)
+        if len(head) == HEADER_PROBE_SIZE and _header_incomplete(head):
+            head += f.read(HEADER_SCAN_LIMIT - len(head))
+
+    return parse_header(head)
+
+
+class MetadataCache:
+    """
+    LRU cache of parsed file headers, an entry is valid while the file's mtime and size are unchanged
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # path : (mtime_ns, size, header, cost)
+        self._lock = threading.Lock()
+
+    def get(self, file_path: str, stat_result: os.stat_result = None) -> FileHeader:
+        if stat_result is None:
+            stat_result = os.stat(file_path)
+
+        header = self.lookup(file_path, stat_result)
+        if header is None:
+            header = self.load(file_path, stat_result)
+
+        return header
+
+    def lookup(self, file_path: str, stat_result: os.stat_result) -> FileHeader | None:
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is None or entry[0] != stat_result.st_mtime_ns or entry[1] != stat_result.st_size:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(file_path)
+            self.hits += 1
+            return entry[2]
+
+    def load(self, file_path: str, stat_result: os.stat_result) -> FileHeader:
+        header = read_header(file_path)
+        cost = ENTRY_OVERHEAD + len(file_path) + sum(map(len, header.tags)) + len(header.notes)
+
+        with self._lock:
+            self._discard(file_path)
+            self._entries[file_path] = (stat_result.st_mtime_ns, stat_result.st_size, header, cost)
+            self.current_bytes += cost
+
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, _, evicted_cost) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_cost
+
+        return header
+
+    def invalidate(self, file_path: str) -> None:
+        with self._lock:
+            self._discard(file_path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _discard(self, file_path: str) -> None:
+        entry = self._entries.pop(file_path, None)
+        if entry is not None:
+            self.current_bytes -= entry[3]
+
+
+# Process-wide cache shared by the exporter, the tree view and the editor
+metadata_cache = MetadataCache()
+
+
+def get_file_metadata(file_path: str, stat_result: os.stat_result = None) -> FileHeader:
+    return metadata_cache.get(file_path, stat_result)
@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+
+def escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class ProjectIndex(ABC):
+    """
+    Base of the project-local SQLite indexes kept in a file under a root directory
+
+    A subclass names its file, schema and tables and implements sync. Paths are stored relative to the root. The
+    connection is shared by all threads behind one lock; once close has been called, the background syncs stop
+    and updates are ignored.
+    """
+
+    index_name = ""
+    schema_version = 0
+    schema = ""
+    tables = ()
+
+    def __init__(self, root_dir: str):
+        self.root_dir = os.path.abspath(root_dir)
+        self.index_path = os.path.join(self.root_dir, self.index_name)
+
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        self._sync_threads = []
+        self._connection = sqlite3.connect(self.index_path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+
+        if self._connection.execute("PRAGMA user_version").fetchone()[0] != self.schema_version:
+            self._connection.executescript("".join("DROP TABLE IF EXISTS %s;" % table for table in self.tables))
+            self._connection.execute("PRAGMA user_version=%d" % self.schema_version)
+        self._connection.executescript(self.schema)
+
+    def close(self) -> None:
+        """
+        Stop the background syncs and close the connection once they are done with it, later updates are ignored
+        """
+
+        self._closed.set()
+        for thread in self._sync_threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+        with self._lock:
+            self._connection.close()
+
+    # Path helpers
+    def relative_path(self, path: str) -> str | None:
+        """
+        :return: path relative to the index root, "" for the root itself, None if path is outside the root
+        """
+
+        path = os.path.abspath(path)
+        if path == self.root_dir:
+            return ""
+
+        prefix = os.path.join(self.root_dir, "")
+        if not path.startswith(prefix):
+            return None
+
+        return path[len(prefix):]
+
+    def absolute_path(self, rel_path: str) -> str:
+        return os.path.join(self.root_dir, rel_path) if rel_path else self.root_dir
+
+    # Revalidation
+    @abstractmethod
+    def sync(self, directory: str = None) -> None:
+        """
+        Bring the index up to date for directory and everything below it, the whole root by default
+        """
+
+    def sync_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.sync, daemon=True)
+        self._sync_threads = [other for other in self._sync_threads if other.is_alive()] + [thread]
+        thread.start()
+        return thread
+
+    @abstractmethod
+    def update_path(self, path: str) -> None:
+        """
+        Reindex a file or folder after it was created or changed, removing it if it no longer exists
+        """
+
+    @abstractmethod
+    def remove_path(self, path: str) -> None:
+        """
+        Drop a removed file or folder and everything below it
+        """
+
+    @abstractmethod
+    def move_path(self, old_path: str, new_path: str) -> None:
+        """
+        Follow a file or folder to the path it was moved to
+        """
+
+
+class IndexRegistry:
+    """
+    The current index of one kind, the one of the project folder open in the application, and the hooks through
+    which file operations keep it up to date
+    """
+
+    def __init__(self, index_class: type[ProjectIndex]):
+        self.index_class = index_class
+        self.current = None
+
+    def open_index(self, root_dir: str) -> ProjectIndex:
+        """
+        Make the index of root_dir the current one, closing the previous index
+        """
+
+        if self.current is not None:
+            if self.current.root_dir == os.path.abspath(root_dir):
+                return self.current
+            self.current.close()
+
+        self.current = self.index_class(root_dir)
+        return self.current
+
+    def current_index(self) -> ProjectIndex | None:
+        return self.current
+
+    def index_for(self, path: str) -> ProjectIndex | None:
+        """
+        :return: The current index if path lies under its root
+        """
+
+        index = self.current
+        if index is not None and index.relative_path(path) is not None:
+            return index
+
+        return None
+
+    # Hooks for file operations, no-ops when no index covers the path
+    def notify_changed(self, path: str) -> None:
+        index = self.index_for(path)
+        if index is not None:
+            index.update_path(path)
+
+    def notify_removed(self, path: str) -> None:
+        index = self.index_for(path)
+        if index is not None:
+            index.remove_path(path)
+
+    def notify_moved(self, old_path: str, new_path: str) -> None:
+        index = self.index_for(old_path) or self.index_for(new_path)
+        if index is not None:
+            index.move_path(old_path, new_path)
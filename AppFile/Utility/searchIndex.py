@@ -0,0 +1,342 @@
+import os
+import re
+from AppFile.Utility.metadataCache import HEADER_SCAN_LIMIT, parse_header
+from AppFile.Utility.projectIndex import IndexRegistry, ProjectIndex, escape_like
+
+INDEX_NAME = ".creatiview_search.sqlite"
+SCHEMA_VERSION = 1
+
+# A line's rowid is its document id shifted left by LINE_BITS plus its 0-based line number
+LINE_BITS = 24
+LINE_MASK = (1 << LINE_BITS) - 1
+# Files reindexed per transaction while syncing, the index stays queryable between transactions
+SYNC_BATCH_SIZE = 200
+# Bytes read ahead of one transaction while syncing, a batch of large files is committed early
+SYNC_BATCH_BYTES = 16 * 1024 * 1024
+# Only the lines in the first MAX_INDEXED_SIZE bytes of a file are searchable, so a huge file, like an export
+# written into the project, neither fills the index nor holds it for long
+MAX_INDEXED_SIZE = 4 * 1024 * 1024
+DEFAULT_RESULT_LIMIT = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS doc_tags (
+    tag TEXT NOT NULL,
+    doc INTEGER NOT NULL,
+    PRIMARY KEY (tag, doc)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS doc_tags_doc ON doc_tags (doc);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines USING fts5(text, tokenize="unicode61 remove_diacritics 2");
+"""
+
+_QUERY_TOKEN = re.compile(r'"([^"]*)"?|(\S+)')
+TAG_PREFIX = "tag:"
+
+
+def parse_query(query: str) -> tuple[str, list[str]]:
+    """
+    Split a search query into an FTS5 match expression and tag restrictions
+
+    Words and "quoted phrases" must all occur in a line, tag:<name> restricts results to files with that
+    %Tag in their metadata header.
+
+    :return: (match expression, "" if the query has no words, tags)
+    """
+
+    terms = []
+    tags = []
+    for match in _QUERY_TOKEN.finditer(query):
+        phrase, word = match.groups()
+        if word is not None and word.startswith(TAG_PREFIX):
+            if word[len(TAG_PREFIX):]:
+                tags.append(word[len(TAG_PREFIX):])
+            continue
+
+        text = phrase if phrase is not None else word
+        if text.strip():
+            terms.append('"%s"' % text.replace('"', '""'))
+
+    return " AND ".join(terms), tags
+
+
+class SearchResult:
+    __slots__ = ("path", "line_number", "text")
+
+    def __init__(self, path: str, line_number: int, text: str):
+        """
+        :param path: Absolute path of the file
+        :param line_number: 1-based line number in the file, counting the metadata header
+        :param text: The matching line
+        """
+
+        self.path = path
+        self.line_number = line_number
+        self.text = text
+
+
+class SearchIndex(ProjectIndex):
+    """
+    Project-local SQLite FTS5 index of the body lines of every .txt file under a root directory
+
+    Each body line is one row, so a match carries its line number and phrases match within a line. Files are
+    reindexed only when their mtime or size changed since they were read. Files are read and split into lines
+    outside the lock, it is only held to store them.
+    """
+
+    index_name = INDEX_NAME
+    schema_version = SCHEMA_VERSION
+    schema = _SCHEMA
+    tables = ("docs", "doc_tags", "lines")
+
+    def __init__(self, root_dir: str):
+        super().__init__(root_dir)
+        self.syncing = False
+
+    # Revalidation
+    def sync(self, directory: str = None) -> None:
+        """
+        Bring the index up to date for directory and everything below it, reindexing only changed files
+        """
+
+        rel_dir = self.relative_path(directory or self.root_dir)
+        if rel_dir is None or not os.path.isdir(self.absolute_path(rel_dir)):
+            return
+
+        self.syncing = True
+        try:
+            on_disk = {}
+            pending = [rel_dir]
+            while pending and not self._closed.is_set():
+                current = pending.pop()
+                try:
+                    with os.scandir(self.absolute_path(current)) as it:
+                        for entry in it:
+                            rel_path = os.path.join(current, entry.name) if current else entry.name
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.append(rel_path)
+                            elif entry.name.endswith(".txt") and entry.is_file():
+                                on_disk[rel_path] = entry.stat()
+                except OSError:
+                    continue
+
+            stored = self._stored_docs(rel_dir)
+            changed = [rel_path for rel_path, stat_result in on_disk.items()
+                       if stored.get(rel_path, (None,))[1:] != (stat_result.st_mtime_ns, stat_result.st_size)]
+
+            batch = []
+            batch_bytes = 0
+            for rel_path in changed:
+                if self._closed.is_set():
+                    return
+                document = self._read_document(rel_path)
+                if document is not None:
+                    batch.append((rel_path, on_disk[rel_path], document))
+                    batch_bytes += document[2]
+                if len(batch) >= SYNC_BATCH_SIZE or batch_bytes >= SYNC_BATCH_BYTES:
+                    if not self._store_documents(batch):
+                        return
+                    batch = []
+                    batch_bytes = 0
+            if batch and not self._store_documents(batch):
+                return
+
+            removed = stored.keys() - on_disk.keys()
+            if removed:
+                with self._lock:
+                    if self._closed.is_set():
+                        return
+                    self._connection.execute("BEGIN")
+                    for rel_path in removed:
+                        self._delete_doc(stored[rel_path][0])
+                    self._connection.execute("COMMIT")
+        finally:
+            self.syncing = False
+
+    def update_path(self, path: str) -> None:
+        """
+        Reindex a file or folder after it was created or changed, removing it if it no longer exists
+        """
+
+        rel_path = self.relative_path(path)
+        if rel_path is None:
+            return
+
+        abs_path = self.absolute_path(rel_path)
+        if os.path.isdir(abs_path):
+            self.sync(abs_path)
+        elif os.path.isfile(abs_path) and abs_path.endswith(".txt"):
+            stat_result = os.stat(abs_path)
+            document = self._read_document(rel_path)
+            if document is not None:
+                self._store_documents([(rel_path, stat_result, document)])
+        else:
+            self.remove_path(abs_path)
+
+    def remove_path(self, path: str) -> None:
+        rel_path = self.relative_path(path)
+        if not rel_path:
+            return
+
+        with self._lock:
+            if self._closed.is_set():
+                return
+            doc_ids = list(self._stored_docs(rel_path, include_self=True).values())
+            self._connection.execute("BEGIN")
+            for doc_id, mtime_ns, size in doc_ids:
+                self._delete_doc(doc_id)
+            self._connection.execute("COMMIT")
+
+    def move_path(self, old_path: str, new_path: str) -> None:
+        """
+        Rename the documents of a moved file or folder, their lines keep their rows
+        """
+
+        old_rel = self.relative_path(old_path)
+        new_rel = self.relative_path(new_path)
+        if not old_rel or new_rel is None:
+            self.remove_path(old_path)
+            self.update_path(new_path)
+            return
+
+        self.remove_path(new_path)
+        with self._lock:
+            if self._closed.is_set():
+                return
+            like = escape_like(os.path.join(old_rel, "")) + "%"
+            self._connection.execute(
+                "UPDATE docs SET path = ? || substr(path, ?) WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                (new_rel, len(old_rel) + 1, old_rel, like))
+
+        self.update_path(new_path)
+
+    # Queries
+    def search(self, query: str, limit: int = DEFAULT_RESULT_LIMIT) -> list[SearchResult]:
+        """
+        Matching lines grouped by file and in line order, see parse_query for the query syntax
+
+        A query of only tags lists the files carrying all of them.
+        """
+
+        match, tags = parse_query(query)
+        if not match and not tags:
+            return []
+
+        tag_filter = "".join(" AND doc IN (SELECT doc FROM doc_tags WHERE tag = ?)" for _ in tags)
+
+        with self._lock:
+            if self._closed.is_set():
+                return []
+            if not match:
+                rows = self._connection.execute(
+                    "SELECT path, 0, '' FROM docs WHERE 1 %s ORDER BY path LIMIT ?"
+                    % tag_filter.replace("doc IN", "id IN"), (*tags, limit)).fetchall()
+            else:
+                rows = self._connection.execute(
+                    "SELECT docs.path, lines.rowid & ?, lines.text FROM "
+                    "(SELECT rowid, text, rowid >> ? AS doc FROM lines WHERE lines MATCH ?) AS lines "
+                    "JOIN docs ON docs.id = lines.doc WHERE 1 %s ORDER BY lines.rowid LIMIT ?" % tag_filter,
+                    (LINE_MASK, LINE_BITS, match, *tags, limit)).fetchall()
+
+        return [SearchResult(self.absolute_path(rel_path), line + 1, text) for rel_path, line, text in rows]
+
+    # Internal
+    def _stored_docs(self, rel_path: str, include_self: bool = False) -> dict[str, tuple[int, int, int]]:
+        """
+        :return: rel path : (id, mtime_ns, size) of the documents below rel_path, "" for the whole index
+        """
+
+        with self._lock:
+            if self._closed.is_set():
+                return {}
+            if not rel_path:
+                rows = self._connection.execute("SELECT path, id, mtime_ns, size FROM docs").fetchall()
+            else:
+                like = escape_like(os.path.join(rel_path, "")) + "%"
+                rows = self._connection.execute(
+                    "SELECT path, id, mtime_ns, size FROM docs WHERE path LIKE ? ESCAPE '\\'"
+                    + (" OR path = ?" if include_self else ""),
+                    (like, rel_path) if include_self else (like,)).fetchall()
+
+        return {row[0]: row[1:] for row in rows}
+
+    def _read_document(self, rel_path: str) -> tuple[tuple[str, ...], list[tuple[int, str]], int] | None:
+        """
+        Read a file and split its body into lines, without the lock
+
+        :return: (tags, (0-based line number, text) of each line to index, bytes read), None if it cannot be read
+        """
+
+        try:
+            with open(self.absolute_path(rel_path), "rb") as f:
+                data = f.read(MAX_INDEXED_SIZE + 1)
+        except OSError:
+            return None
+
+        if len(data) > MAX_INDEXED_SIZE:
+            # Up to the last whole line within the limit
+            data = data[:data.rfind(b"\n", 0, MAX_INDEXED_SIZE) + 1]
+
+        header = parse_header(data[:HEADER_SCAN_LIMIT])
+        first_line = data.count(b"\n", 0, header.body_offset)
+        body = data[header.body_offset:].decode(errors="replace")
+        lines = [(first_line + number, line) for number, line in enumerate(body.split("\n"))
+                 if line.strip() and first_line + number <= LINE_MASK]
+
+        return header.tags, lines, len(data)
+
+    def _store_documents(self, documents: list[tuple[str, os.stat_result, tuple]]) -> bool:
+        """
+        :param documents: (rel path, stat result, document read by _read_document) of each file
+        :return: False if the index was closed and nothing was stored
+        """
+
+        with self._lock:
+            if self._closed.is_set():
+                return False
+            self._connection.execute("BEGIN")
+            for rel_path, stat_result, document in documents:
+                self._store_document(rel_path, stat_result, *document)
+            self._connection.execute("COMMIT")
+
+        return True
+
+    def _store_document(self, rel_path: str, stat_result: os.stat_result, tags: tuple[str, ...],
+                        lines: list[tuple[int, str]], size: int) -> None:
+        row = self._connection.execute("SELECT id FROM docs WHERE path = ?", (rel_path,)).fetchone()
+        doc_id = row[0] if row else None
+        if doc_id is None:
+            doc_id = self._connection.execute(
+                "INSERT INTO docs (path, mtime_ns, size) VALUES (?, ?, ?)",
+                (rel_path, stat_result.st_mtime_ns, stat_result.st_size)).lastrowid
+        else:
+            self._connection.execute("UPDATE docs SET mtime_ns = ?, size = ? WHERE id = ?",
+                                     (stat_result.st_mtime_ns, stat_result.st_size, doc_id))
+            self._delete_lines(doc_id)
+
+        base = doc_id << LINE_BITS
+        self._connection.executemany("INSERT INTO lines (rowid, text) VALUES (?, ?)",
+                                     ((base + number, line) for number, line in lines))
+        self._connection.executemany("INSERT OR IGNORE INTO doc_tags VALUES (?, ?)", ((tag, doc_id) for tag in tags))
+
+    def _delete_lines(self, doc_id: int) -> None:
+        self._connection.execute("DELETE FROM lines WHERE rowid BETWEEN ? AND ?",
+                                 (doc_id << LINE_BITS, (doc_id << LINE_BITS) | LINE_MASK))
+        self._connection.execute("DELETE FROM doc_tags WHERE doc = ?", (doc_id,))
+
+    def _delete_doc(self, doc_id: int) -> None:
+        self._delete_lines(doc_id)
+        self._connection.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+
+
+_indexes = IndexRegistry(SearchIndex)
+open_index = _indexes.open_index
+current_index = _indexes.current_index
+index_for = _indexes.index_for
+notify_changed = _indexes.notify_changed
+notify_removed = _indexes.notify_removed
+notify_moved = _indexes.notify_moved
@@ -0,0 +1,334 @@
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable
+from AppFile.Utility import searchIndex, tagIndex
+from AppFile.Utility.contextConfig import INI_NAME, context_config, edit_context_tags
+from AppFile.Utility.exportUtility import DEFAULT_BUFFER_SIZE, copy_range
+from AppFile.Utility.metadataCache import FILE_TAGS, TAG_DELIMINATOR, META_END_SIGNAL, META_HEADER_TEMPLATE, \
+    HEADER_PROBE_SIZE, HEADER_SCAN_LIMIT, FileHeader, header_end, metadata_cache, parse_header
+from AppFile.Utility.tempFileUtility import create_temp_file, remove_temp_file
+
+TAG_EDIT = "tag edit"
+ADD = "add"
+REMOVE = "remove"
+RENAME = "rename"
+DEFAULT_WORKERS = 4
+# Minimum seconds between two progress reports
+PROGRESS_INTERVAL = 0.1
+
+
+class TagEditCancelled(Exception):
+    pass
+
+
+def validate_tag(tag: str) -> str:
+    """
+    :return: tag without surrounding spaces
+    :raise ValueError: If tag is empty or cannot be stored in a tag list
+    """
+
+    tag = tag.strip()
+    if not tag:
+        raise ValueError("Empty tag")
+    if TAG_DELIMINATOR in tag or "\n" in tag or "\r" in tag:
+        raise ValueError("A tag cannot contain '%s' or line breaks: %s" % (TAG_DELIMINATOR, tag))
+    return tag
+
+
+def edit_tags(tags: tuple[str, ...], operation: str, tag: str, new_tag: str = None) -> tuple[str, ...] | None:
+    """
+    :return: tags after the operation, None if it does not change them
+    """
+
+    if operation == ADD:
+        return None if tag in tags else tags + (tag,)
+    if tag not in tags:
+        return None
+    if operation == REMOVE:
+        return tuple(other for other in tags if other != tag)
+
+    renamed = []
+    for other in tags:
+        other = new_tag if other == tag else other
+        if other not in renamed:
+            renamed.append(other)
+    return None if tuple(renamed) == tags else tuple(renamed)
+
+
+def rewrite_header(header: bytes, tags: tuple[str, ...]) -> bytes:
+    """
+    The metadata header region of a file with its first %Tag line set to tags, a header without one gets it as
+    its second line
+
+    :raise ValueError: If the header is on a single line
+    """
+
+    lines = header.decode("utf-8", "surrogateescape").splitlines(keepends=True)
+    if len(lines) < 2:
+        raise ValueError("Metadata header on a single line")
+
+    value = (TAG_DELIMINATOR + " ").join(tags)
+    tag_line = None
+    for index in range(1, len(lines)):
+        key, separator, _ = lines[index].partition(":")
+        key = key.strip(" -\r\n")
+        if key.endswith(META_END_SIGNAL):
+            break
+        if key == FILE_TAGS and separator:
+            # The first %Tag line is the one that counts when the header is parsed
+            tag_line = index
+            break
+
+    if tag_line is None:
+        lines.insert(1, " %s: %s\n" % (FILE_TAGS, value))
+    else:
+        line = lines[tag_line]
+        ending = line[len(line.rstrip("\r\n")):]
+        lines[tag_line] = "%s: %s%s" % (line.partition(":")[0], value, ending)
+
+    return "".join(lines).encode("utf-8", "surrogateescape")
+
+
+class TagEditor:
+    """
+    Adds, removes or renames a tag in the %Tag lines of many files and the branch tags of many context folders,
+    with a pool of workers
+
+    Only the metadata header of a file is rewritten, the body is copied behind it by the kernel where possible,
+    and the result replaces the file through a rename. A file changed while it was being edited is left as it is
+    and reported. Files and folders whose tags do not change are not written at all.
+    """
+
+    def __init__(self, paths: list[str], operation: str, tag: str, new_tag: str = None, recursive: bool = True,
+                 edit_files: bool = True, edit_folders: bool = True, add_headers: bool = False,
+                 workers: int = DEFAULT_WORKERS):
+        """
+        :param paths: Files and folders to edit
+        :param operation: ADD, REMOVE or RENAME
+        :param tag: Tag added, removed or renamed
+        :param new_tag: New name of tag for RENAME
+        :param recursive: Edit everything below the folders of paths, else only the folders and their own files
+        :param edit_files: Edit the %Tag lines of .txt files
+        :param edit_folders: Edit the branch tags of context folders
+        :param add_headers: Give files without a metadata header one when adding a tag, else they are left out
+        :param workers: Files edited in parallel
+        """
+
+        self.kind = TAG_EDIT
+        self.operation = operation
+        self.tag = validate_tag(tag)
+        self.new_tag = validate_tag(new_tag) if operation == RENAME else None
+        self.recursive = recursive
+        self.edit_files = edit_files
+        self.edit_folders = edit_folders
+        self.add_headers = add_headers
+        self.workers = max(workers, 1)
+        if operation == RENAME:
+            self.description = "Renaming tag %s to %s" % (self.tag, self.new_tag)
+        else:
+            self.description = "%s tag %s" % ("Adding" if operation == ADD else "Removing", self.tag)
+
+        self.items = [(path, None) for path in paths]
+        self.completed = []  # (path, None) of each file or folder edited
+        self.errors = []  # (path, message)
+        self.cancelled = False
+
+        self.files_edited = 0
+        self.folders_edited = 0
+        self.unchanged = 0
+
+        self._progress_callback = None
+        self._cancel_event = None
+        self._progress_done = 0
+        self._progress_total = 0
+        self._progress_time = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def summary(self) -> str:
+        text = "%s: %d files and %d folders edited, %d unchanged" % (
+            self.description, self.files_edited, self.folders_edited, self.unchanged)
+        if self.cancelled:
+            text += ", cancelled"
+        if self.errors:
+            text += ", %d failed" % len(self.errors)
+        return text
+
+    def run(self, progress_callback: Callable[[int, int, int], None] = None,
+            cancel_event: threading.Event = None) -> "TagEditor":
+        """
+        :param progress_callback: Called with (items done, total items, 0) while editing
+        :param cancel_event: Set from another thread to stop after the items being edited
+        """
+
+        self._progress_callback = progress_callback
+        self._cancel_event = cancel_event or threading.Event()
+
+        try:
+            tasks = self._plan()
+            self._progress_total = len(tasks)
+            self._run_all(tasks)
+        except TagEditCancelled:
+            self.cancelled = True
+        except OSError as e:
+            self.errors.append((e.filename or "", e.strerror or str(e)))
+        finally:
+            if self.completed:
+                for path, _ in self.items:
+                    tagIndex.notify_changed(path)
+                    searchIndex.notify_changed(path)
+
+        return self
+
+    def _plan(self) -> list[tuple[Callable[[str], bool], str]]:
+        """
+        :return: (edit function, path) of every context folder and file to edit, folders first
+        """
+
+        folders = []
+        files = []
+        for path, _ in self.items:
+            self._check_cancelled()
+            if not os.path.isdir(path):
+                if self.edit_files and path.endswith(".txt"):
+                    files.append(path)
+                continue
+
+            walk = os.walk(path) if self.recursive else [next(os.walk(path), (path, [], []))]
+            for current, dirs, names in walk:
+                self._check_cancelled()
+                if self.edit_folders and INI_NAME in names:
+                    folders.append(current)
+                if self.edit_files:
+                    files.extend(os.path.join(current, name) for name in sorted(names) if name.endswith(".txt"))
+
+        return [(self._edit_folder, folder) for folder in folders] + [(self._edit_file, file) for file in files]
+
+    def _run_all(self, tasks: list[tuple[Callable[[str], bool], str]]) -> None:
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            queued = iter(tasks)
+            running = set()
+            try:
+                while True:
+                    # Keep a few items per worker in flight, so cancelling does not wait for a long queue
+                    for edit, path in queued:
+                        running.add(pool.submit(self._edit, edit, path))
+                        if len(running) >= self.workers * 2:
+                            break
+                    if not running:
+                        return
+
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                        self._advance_progress()
+            finally:
+                for future in running:
+                    future.cancel()
+
+    def _edit(self, edit: Callable[[str], bool], path: str) -> None:
+        self._check_cancelled()
+        try:
+            edited = edit(path)
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self.errors.append((path, getattr(e, "strerror", None) or str(e)))
+            return
+
+        with self._lock:
+            if edited:
+                self.completed.append((path, None))
+            else:
+                self.unchanged += 1
+
+    def _edit_folder(self, directory: str) -> bool:
+        edited = edit_context_tags(directory, lambda tags: edit_tags(tags, self.operation, self.tag, self.new_tag))
+        context_config.invalidate(directory)
+        if edited:
+            with self._lock:
+                self.folders_edited += 1
+        return edited
+
+    def _edit_file(self, path: str) -> bool:
+        stat_result = os.stat(path)
+        # A cached header spares opening the files that need no change, a missing one is not worth a read of its own
+        header = metadata_cache.lookup(path, stat_result)
+        if header is not None and not self._needs_edit(header):
+            return False
+
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = bytearray(DEFAULT_BUFFER_SIZE)
+
+        temp_path = None
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            # Always decided on the bytes that are rewritten, whatever the cache said
+            head = os.read(fd, HEADER_PROBE_SIZE)
+            if len(head) == HEADER_PROBE_SIZE and META_END_SIGNAL.encode() not in head:
+                head += os.read(fd, HEADER_SCAN_LIMIT - len(head))
+            header = parse_header(head)
+            if not self._needs_edit(header):
+                return False
+            if header.has_metadata:
+                # Also the header of a file whose start signal is decorated, which has no body_offset
+                body_offset = header_end(head)
+                new_header = rewrite_header(head[:body_offset],
+                                            edit_tags(header.tags, self.operation, self.tag, self.new_tag))
+            else:
+                body_offset = 0
+                new_header = META_HEADER_TEMPLATE.format(self.tag).encode()
+
+            out_fd, temp_path = create_temp_file(path)
+            try:
+                view = memoryview(new_header)
+                written = 0
+                while written < len(view):
+                    written += os.write(out_fd, view[written:])
+                copy_range(fd, out_fd, body_offset, buffer)
+            finally:
+                os.close(out_fd)
+        except BaseException:
+            if temp_path is not None:
+                remove_temp_file(temp_path)
+            raise
+        finally:
+            os.close(fd)
+
+        try:
+            shutil.copymode(path, temp_path)
+            current = os.stat(path)
+            if (current.st_mtime_ns, current.st_size) != (stat_result.st_mtime_ns, stat_result.st_size):
+                raise ValueError("Changed while its tags were edited, left as it is")
+            os.replace(temp_path, path)
+        except BaseException:
+            remove_temp_file(temp_path)
+            raise
+
+        metadata_cache.invalidate(path)
+        with self._lock:
+            self.files_edited += 1
+        return True
+
+    def _needs_edit(self, header: FileHeader) -> bool:
+        if header.has_metadata:
+            return edit_tags(header.tags, self.operation, self.tag, self.new_tag) is not None
+        # A header that is not parsed as one is not touched
+        return header.body_offset == 0 and self.operation == ADD and self.add_headers
+
+    def _check_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            raise TagEditCancelled()
+
+    def _advance_progress(self) -> None:
+        if self._progress_callback is None:
+            return
+
+        self._progress_done += 1
+        now = time.perf_counter()
+        if now - self._progress_time >= PROGRESS_INTERVAL or self._progress_done == self._progress_total:
+            self._progress_time = now
+            self._progress_callback(self._progress_done, self._progress_total, 0)
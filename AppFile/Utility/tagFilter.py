@@ -0,0 +1,373 @@
+import re
+import sys
+from typing import Mapping
+
+FILTER_DELIMINATOR = ","
+FILTER_SCOPES = ("file", "dir", "all")
+PATH_PREFIX = "path:"
+EXT_PREFIX = "ext:"
+KEYWORDS = ("AND", "OR", "NOT")
+
+_TOKEN_PATTERN = re.compile(r"\(|\)|[^\s()]+")
+# A list item like path:dir, which the list syntax reads as the tag "path" for folders
+_LIST_ITEM_PATTERN = re.compile(r"[^:]*:(?:file|dir|all)(?::not)?\Z")
+_KEYWORD_CALL_PATTERN = re.compile(r"(?:NOT|AND|OR)\(")
+_DESCENDANT = "/\0/\0"
+
+
+class FilterSyntaxError(ValueError):
+    pass
+
+
+def parse_tag_filter(tag_filters: list[str]) -> tuple[list[str], list[str], Mapping[str, str]]:
+    file_whitelist = [] # tag : dir/file/all
+    dir_whitelist = []
+    blacklist = {}
+
+    for filter_item in tag_filters:
+        filter_item = filter_item.strip()
+        filter_params = str.split(filter_item, ":")
+
+        if not filter_item:
+            continue
+
+        if len(filter_params) > 2 and filter_params[2] == "not":
+            if filter_params[0] in blacklist:
+                blacklist[filter_params[0]] = "all"
+            else:
+                blacklist[filter_params[0]] = len(filter_params) > 1 and filter_params[1] or "all"
+
+        else:
+            filter_object = len(filter_params) > 1 and filter_params[1] or "all"
+            if filter_object == "file" or filter_object == "all":
+                file_whitelist.append(filter_params[0])
+            if filter_object == "dir" or filter_object == "all":
+                dir_whitelist.append(filter_params[0])
+
+    return file_whitelist, dir_whitelist, blacklist
+
+
+def glob_to_regex(glob: str) -> str:
+    """
+    Translate a path glob to a regex: * and ? stay within one path segment, ** crosses segments
+    """
+
+    regex = []
+    i = 0
+    while i < len(glob):
+        if glob.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("**", i):
+            regex.append(".*")
+            i += 2
+        elif glob[i] == "*":
+            regex.append("[^/]*")
+            i += 1
+        elif glob[i] == "?":
+            regex.append("[^/]")
+            i += 1
+        else:
+            regex.append(re.escape(glob[i]))
+            i += 1
+
+    return "".join(regex)
+
+
+def is_expression(filter_text: str) -> bool:
+    """
+    Whether filter_text uses the boolean syntax rather than the comma-separated "<tag>:<dir_type>:<not?>" list
+
+    An expression never has a comma. Without one, the text is a single list item unless one of its words is a
+    keyword between other words, opens a parenthesis or is a path:/ext: atom, so tags like draft(old) still
+    read as list items.
+    """
+
+    if FILTER_DELIMINATOR in filter_text:
+        return False
+
+    words = filter_text.split()
+    for word in words:
+        if word in KEYWORDS and len(words) > 1:
+            return True
+        if word.startswith("(") or _KEYWORD_CALL_PATTERN.match(word):
+            return True
+        if word.startswith((PATH_PREFIX, EXT_PREFIX)) and not _LIST_ITEM_PATTERN.match(word):
+            return True
+
+    return False
+
+
+class TagFilter:
+    """
+    Compiled filter rule, a reusable predicate over (tags, item type, path relative to the export root)
+
+    Two syntaxes are accepted. The comma-separated list "<tag>:<dir_type>:<not?>,..." keeps its meaning: an item
+    is excluded by any of its blacklisted tags, and otherwise needs one whitelisted tag if its type has a
+    whitelist. A boolean expression combines atoms with AND, OR, NOT and parentheses:
+
+        <tag>, <tag>:file, <tag>:dir, <tag>:all   item carries the tag, file/dir atoms only apply to that type
+        path:<glob>                               relative path matches the glob, e.g. path:drafts/**, a folder
+                                                  only matches once everything below it does
+        ext:<extension>                           file has the extension, e.g. ext:txt
+
+    Atoms that do not apply to an item's type are unknown, and an item is excluded only if the whole
+    expression is false. Tag atoms joined by OR (and negated tag atoms joined by AND) are merged into one
+    frozenset at compile time, and all path globs share one precompiled regex, so evaluation cost does not
+    grow with the number of tags in the filter.
+    """
+
+    def __init__(self, filter_text: str = ""):
+        self.text = filter_text.strip()
+        self.uses_paths = False
+
+        self._path_regex = None
+        self._globs = []
+        self._expression = None
+        self._blacklist = {}
+        self._blacklists = {"file": frozenset(), "dir": frozenset()}
+        self._whitelists = {"file": frozenset(), "dir": frozenset()}
+
+        if is_expression(self.text):
+            self._compile_expression()
+        else:
+            self._compile_list()
+
+    @property
+    def key(self) -> str:
+        """
+        Canonical form of the compiled filter: filters differing only in spacing, in the order of their list items
+        or of AND/OR operands, or in repeated items have the same key, and filters with the same key select the
+        same items
+        """
+
+        if self._expression is not None:
+            return "expression:" + _node_key(self._expression, self._globs)
+
+        return "list:" + repr(tuple(tuple(sorted(tags)) for tags in (
+            self._blacklists["file"], self._blacklists["dir"], self._whitelists["file"], self._whitelists["dir"])))
+
+    def __bool__(self) -> bool:
+        return bool(self.text)
+
+    def accepts(self, tags, item_type: str, rel_path: str = "") -> bool:
+        return self.exclusion_rule(tags, item_type, rel_path) is None
+
+    def exclusion_rule(self, tags, item_type: str, rel_path: str = "") -> str | None:
+        """
+        :param tags: Tags of the item
+        :param item_type: "file" or "dir"
+        :param rel_path: Path of the item relative to the export root, "/"-separated, only used by path: atoms
+        :return: The rule that excludes the item, None if the item is accepted
+        """
+
+        if self._expression is not None:
+            path_match = None
+            if self._path_regex is not None:
+                # A folder matches a glob only if all of its contents would, probed with a made-up deep descendant
+                path_match = self._path_regex.match(rel_path + _DESCENDANT if item_type == "dir" else rel_path)
+            if _evaluate(self._expression, tags, item_type, rel_path, path_match) is False:
+                return "filter expression"
+            return None
+
+        blacklist = self._blacklists[item_type]
+        if blacklist and not blacklist.isdisjoint(tags):
+            tag = next(tag for tag in tags if tag in blacklist)
+            return "%s:%s:not" % (tag, self._blacklist[tag])
+
+        whitelist = self._whitelists[item_type]
+        if whitelist and whitelist.isdisjoint(tags):
+            return "no %s whitelist tag" % item_type
+
+        return None
+
+    # Comma-separated list
+    def _compile_list(self) -> None:
+        file_whitelist, dir_whitelist, blacklist = parse_tag_filter(self.text.split(FILTER_DELIMINATOR))
+
+        self._blacklist = {sys.intern(tag): scope for tag, scope in blacklist.items()}
+        self._blacklists = {
+            item_type: frozenset(tag for tag, scope in self._blacklist.items() if scope in (item_type, "all"))
+            for item_type in ("file", "dir")
+        }
+        self._whitelists = {
+            "file": frozenset(map(sys.intern, file_whitelist)),
+            "dir": frozenset(map(sys.intern, dir_whitelist)),
+        }
+
+    # Boolean expression
+    def _compile_expression(self) -> None:
+        self._tokens = _TOKEN_PATTERN.findall(self.text)
+        self._position = 0
+
+        expression = self._parse_or()
+        if self._position != len(self._tokens):
+            raise FilterSyntaxError("unexpected '%s' in filter" % self._tokens[self._position])
+
+        self._expression = expression
+        if self._globs:
+            self.uses_paths = True
+            # One pass over the path for every glob: each glob is an optional lookahead with its own group
+            self._path_regex = re.compile("".join("(?:(?=(%s)\\Z))?" % glob_to_regex(glob) for glob in self._globs))
+
+        del self._tokens
+
+    def _peek(self) -> str | None:
+        return self._tokens[self._position] if self._position < len(self._tokens) else None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise FilterSyntaxError("filter ends unexpectedly")
+
+        self._position += 1
+        return token
+
+    def _parse_or(self) -> tuple:
+        children = [self._parse_and()]
+        while self._peek() == "OR":
+            self._next()
+            children.append(self._parse_and())
+
+        return _merge("or", children)
+
+    def _parse_and(self) -> tuple:
+        children = [self._parse_not()]
+        while self._peek() == "AND":
+            self._next()
+            children.append(self._parse_not())
+
+        return _merge("and", children)
+
+    def _parse_not(self) -> tuple:
+        if self._peek() == "NOT":
+            self._next()
+            return ("not", self._parse_not())
+
+        return self._parse_atom()
+
+    def _parse_atom(self) -> tuple:
+        token = self._next()
+
+        if token == "(":
+            expression = self._parse_or()
+            if self._next() != ")":
+                raise FilterSyntaxError("missing ')' in filter")
+            return expression
+
+        if token == ")" or token in KEYWORDS:
+            raise FilterSyntaxError("unexpected '%s' in filter" % token)
+
+        if token.startswith(PATH_PREFIX):
+            self._globs.append(token[len(PATH_PREFIX):].replace("\\", "/"))
+            # Group numbers of the shared path regex start at 1
+            return ("path", len(self._globs))
+
+        if token.startswith(EXT_PREFIX):
+            self.uses_paths = True
+            extension = token[len(EXT_PREFIX):]
+            return ("ext", frozenset(["." + extension.lstrip(".")]))
+
+        tag, _, scope = token.partition(":")
+        scope = scope or "all"
+        if scope not in FILTER_SCOPES or not tag:
+            raise FilterSyntaxError("'%s' is not a tag, expected <tag>:file, <tag>:dir or <tag>:all" % token)
+
+        return ("tags", scope, frozenset([sys.intern(tag)]))
+
+
+def _merge(operator: str, children: list[tuple]) -> tuple:
+    """
+    Build an and/or node, merging tag atoms of the same scope into one set atom
+
+    (a OR b) is one atom over {a, b}, and so is (NOT a AND NOT b) under a single NOT.
+    """
+
+    if len(children) == 1:
+        return children[0]
+
+    merged = {}
+    others = []
+    for child in children:
+        if operator == "or" and child[0] == "tags":
+            merged[child[1]] = merged.get(child[1], frozenset()) | child[2]
+        elif operator == "and" and child[0] == "not" and child[1][0] == "tags":
+            merged[child[1][1]] = merged.get(child[1][1], frozenset()) | child[1][2]
+        else:
+            others.append(child)
+
+    for scope, tags in merged.items():
+        others.append(("tags", scope, tags) if operator == "or" else ("not", ("tags", scope, tags)))
+
+    return others[0] if len(others) == 1 else (operator, others)
+
+
+def _node_key(node: tuple, globs: list[str]) -> str:
+    kind = node[0]
+    if kind == "tags":
+        return repr((kind, node[1], tuple(sorted(node[2]))))
+    if kind == "path":
+        return repr((kind, globs[node[1] - 1]))
+    if kind == "ext":
+        return repr((kind, tuple(sorted(node[1]))))
+    if kind == "not":
+        return repr((kind, _node_key(node[1], globs)))
+
+    children = sorted(set(_node_key(child, globs) for child in node[1]))
+    return children[0] if len(children) == 1 else repr((kind, tuple(children)))
+
+
+def _evaluate(node: tuple, tags, item_type: str, rel_path: str, path_match) -> bool | None:
+    """
+    Three-valued evaluation, None for atoms that do not apply to the item's type or cannot be decided yet
+    """
+
+    kind = node[0]
+    if kind == "tags":
+        if node[1] != "all" and node[1] != item_type:
+            return None
+        return not node[2].isdisjoint(tags)
+
+    if kind == "path":
+        matched = path_match is not None and path_match.group(node[1]) is not None
+        if item_type == "dir" and not matched:
+            # Some of the folder's contents may still match
+            return None
+        return matched
+
+    if kind == "ext":
+        if item_type != "file":
+            return None
+        return rel_path[rel_path.rfind("."):] in node[1] if "." in rel_path else False
+
+    if kind == "not":
+        value = _evaluate(node[1], tags, item_type, rel_path, path_match)
+        return None if value is None else not value
+
+    unknown = False
+    for child in node[1]:
+        value = _evaluate(child, tags, item_type, rel_path, path_match)
+        if value is None:
+            unknown = True
+        elif value is (kind == "or"):
+            return value
+
+    return None if unknown else kind == "and"
+
+
+def compile_filter(tag_filter: "str | list[str] | TagFilter | None") -> TagFilter:
+    """
+    :param tag_filter: Filter text, the list of its comma-separated items, or an already compiled filter
+    :raises FilterSyntaxError: If the filter is a malformed expression
+    """
+
+    if tag_filter is None:
+        return TagFilter()
+
+    if isinstance(tag_filter, TagFilter):
+        return tag_filter
+
+    if not isinstance(tag_filter, str):
+        tag_filter = FILTER_DELIMINATOR.join(tag_filter)
+
+    return TagFilter(tag_filter)
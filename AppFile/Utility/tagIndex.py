@@ -0,0 +1,249 @@
+import os
+import sys
+from AppFile.Utility.contextConfig import ContextRecord, context_config
+from AppFile.Utility.metadataCache import FileHeader, metadata_cache
+from AppFile.Utility.projectIndex import IndexRegistry, ProjectIndex, escape_like
+
+INDEX_NAME = ".creatiview_index.sqlite"
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    body_offset INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_parent ON items (parent);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (tag, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_path ON tags (path);
+"""
+
+
+class TagIndex(ProjectIndex):
+    """
+    Project-local SQLite index of file tags, branch tags and priorities under a root directory
+
+    Paths are stored relative to the root. Files are rows with their %Tag values and header offset,
+    folders are rows with their .context.ini priority (-1 for plain folders) and branch tags. Each row keeps
+    the mtime and size it was read at, so sync() only reparses what changed.
+    """
+
+    index_name = INDEX_NAME
+    schema_version = SCHEMA_VERSION
+    schema = _SCHEMA
+    tables = ("items", "tags")
+
+    # Revalidation
+    def sync(self, directory: str = None) -> None:
+        """
+        Bring the index up to date for directory and everything below it, reparsing only changed items
+        """
+
+        rel_dir = self.relative_path(directory or self.root_dir)
+        if rel_dir is None or not os.path.isdir(self.absolute_path(rel_dir)):
+            return
+
+        if rel_dir:
+            self._index_dir(rel_dir)
+
+        pending = [rel_dir]
+        while pending and not self._closed.is_set():
+            pending.extend(self._sync_dir(pending.pop()))
+
+    def update_path(self, path: str) -> None:
+        """
+        Reindex a file or folder after it was created or changed, removing it if it no longer exists
+        """
+
+        rel_path = self.relative_path(path)
+        if rel_path is None:
+            return
+
+        abs_path = self.absolute_path(rel_path)
+        if os.path.isdir(abs_path):
+            self.sync(abs_path)
+        elif os.path.isfile(abs_path) and abs_path.endswith(".txt"):
+            with self._lock:
+                if self._closed.is_set():
+                    return
+                self._connection.execute("BEGIN")
+                self._index_file(rel_path, os.stat(abs_path))
+                self._connection.execute("COMMIT")
+        else:
+            self.remove_path(abs_path)
+
+    def remove_path(self, path: str) -> None:
+        rel_path = self.relative_path(path)
+        if not rel_path:
+            return
+
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self._connection.execute("BEGIN")
+            self._delete_tree(rel_path)
+            self._connection.execute("COMMIT")
+
+    def move_path(self, old_path: str, new_path: str) -> None:
+        """
+        Rename the rows of a moved file or folder instead of reparsing them
+        """
+
+        old_rel = self.relative_path(old_path)
+        new_rel = self.relative_path(new_path)
+        if not old_rel or new_rel is None:
+            self.remove_path(old_path)
+            self.update_path(new_path)
+            return
+
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self._connection.execute("BEGIN")
+            self._delete_tree(new_rel)
+            like = escape_like(os.path.join(old_rel, "")) + "%"
+            for table in ("items", "tags"):
+                self._connection.execute(
+                    "UPDATE %s SET path = ? || substr(path, ?) WHERE path = ? OR path LIKE ? ESCAPE '\\'" % table,
+                    (new_rel, len(old_rel) + 1, old_rel, like))
+            self._connection.execute(
+                "UPDATE items SET parent = ? || substr(parent, ?) WHERE parent = ? OR parent LIKE ? ESCAPE '\\'",
+                (new_rel, len(old_rel) + 1, old_rel, like))
+            self._connection.execute("UPDATE items SET parent = ? WHERE path = ?",
+                                     (os.path.dirname(new_rel), new_rel))
+            self._connection.execute("COMMIT")
+
+        self.update_path(new_path)
+
+    # Queries
+    def list_dir(self, directory: str, plain_dirs: list[str] = None) \
+            -> tuple[list[tuple[str, FileHeader, int, int]], list[tuple[str, ContextRecord]]]:
+        """
+        Children of an indexed folder in name order
+
+        :param plain_dirs: Receives the path of each folder that is not a context folder
+        :return: (path, header, size, mtime_ns) of each .txt file and (path, record) of each context folder
+        """
+
+        rel_dir = self.relative_path(directory)
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT path, is_dir, mtime_ns, size, priority, body_offset FROM items WHERE parent = ? ORDER BY path",
+                (rel_dir,)).fetchall()
+            tag_rows = self._connection.execute(
+                "SELECT tags.path, tags.tag FROM tags JOIN items ON tags.path = items.path WHERE items.parent = ?",
+                (rel_dir,)).fetchall()
+
+        tags = {}
+        for rel_path, tag in tag_rows:
+            tags.setdefault(rel_path, []).append(sys.intern(tag))
+
+        files = []
+        dirs = []
+        for rel_path, is_dir, mtime_ns, size, priority, body_offset in rows:
+            path = self.absolute_path(rel_path)
+            if is_dir:
+                if priority != -1:
+                    dirs.append((path, ContextRecord(priority, frozenset(tags.get(rel_path, ())))))
+                elif plain_dirs is not None:
+                    plain_dirs.append(path)
+            else:
+                item_tags = tuple(sorted(tags.get(rel_path, ())))
+                header = FileHeader(bool(item_tags) or body_offset > 0, item_tags, "", body_offset)
+                files.append((path, header, size, mtime_ns))
+
+        return files, dirs
+
+    # Internal
+    def _sync_dir(self, rel_dir: str) -> list[str]:
+        """
+        Revalidate the direct children of one folder
+
+        :return: Relative paths of the child folders still to visit
+        """
+
+        abs_dir = self.absolute_path(rel_dir)
+        try:
+            with os.scandir(abs_dir) as it:
+                entries = [(entry.name, entry.is_dir(),
+                            entry.stat() if entry.name.endswith(".txt") and entry.is_file() else None) for entry in it]
+        except OSError:
+            return []
+
+        with self._lock:
+            if self._closed.is_set():
+                return []
+            stored = dict(((row[0], (row[1], row[2], row[3])) for row in self._connection.execute(
+                "SELECT path, is_dir, mtime_ns, size FROM items WHERE parent = ?", (rel_dir,))))
+
+            self._connection.execute("BEGIN")
+            child_dirs = []
+            seen = set()
+            for name, is_dir, stat_result in entries:
+                rel_path = os.path.join(rel_dir, name) if rel_dir else name
+                if is_dir:
+                    seen.add(rel_path)
+                    child_dirs.append(rel_path)
+                    self._index_dir(rel_path, stored.get(rel_path))
+                elif stat_result is not None:
+                    seen.add(rel_path)
+                    row = stored.get(rel_path)
+                    if row is None or row != (0, stat_result.st_mtime_ns, stat_result.st_size):
+                        self._index_file(rel_path, stat_result)
+
+            for rel_path in stored.keys() - seen:
+                self._delete_tree(rel_path)
+            self._connection.execute("COMMIT")
+
+        return child_dirs
+
+    def _index_dir(self, rel_dir: str, stored_row: tuple = None) -> None:
+        abs_dir = self.absolute_path(rel_dir)
+        stat_result = context_config.stat(abs_dir)
+        mtime_ns, size = (stat_result.st_mtime_ns, stat_result.st_size) if stat_result else (0, 0)
+        if stored_row == (1, mtime_ns, size):
+            return
+
+        record = context_config.get(abs_dir) if stat_result else None
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self._connection.execute(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, 1, ?, ?, ?, 0)",
+                (rel_dir, os.path.dirname(rel_dir), mtime_ns, size, record.priority if record else -1))
+            self._connection.execute("DELETE FROM tags WHERE path = ?", (rel_dir,))
+            if record:
+                self._connection.executemany("INSERT OR IGNORE INTO tags VALUES (?, ?)",
+                                             ((tag, rel_dir) for tag in record.tags))
+
+    def _index_file(self, rel_path: str, stat_result: os.stat_result) -> None:
+        header = metadata_cache.get(self.absolute_path(rel_path), stat_result)
+        self._connection.execute(
+            "INSERT OR REPLACE INTO items VALUES (?, ?, 0, ?, ?, -1, ?)",
+            (rel_path, os.path.dirname(rel_path), stat_result.st_mtime_ns, stat_result.st_size, header.body_offset))
+        self._connection.execute("DELETE FROM tags WHERE path = ?", (rel_path,))
+        self._connection.executemany("INSERT OR IGNORE INTO tags VALUES (?, ?)",
+                                     ((tag, rel_path) for tag in header.tags))
+
+    def _delete_tree(self, rel_path: str) -> None:
+        like = escape_like(os.path.join(rel_path, "")) + "%"
+        for table in ("items", "tags"):
+            self._connection.execute("DELETE FROM %s WHERE path = ? OR path LIKE ? ESCAPE '\\'" % table,
+                                     (rel_path, like))
+
+
+_indexes = IndexRegistry(TagIndex)
+open_index = _indexes.open_index
+current_index = _indexes.current_index
+index_for = _indexes.index_for
+notify_changed = _indexes.notify_changed
+notify_removed = _indexes.notify_removed
+notify_moved = _indexes.notify_moved
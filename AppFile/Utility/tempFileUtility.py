@@ -0,0 +1,29 @@
+import os
+import uuid
+
+
+def create_temp_file(target_file: str) -> tuple[int, str]:
+    """
+    Create a hidden temp file next to target_file, in the same directory so it can be os.replace'd into place
+
+    Every call gets a new name, so a temp file left behind by a crash never blocks a later write.
+
+    :return: (file descriptor open for writing, path of the temp file)
+    """
+
+    directory, name = os.path.split(os.path.abspath(target_file))
+    while True:
+        temp_path = os.path.join(directory, ".%s.%s.tmp" % (name, uuid.uuid4().hex[:8]))
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+        except FileExistsError:
+            continue
+
+        return fd, temp_path
+
+
+def remove_temp_file(temp_path: str) -> None:
+    try:
+        os.remove(temp_path)
+    except OSError:
+        pass
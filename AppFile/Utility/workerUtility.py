@@ -0,0 +1,65 @@
+import threading
+import traceback
+from typing import Callable
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class WorkerSignals(QObject):
+    # Plain Python objects, byte counts do not fit a C++ int
+    progress = Signal(object, object, object)  # done, total, bytes
+    finished = Signal(object)  # result of the task
+    failed = Signal(str)
+    cancelled = Signal()
+
+
+class Worker(QRunnable):
+    """
+    Runs a task on the global QThreadPool, or on a thread of its own, and reports back through Qt signals
+
+    The task is called as task(progress, cancel_event): progress(done, total, bytes) emits the progress signal,
+    and the task should stop, raising any exception, once cancel_event is set.
+    """
+
+    def __init__(self, task: Callable[[Callable[[int, int, int], None], threading.Event], object]):
+        super().__init__()
+
+        self.task = task
+        self.signals = WorkerSignals()
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+    def start(self, dedicated: bool = False) -> None:
+        """
+        :param dedicated: Run on a thread of its own, for a task that runs until cancelled and would otherwise keep
+                          a pool thread from the other tasks
+        """
+
+        if dedicated:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        else:
+            QThreadPool.globalInstance().start(self)
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def wait(self) -> None:
+        """
+        Block until a task started on a dedicated thread returns
+        """
+
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self) -> None:
+        try:
+            result = self.task(self.signals.progress.emit, self.cancel_event)
+        except Exception as e:
+            if self.cancel_event.is_set():
+                self.signals.cancelled.emit()
+            else:
+                traceback.print_exc()
+                self.signals.failed.emit(str(e) or type(e).__name__)
+            return
+
+        self.signals.finished.emit(result)
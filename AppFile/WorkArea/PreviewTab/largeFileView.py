@@ -0,0 +1,228 @@
+import itertools
+import mmap
+import operator
+import os
+from array import array
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtGui import QPainter
+from PySide6.QtWidgets import QAbstractScrollArea
+from AppFile.Utility.workerUtility import Worker
+
+# Bytes of the file indexed per step of the background line indexer
+INDEX_CHUNK_SIZE = 8 * 1024 * 1024
+# Lines decoded above and below the visible ones
+WINDOW_MARGIN = 200
+# Longest part of a line that is decoded and drawn, in bytes
+MAX_LINE_BYTES = 16 * 1024
+TEXT_MARGIN = 4
+
+
+def index_lines(data, start: int, end: int, offsets: array) -> None:
+    """
+    Append the offset of every line starting after a newline in data[start:end] to offsets
+    """
+
+    parts = data[start:end].split(b"\n")
+    # Line starts are the running sum of the line lengths plus their newline; the sums run in C
+    starts = itertools.accumulate(map(operator.add, map(len, parts[:-1]), itertools.repeat(1)), initial=start)
+    offsets.extend(itertools.islice(starts, 1, None))
+
+
+class LargeFileView(QAbstractScrollArea):
+    """
+    Read-only view of a memory-mapped text file that only decodes the lines on screen
+
+    A background worker indexes the line offsets, scrolling is by line and lines become reachable as they are
+    indexed, so the start of even a very large file shows at once.
+    """
+
+    # Lines indexed so far, whether indexing has finished
+    indexed = Signal(int, bool)
+
+    def __init__(self, file_path: str, parent=None):
+        super().__init__(parent)
+
+        self.file_path = file_path
+        self.skip_lines = 0
+        self.index_finished = False
+
+        with open(file_path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+
+        # Start offset of every line, filled in by the index worker and only ever appended to
+        self._offsets = array("Q", [0])
+        self._window_start = 0
+        self._window = []
+        self._pending_line = None
+
+        self.verticalScrollBar().setSingleStep(1)
+        self.verticalScrollBar().valueChanged.connect(self.viewport().update)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport().update)
+
+        self.worker = Worker(self._index_task)
+        self.worker.signals.progress.connect(self._index_progress)
+        self.worker.signals.finished.connect(self._index_done)
+        self.worker.start()
+
+    @property
+    def line_count(self) -> int:
+        return len(self._offsets)
+
+    def close_file(self) -> None:
+        """
+        Stop indexing and unmap the file, the view shows nothing afterwards
+        """
+
+        self.worker.cancel()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b""
+        self.size = 0
+        self._offsets = array("Q", [0])
+        self._invalidate_window()
+
+    def go_to_line(self, line_number: int) -> None:
+        """
+        Scroll so that line_number (1-based) is the first visible line, as soon as it has been indexed
+        """
+
+        line = max(line_number - 1, 0)
+        if line >= self.line_count and not self.index_finished:
+            self._pending_line = line
+            return
+
+        self._pending_line = None
+        self._update_scroll_range()
+        self.verticalScrollBar().setValue(line - self.skip_lines)
+
+    def set_skip_lines(self, skip_lines: int) -> None:
+        """
+        Hide the first skip_lines lines of the file, e.g. its metadata header
+        """
+
+        top = self.verticalScrollBar().value() + self.skip_lines
+        self.skip_lines = skip_lines
+        self._update_scroll_range()
+        self.verticalScrollBar().setValue(top - skip_lines)
+        self.viewport().update()
+
+    def count_lines_before(self, offset: int) -> int:
+        return self._data[:offset].count(b"\n")
+
+    def line_text(self, line: int) -> str:
+        start = self._offsets[line]
+        if line + 1 < len(self._offsets):
+            end = self._offsets[line + 1] - 1
+        else:
+            # The last line indexed so far, it ends at the next newline or the end of the file
+            end = self._data.find(b"\n", start, start + MAX_LINE_BYTES)
+            if end == -1:
+                end = self.size
+
+        text = self._data[start:min(end, start + MAX_LINE_BYTES)].decode(errors="replace")
+        return text.rstrip("\r").expandtabs(4)
+
+    def setFont(self, font) -> None:
+        super().setFont(font)
+        self._invalidate_window()
+        self._update_scroll_range()
+
+    def _index_task(self, progress, cancel_event) -> int:
+        position = 0
+        while position < self.size:
+            if cancel_event.is_set():
+                raise InterruptedError()
+
+            end = min(position + INDEX_CHUNK_SIZE, self.size)
+            index_lines(self._data, position, end, self._offsets)
+            position = end
+            progress(position, self.size, len(self._offsets))
+
+        return len(self._offsets)
+
+    def _index_progress(self, done, total, line_count) -> None:
+        # The last line of the window may have been cut off at the end of the indexed part
+        self._invalidate_window()
+        self._update_scroll_range()
+        self.indexed.emit(line_count, False)
+
+        if self._pending_line is not None and self._pending_line < line_count:
+            self.go_to_line(self._pending_line + 1)
+
+    def _index_done(self, line_count) -> None:
+        self.index_finished = True
+        self._invalidate_window()
+        self._update_scroll_range()
+        self.indexed.emit(line_count, True)
+
+        if self._pending_line is not None:
+            self.go_to_line(min(self._pending_line, line_count - 1) + 1)
+
+    def _visible_line_count(self) -> int:
+        return max(self.viewport().height() // max(self.fontMetrics().lineSpacing(), 1), 1)
+
+    def _update_scroll_range(self) -> None:
+        visible = self._visible_line_count()
+        bar = self.verticalScrollBar()
+        bar.setPageStep(visible)
+        bar.setRange(0, max(self.line_count - self.skip_lines - visible, 0))
+
+    def _invalidate_window(self) -> None:
+        self._window = []
+        self.viewport().update()
+
+    def _lines(self, first: int, count: int) -> list[str]:
+        """
+        Decoded lines first to first + count, from the window around them which is rebuilt when scrolled past
+        """
+
+        last = min(first + count, self.line_count)
+        if first < self._window_start or last > self._window_start + len(self._window):
+            self._window_start = max(first - WINDOW_MARGIN, 0)
+            window_end = min(last + WINDOW_MARGIN, self.line_count)
+            self._window = [self.line_text(line) for line in range(self._window_start, window_end)]
+
+            longest = max(self._window, key=len, default="")
+            width = self.fontMetrics().horizontalAdvance(longest) + 2 * TEXT_MARGIN
+            bar = self.horizontalScrollBar()
+            bar.setPageStep(self.viewport().width())
+            bar.setRange(0, max(width - self.viewport().width(), bar.maximum()))
+
+        return self._window[first - self._window_start:last - self._window_start]
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self.viewport())
+        painter.fillRect(event.rect(), self.palette().base())
+        painter.setPen(self.palette().text().color())
+
+        metrics = self.fontMetrics()
+        line_height = metrics.lineSpacing()
+        first = self.verticalScrollBar().value() + self.skip_lines
+        x = TEXT_MARGIN - self.horizontalScrollBar().value()
+        y = TEXT_MARGIN + metrics.ascent()
+
+        for number, text in enumerate(self._lines(first, self._visible_line_count() + 1)):
+            painter.drawText(x, y + number * line_height, text)
+
+    def resizeEvent(self, event) -> None:
+        super().resizeEvent(event)
+        self._update_scroll_range()
+
+    def keyPressEvent(self, event) -> None:
+        bar = self.verticalScrollBar()
+        key = event.key()
+        if key == Qt.Key_Up:
+            bar.triggerAction(bar.SliderAction.SliderSingleStepSub)
+        elif key == Qt.Key_Down:
+            bar.triggerAction(bar.SliderAction.SliderSingleStepAdd)
+        elif key == Qt.Key_PageUp:
+            bar.triggerAction(bar.SliderAction.SliderPageStepSub)
+        elif key == Qt.Key_PageDown:
+            bar.triggerAction(bar.SliderAction.SliderPageStepAdd)
+        elif key == Qt.Key_Home and event.modifiers() & Qt.ControlModifier:
+            bar.setValue(bar.minimum())
+        elif key == Qt.Key_End and event.modifiers() & Qt.ControlModifier:
+            bar.setValue(bar.maximum())
+        else:
+            super().keyPressEvent(event)
@@ -1,16 +1,64 @@
 from PySide6.QtWidgets import *
 from PySide6.QtCore import *
+from PySide6.QtGui import QIntValidator
 import os
 import subprocess
+from AppFile.Utility import searchIndex, tagIndex
+from AppFile.Utility.metadataCache import META_HEADER_TEMPLATE, META_START_SIGNAL, META_END_SIGNAL, metadata_cache
+from AppFile.WorkArea.PreviewTab.largeFileView import LargeFileView
 
 FONT_SIZES = [7, 8, 9, 10, 11, 12, 13, 14, 18, 24, 36, 48, 64, 72, 96, 144, 288]
+# Files at least this large open read-only in a paged, memory-mapped view instead of the editor
+LARGE_FILE_THRESHOLD = 16 * 1024 * 1024
+# Lines searched for the end of a metadata header
+MAX_HEADER_BLOCKS = 200
 
 class TextEditTab(QWidget):
     def __init__(self, file_path):
+        """
+        A placeholder until load_editor is called, PreviewArea loads the editor when the tab is first activated
+        """
+
         super().__init__()
 
         self.file_path = file_path
         self.changes_saved = True  # Track whether changes have been saved initially
+        self.loaded = False
+        self.editor = None
+        self.text_edit = None
+        # time.monotonic() of the last time the tab was the current one
+        self.last_active = 0.0
+
+        outer_layout = QVBoxLayout(self)
+        outer_layout.setContentsMargins(0, 0, 0, 0)
+
+    @property
+    def loaded_bytes(self):
+        """
+        Rough memory held by the loaded editor
+        """
+
+        if not self.loaded:
+            return 0
+        if self.large_file:
+            return self.text_edit.line_count * 8
+        return self.text_edit.document().characterCount() * 2
+
+    def load_editor(self):
+        if self.loaded:
+            return
+
+        file_path = self.file_path
+        self.loaded = True
+        self.hidden = False
+        # (first, last) block numbers of the metadata header at the start of the document, None without a header
+        self.meta_blocks = None
+        # Edits before this position can change the header, edits after it cannot
+        self.meta_scan_end = 0
+        try:
+            self.large_file = os.path.getsize(file_path) >= LARGE_FILE_THRESHOLD
+        except OSError:
+            self.large_file = False
         hlayout = QHBoxLayout()
         open_in_other_app_btn = QPushButton("Open in third party application")
         add_metaData = QPushButton("Add MetaData")
@@ -30,44 +78,102 @@ class TextEditTab(QWidget):
         hlayout.addWidget(add_metaData)
         hlayout.addWidget(font_style)
         hlayout.addWidget(self.fontsize)
-        layout = QVBoxLayout(self)
+        self.editor = QWidget(self)
+        layout = QVBoxLayout(self.editor)
         layout.addLayout(hlayout)
-        self.label = QLabel(f"File: {os.path.basename(file_path)}", self)
-        self.text_edit = QTextEdit(self)
+        self.label = QLabel(f"File: {os.path.basename(file_path)}", self.editor)
+        if self.large_file:
+            self.text_edit = LargeFileView(file_path, self.editor)
+            self.text_edit.indexed.connect(self.update_line_count)
+            self.go_to_line_edit = QLineEdit()
+            self.go_to_line_edit.setPlaceholderText("Go to line")
+            self.go_to_line_edit.setValidator(QIntValidator(1, 2 ** 31 - 1))
+            self.go_to_line_edit.returnPressed.connect(self.go_to_line)
+            hlayout.addWidget(self.go_to_line_edit)
+            add_metaData.setEnabled(False)
+        else:
+            self.text_edit = QTextEdit(self.editor)
         self.text_edit.setFocus()
         layout.addWidget(self.label)
         layout.addWidget(self.text_edit)
-        self.save_button = QPushButton("Save", self)
+        self.save_button = QPushButton("Save", self.editor)
         self.save_button.clicked.connect(self.save_content)
+        self.save_button.setEnabled(not self.large_file)
         layout.addWidget(self.save_button)
-        self.setLayout(layout)
+        self.layout().addWidget(self.editor)
 
-        try:
-            with open(file_path, 'r') as file:
-                self.text_edit.setPlainText(file.read())
-        except Exception as e:
-            print(f"Error reading file: {e}")
+        if not self.large_file:
+            try:
+                with open(file_path, 'r') as file:
+                    self.text_edit.setPlainText(file.read())
+            except Exception as e:
+                print(f"Error reading file: {e}")
 
-        self.text_edit.textChanged.connect(self.text_changed)
+            document = self.text_edit.document()
+            document.setModified(False)
+            document.contentsChange.connect(self.contents_changed)
+            document.modificationChanged.connect(self.modification_changed)
+            self.scan_metadata()
         open_in_other_app_btn.clicked.connect(self.open_in_other_application)
         self.fontsize.currentIndexChanged[int].connect(self.change_font_size)
 
-        self.hidden = False
         self.enableOrDisable()
-        
-
-        #Let us create a variable to store the metadata section:
-        self.metadata_section = ''
 
     def is_metadataAdded(self):
-        text = self.text_edit.toPlainText()
-        meta_start_index = text.find("#METADATA_START")
-        meta_end_index = text.find("#METADATA_END")
-        if((meta_start_index != -1 and meta_end_index != -1) or self.hidden == True):
-            return True
-        else:
-            return False
-        
+        if self.large_file:
+            return metadata_cache.get(self.file_path).has_metadata
+
+        return self.meta_blocks is not None
+
+    def contents_changed(self, position, chars_removed, chars_added):
+        # Only edits reaching into the header region can add, move or remove the header
+        if position <= self.meta_scan_end:
+            self.scan_metadata()
+
+    def scan_metadata(self):
+        document = self.text_edit.document()
+        block = document.firstBlock()
+        meta_blocks = None
+
+        if block.text().startswith(META_START_SIGNAL):
+            for _ in range(MAX_HEADER_BLOCKS):
+                if META_END_SIGNAL in block.text():
+                    meta_blocks = (0, block.blockNumber())
+                    break
+                if not block.next().isValid():
+                    break
+                block = block.next()
+
+        self.meta_scan_end = block.position() + block.length()
+
+        if meta_blocks != self.meta_blocks:
+            old_blocks = self.meta_blocks
+            self.meta_blocks = meta_blocks
+            self.set_metadata_visibility(old_blocks)
+            self.enableOrDisable()
+
+    def set_metadata_visibility(self, old_blocks=None):
+        """
+        Hide or show the header blocks following the checkbox, showing the blocks of a previous header first
+        """
+
+        document = self.text_edit.document()
+        hide = self.hide_meta_data.isChecked()
+
+        for blocks, visible in ((old_blocks, True), (self.meta_blocks, not hide)):
+            if blocks is None:
+                continue
+
+            first = document.findBlockByNumber(blocks[0])
+            block = first
+            while block.isValid() and block.blockNumber() <= blocks[1]:
+                block.setVisible(visible)
+                last = block
+                block = block.next()
+            document.markContentsDirty(first.position(), last.position() + last.length() - first.position())
+
+        self.hidden = hide and self.meta_blocks is not None
+
     def enableOrDisable(self):
         if(self.is_metadataAdded() == False):
             self.hide_meta_data.setCheckable(False)
@@ -75,11 +181,22 @@ class TextEditTab(QWidget):
             self.hide_meta_data.setCheckable(True)
         
     def change_font_style(self, font):
+        if self.large_file:
+            font.setPointSize(self.text_edit.font().pointSize())
+            self.text_edit.setFont(font)
+            return
+
         self.text_edit.selectAll()  # Select the entire text content
         self.text_edit.setFont(font)
 
     def change_font_size(self, index):
         font_size = FONT_SIZES[index]
+        if self.large_file:
+            font = self.text_edit.font()
+            font.setPointSize(font_size)
+            self.text_edit.setFont(font)
+            return
+
         self.text_edit.selectAll()
         self.text_edit.setFontPointSize(font_size)
 
@@ -92,8 +209,8 @@ class TextEditTab(QWidget):
             # Handle other key events
             super().keyPressEvent(event)
 
-    def text_changed(self):
-        self.changes_saved = False
+    def modification_changed(self, modified):
+        self.changes_saved = not modified
         self.update_tab_title()
 
     def update_tab_title(self):
@@ -104,14 +221,76 @@ class TextEditTab(QWidget):
         else:
             tab_widget.setTabText(index, f"*{os.path.basename(self.file_path)}")
 
+    def set_file_path(self, file_path):
+        # The file was moved or renamed, an open large file stays mapped under its old name
+        self.file_path = file_path
+        if self.loaded:
+            self.label.setText(f"File: {os.path.basename(file_path)}")
+            if self.large_file:
+                self.update_line_count(self.text_edit.line_count, self.text_edit.index_finished)
+        self.update_tab_title()
+
+    def update_line_count(self, line_count, finished):
+        state = "lines" if finished else "lines indexed"
+        self.label.setText(f"File: {os.path.basename(self.file_path)} (read-only, {line_count:,} {state})")
+
+    def go_to_line(self):
+        if self.go_to_line_edit.text():
+            self.text_edit.go_to_line(int(self.go_to_line_edit.text()))
+            self.text_edit.setFocus()
+
+    def show_line(self, line_number):
+        """
+        Load the editor if needed and scroll to line_number (1-based), placing the cursor at its start
+        """
+
+        self.load_editor()
+        if self.large_file:
+            self.text_edit.go_to_line(line_number)
+            return
+
+        block = self.text_edit.document().findBlockByNumber(max(line_number - 1, 0))
+        if not block.isValid():
+            return
+
+        cursor = self.text_edit.textCursor()
+        cursor.setPosition(block.position())
+        self.text_edit.setTextCursor(cursor)
+        self.text_edit.ensureCursorVisible()
+        self.text_edit.setFocus()
+
+    def close_file(self):
+        # Release the mapping of a large file, the tab is not usable afterwards
+        if self.loaded and self.large_file:
+            self.text_edit.close_file()
+
+    def unload_editor(self):
+        """
+        Drop the editor and its content, back to a placeholder that reloads the file when activated again
+        """
+
+        if not self.loaded or not self.changes_saved:
+            return
+
+        self.close_file()
+        self.layout().removeWidget(self.editor)
+        self.editor.deleteLater()
+        self.editor = None
+        self.text_edit = None
+        self.loaded = False
+
     def save_content(self):
+        if self.large_file:
+            return
+
         try:
             
             with open(self.file_path, 'w') as file:
                 file.write(self.text_edit.toPlainText())
-            self.changes_saved = True
-            self.update_tab_title()
-            self.enableOrDisable()
+            metadata_cache.invalidate(self.file_path)
+            tagIndex.notify_changed(self.file_path)
+            searchIndex.notify_changed(self.file_path)
+            self.text_edit.document().setModified(False)
         except Exception as e:
             QMessageBox.warning(self, "Save Error", f"Error saving file: {e}")
 
@@ -134,11 +313,13 @@ class TextEditTab(QWidget):
             QMessageBox.warning(self, "Open Error", f"Error opening file: {e}")
 
     def addMetaData(self):
-        
+            if self.large_file or metadata_cache.get(self.file_path).has_metadata:
+                return
+
             with open(self.file_path, 'r') as file:
                     content = file.read()
 
-            meta_data = "#METADATA_START------------------------------------------------------------------ \n %Tag: \n\n %Note: \n ------------------------------------------------------------------#METADATA_END\n"
+            meta_data = META_HEADER_TEMPLATE.format("")
             
             if not (content.startswith("#METADATA_START")):
                 new_content = meta_data + content
@@ -147,41 +328,17 @@ class TextEditTab(QWidget):
                         file.write(new_content)
                     self.text_edit.setPlainText(new_content)    
                     self.save_content()
-                    self.enableOrDisable()
                 except Exception as e:
                     QMessageBox.warning(self, "Save Error", f"Error saving file: {e}")
 
     def hideMetaData(self):
-        text = self.text_edit.toPlainText()
-        meta_start_index = text.find("#METADATA_START")
-        meta_end_index = text.find("#METADATA_END")
-
-        if self.hide_meta_data.isChecked() and meta_start_index != -1 and meta_end_index != -1:
-            # Hide metadata
-            self.metadata_section = text[meta_start_index:meta_end_index + len("#METADATA_END")]
-            text_without_metadata = text.replace(self.metadata_section, "")
-            self.text_edit.setPlainText(text_without_metadata)
-            self.hidden = True
-            self.changes_saved = False  # Metadata is hidden, so changes are not saved
-            self.update_tab_title()
-        elif not self.hide_meta_data.isChecked() and meta_start_index == -1 and meta_end_index == -1:
-            # Show metadata if it's not already present
-            self.save_content()
-            with open(self.file_path, 'r') as file:
-                content = file.read()
-                if content.startswith("#METADATA_START"):
-                    self.text_edit.setPlainText(content)  
-                    self.hidden = False 
-                    self.changes_saved = False  # Metadata is shown, so changes are not saved
-                    self.update_tab_title()
-                else:
-                    self.save_content()
-                    # Add metadata back
-                    new_content = self.metadata_section + content
-                    self.text_edit.setPlainText(new_content)
-                    self.hidden = False
-                    self.changes_saved = False  # Metadata is shown, so changes are not saved
-                    self.update_tab_title()
-
-                
-            
\ No newline at end of file
+        if self.large_file:
+            # Hiding only scrolls past the header, the file is never rewritten
+            header = metadata_cache.get(self.file_path)
+            hidden = self.hide_meta_data.isChecked() and header.has_metadata
+            self.text_edit.set_skip_lines(self.text_edit.count_lines_before(header.body_offset) if hidden else 0)
+            self.hidden = hidden
+            return
+
+        # The header stays in the document and is saved with it, only its blocks are hidden
+        self.set_metadata_visibility()
@@ -0,0 +1,181 @@
+import os
+from PySide6.QtCore import Qt, QSortFilterProxyModel, QTimer
+from AppFile.Utility.contextConfig import context_config
+from AppFile.Utility.metadataCache import metadata_cache
+from AppFile.Utility.workerUtility import Worker
+
+# Item roles on top of QFileSystemModel's, None until the background scan has reached the item
+CONTEXT_FOLDER_ROLE = Qt.UserRole + 10
+PRIORITY_ROLE = Qt.UserRole + 11
+TAGS_ROLE = Qt.UserRole + 12
+
+# Milliseconds scan requests are collected before one background scan runs for all of them
+SCAN_DELAY_MS = 50
+
+
+def _path_key(path: str) -> str:
+    # QFileSystemModel paths always use "/", os.scandir paths use the native separator
+    return path.replace("\\", "/")
+
+
+def scan_directory(directory: str) -> dict:
+    """
+    Read the context record of directory and of each of its folders, and the tags of each of its .txt files
+
+    :return: path : ("dir", ContextRecord or None) or ("file", tags)
+    """
+
+    items = {_path_key(directory): ("dir", context_config.get(directory))}
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir():
+                    items[_path_key(entry.path)] = ("dir", context_config.get(entry.path))
+                elif entry.name.endswith(".txt") and entry.is_file():
+                    items[_path_key(entry.path)] = ("file", metadata_cache.get(entry.path, entry.stat()).tags)
+    except OSError:
+        pass
+
+    return items
+
+
+class ContextProxyModel(QSortFilterProxyModel):
+    """
+    Proxy over the file system model adding context folder status, priority and tags as item roles
+
+    The roles come from a cache filled by background scans of each folder the file system model loads, so
+    neither painting nor sorting touches the disk. Siblings are sorted like the export orders them: context
+    folders by priority, then plain folders, then files, each by name.
+    """
+
+    def __init__(self, source_model, parent=None):
+        super().__init__(parent)
+
+        self.setSourceModel(source_model)
+        self.setDynamicSortFilter(True)
+
+        self.items = {}  # path : ("dir", ContextRecord or None) or ("file", tags)
+        # Source node id : sort key, lessThan runs n log n times per sort and the keys only change with a scan
+        self._sort_keys = {}
+        self.workers = set()
+        self._pending_dirs = set()
+
+        self._scan_timer = QTimer(self)
+        self._scan_timer.setSingleShot(True)
+        self._scan_timer.setInterval(SCAN_DELAY_MS)
+        self._scan_timer.timeout.connect(self.start_scan)
+
+        source_model.directoryLoaded.connect(self.request_scan)
+        source_model.rowsInserted.connect(self.source_rows_changed)
+        source_model.rowsRemoved.connect(self.source_rows_changed)
+        source_model.dataChanged.connect(self.source_data_changed)
+
+    def file_path(self, index) -> str:
+        return self.sourceModel().filePath(self.mapToSource(index))
+
+    def is_dir(self, index) -> bool:
+        return self.sourceModel().isDir(self.mapToSource(index))
+
+    def item(self, path: str) -> tuple | None:
+        return self.items.get(_path_key(path))
+
+    def clear_cache(self) -> None:
+        self.items.clear()
+        self._sort_keys.clear()
+        self.invalidate()
+
+    def request_scan(self, directory: str) -> None:
+        if not directory:
+            return
+
+        self._pending_dirs.add(directory)
+        self._scan_timer.start()
+
+    def start_scan(self) -> None:
+        directories = sorted(self._pending_dirs)
+        self._pending_dirs.clear()
+
+        def scan_task(progress, cancel_event):
+            items = {}
+            for directory in directories:
+                if cancel_event.is_set():
+                    break
+                items.update(scan_directory(directory))
+            return items
+
+        worker = Worker(scan_task)
+        worker.signals.finished.connect(self.scan_finished)
+        worker.signals.finished.connect(lambda result: self.workers.discard(worker))
+        worker.signals.failed.connect(lambda message: self.workers.discard(worker))
+        self.workers.add(worker)
+        worker.start()
+
+    def scan_finished(self, items: dict) -> None:
+        changed = {path: item for path, item in items.items() if self.items.get(path) != item}
+        if not changed:
+            return
+
+        self.items.update(changed)
+        self._sort_keys.clear()
+        # Sibling order depends on the cached priorities, resort once per scan rather than per item
+        self.invalidate()
+
+    def source_rows_changed(self, parent, first, last) -> None:
+        # Node ids of removed rows may be reused
+        self._sort_keys.clear()
+        self.request_scan(self.sourceModel().filePath(parent))
+
+    def source_data_changed(self, top_left, bottom_right, roles=()) -> None:
+        # A changed .context.ini is picked up too, the scan of a folder includes the folder's own record
+        self.request_scan(self.sourceModel().filePath(top_left.parent()))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (CONTEXT_FOLDER_ROLE, PRIORITY_ROLE, TAGS_ROLE, Qt.ToolTipRole):
+            item = self.item(self.file_path(index))
+            if item is None:
+                return None
+
+            kind, value = item
+            if kind == "dir":
+                if role == CONTEXT_FOLDER_ROLE:
+                    return value is not None
+                if value is None:
+                    return None
+                if role == PRIORITY_ROLE:
+                    return value.priority
+                if role == TAGS_ROLE:
+                    return sorted(value.tags)
+                return "priority: %d, tags: %s" % (value.priority, ", ".join(sorted(value.tags)))
+
+            if role == TAGS_ROLE:
+                return list(value)
+            if role == Qt.ToolTipRole and value:
+                return "tags: %s" % ", ".join(value)
+            return None
+
+        return super().data(index, role)
+
+    def sort_key(self, source_index) -> tuple:
+        source_model = self.sourceModel()
+        name = source_model.fileName(source_index)
+        if not source_model.isDir(source_index):
+            return 2, 0, name
+
+        item = self.items.get(source_model.filePath(source_index))
+        if item is not None and item[1] is not None:
+            return 0, item[1].priority, name
+        return 1, 0, name
+
+    def lessThan(self, source_left, source_right) -> bool:
+        sort_keys = self._sort_keys
+        left_id = source_left.internalId()
+        right_id = source_right.internalId()
+
+        left_key = sort_keys.get(left_id)
+        if left_key is None:
+            left_key = sort_keys[left_id] = self.sort_key(source_left)
+        right_key = sort_keys.get(right_id)
+        if right_key is None:
+            right_key = sort_keys[right_id] = self.sort_key(source_right)
+
+        return left_key < right_key
@@ -5,6 +5,9 @@ from PySide6.QtCore import *
 from PySide6.QtGui import *
 from AppFile import singleton
 from AppFile.Utility import fileUtility
+from AppFile.Utility.contextConfig import context_config
+from AppFile.Utility.metadataCache import metadata_cache
+from AppFile.WorkArea.contextProxyModel import ContextProxyModel
 
 PathItemType = Enum('PathItemType', ['FOLDER', 'CONTEXT_FOLDER', 'CONFIG_FILE', 'TEXT_FILE', 'OTHER_FILE'])
 
@@ -24,14 +27,17 @@ class FileStructArea(QWidget):
         button_new_file.pressed.connect(fileUtility.new_file)
         button_import_dir = QPushButton('import folder', self)
         button_import_dir.pressed.connect(fileUtility.import_dir)
+        button_edit_tags = QPushButton('edit tags', self)
+        button_edit_tags.pressed.connect(lambda: fileUtility.edit_tags(self.tree_view.selected_paths()))
         button_rename = QPushButton('rename', self)
         button_rename.pressed.connect(lambda: fileUtility.rename(self.tree_view.current_file_path))
         button_remove = QPushButton('delete', self)
-        button_remove.pressed.connect(lambda: fileUtility.remove(self.tree_view.current_file_path))
+        button_remove.pressed.connect(lambda: fileUtility.remove(self.tree_view.selected_paths()))
 
         h_layout.addWidget(button_new_folder)
         h_layout.addWidget(button_new_file)
         h_layout.addWidget(button_import_dir)
+        h_layout.addWidget(button_edit_tags)
         h_layout.addWidget(button_rename)
         h_layout.addWidget(button_remove)
 
@@ -47,6 +53,11 @@ class FileStructArea(QWidget):
     def current_dir_changed(self):
         pass
 
+    def paths_changed(self, directories):
+        # The file system model picks up the changes itself, the context roles are rescanned in one batch
+        for directory in directories:
+            self.tree_view.proxy_model.request_scan(directory)
+
 
 class TreeView(QTreeView):
     def __init__(self):
@@ -62,10 +73,14 @@ class TreeView(QTreeView):
 
         # Variables
         self.current_file_path = current_dir.absolutePath()
+        self.current_is_dir = True
         self.setDragEnabled(True)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
 
         if sys_model:
-            self.setModel(sys_model)
+            self.proxy_model = ContextProxyModel(sys_model, self)
+            self.setModel(self.proxy_model)
+            self.proxy_model.sort(0, Qt.AscendingOrder)
         else:
             pass  # Error setting up model
 
@@ -80,25 +95,46 @@ class TreeView(QTreeView):
     def update_root_index(self):
         sys_model = singleton.SingletonSysModel()
         root_dir = singleton.SingletonRootDir()
-        self.setRootIndex(sys_model.index(root_dir.absolutePath()))
+        # Only the opened project is watched
+        self.proxy_model.clear_cache()
+        source_root = sys_model.setRootPath(root_dir.absolutePath())
+        self.setRootIndex(self.proxy_model.mapFromSource(source_root))
 
     def update_current_index(self, index):
         current_dir = singleton.SingletonCurrentDir()
-        sys_model = singleton.SingletonSysModel()
         # Keep a path and directory, which is the same if path is directory
-        self.current_file_path = sys_model.filePath(index)
-        if os.path.isdir(self.current_file_path):
+        self.current_file_path = self.proxy_model.file_path(index)
+        self.current_is_dir = self.proxy_model.is_dir(index)
+        if self.current_is_dir:
             current_dir.setPath(self.current_file_path)
         else:
             parent_path = os.path.dirname(self.current_file_path)
             current_dir.setPath(parent_path)
 
+    def selected_paths(self):
+        """
+        Paths of the selected items without those inside another selected folder, else the current path
+        """
+
+        paths = {self.proxy_model.file_path(index) for index in self.selectionModel().selectedRows(0)}
+        if not paths:
+            return [self.current_file_path]
+
+        top_level = []
+        for path in sorted(paths):
+            parent = os.path.dirname(path)
+            while parent not in paths and os.path.dirname(parent) != parent:
+                parent = os.path.dirname(parent)
+            if parent not in paths:
+                top_level.append(path)
+        return top_level
+
     # Contex menu
     def open_context_menu(self, pos):
         menu = None
 
-        if os.path.isdir(self.current_file_path):
-            if fileUtility.is_path_context_folder(self.current_file_path):
+        if self.current_is_dir:
+            if self.context_record(self.current_file_path) is not None:
                 menu = self.generate_context_menu(PathItemType.CONTEXT_FOLDER)
             else:
                 menu = self.generate_context_menu(PathItemType.FOLDER)
@@ -112,6 +148,14 @@ class TreeView(QTreeView):
 
         menu.exec(self.mapToGlobal(pos))
 
+    def context_record(self, path):
+        item = self.proxy_model.item(path)
+        if item is not None:
+            return item[1]
+
+        # Not scanned yet
+        return context_config.get(path)
+
     def generate_context_menu(self, path_item_type):
         main_win = singleton.SingletonMainWin()
 
@@ -123,6 +167,12 @@ class TreeView(QTreeView):
             new_context_folder_action = context_menu.addAction('new context folder')
             new_context_folder_action.triggered.connect(fileUtility.new_context_folder)
 
+        if path_item_type == PathItemType.CONTEXT_FOLDER:
+            record = self.context_record(self.current_file_path)
+            if record is not None:
+                info_action = context_menu.addAction('priority: %d, tags: %s' % (record.priority, ', '.join(sorted(record.tags))))
+                info_action.setEnabled(False)
+
         if path_item_type == PathItemType.FOLDER:
             convert_to_context_folder_action = context_menu.addAction('convert to context folder')
             convert_to_context_folder_action.triggered.connect(
@@ -134,17 +184,28 @@ class TreeView(QTreeView):
             import_dir_action = context_menu.addAction('import folder')
             import_dir_action.triggered.connect(fileUtility.import_dir)
 
+        if path_item_type == PathItemType.TEXT_FILE:
+            item = self.proxy_model.item(self.current_file_path)
+            tags = item[1] if item is not None else metadata_cache.get(self.current_file_path).tags
+            if tags:
+                tags_action = context_menu.addAction('tags: %s' % ', '.join(tags))
+                tags_action.setEnabled(False)
+
         if path_item_type == PathItemType.TEXT_FILE or path_item_type == PathItemType.CONFIG_FILE:
             open_file_action = context_menu.addAction('edit')
             open_file_action.triggered.connect(lambda: fileUtility.open_file(self.current_file_path))
 
+        if not path_item_type == PathItemType.CONFIG_FILE and not path_item_type == PathItemType.OTHER_FILE:
+            edit_tags_action = context_menu.addAction('edit tags')
+            edit_tags_action.triggered.connect(lambda: fileUtility.edit_tags(self.selected_paths()))
+
         if not path_item_type == PathItemType.CONFIG_FILE:
             rename_action = context_menu.addAction('rename')
             rename_action.triggered.connect(lambda: fileUtility.rename(self.current_file_path))
             move_to_action = context_menu.addAction('move')
-            move_to_action.triggered.connect(lambda: fileUtility.move_to(self.current_file_path))
+            move_to_action.triggered.connect(lambda: fileUtility.move_to(self.selected_paths()))
 
         remove_action = context_menu.addAction('delete')
-        remove_action.triggered.connect(lambda: fileUtility.remove(self.current_file_path))
+        remove_action.triggered.connect(lambda: fileUtility.remove(self.selected_paths()))
 
         return context_menu
@@ -1,6 +1,19 @@
+import os
+import time
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import *
 from AppFile.WorkArea.PreviewTab.textEditTab import TextEditTab
 
+# Loaded editors may hold this much before idle ones are unloaded
+MAX_LOADED_BYTES = 256 * 1024 * 1024
+# Seconds a tab has to be in the background before its editor may be unloaded
+IDLE_UNLOAD_SECONDS = 300
+UNLOAD_CHECK_INTERVAL_MS = 30 * 1000
+
+
+def tab_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
 
 class PreviewArea(QTabWidget):
     def __init__(self):
@@ -8,7 +21,75 @@ class PreviewArea(QTabWidget):
 
         self.setTabsClosable(True)
 
+        # Normalized file path : TextEditTab of every open file
+        self.tabs_by_path = {}
+        self.active_tab = None
+
         self.tabCloseRequested.connect(self.close_tab)
+        self.currentChanged.connect(self.tab_activated)
+
+        self.unload_timer = QTimer(self)
+        self.unload_timer.timeout.connect(self.unload_idle_tabs)
+        self.unload_timer.start(UNLOAD_CHECK_INTERVAL_MS)
+
+    def find_tab(self, path):
+        tab = self.tabs_by_path.get(tab_key(path))
+        if tab is not None and self.indexOf(tab) == -1:
+            # Removed without going through close_tab
+            del self.tabs_by_path[tab_key(path)]
+            return None
+
+        return tab
+
+    def open_tab(self, path, activate=True):
+        """
+        Add a tab for the file unless one is open already, its editor is only loaded once the tab is activated
+
+        :return: The tab of the file
+        """
+
+        tab = self.find_tab(path)
+        if tab is None:
+            tab = TextEditTab(path)
+            self.tabs_by_path[tab_key(path)] = tab
+            self.addTab(tab, os.path.basename(path))
+
+        if activate:
+            self.setCurrentWidget(tab)
+
+        return tab
+
+    def tab_activated(self, index):
+        now = time.monotonic()
+        if self.active_tab is not None:
+            self.active_tab.last_active = now
+
+        widget = self.widget(index)
+        self.active_tab = widget if isinstance(widget, TextEditTab) else None
+        if self.active_tab is not None:
+            self.active_tab.last_active = now
+            self.active_tab.load_editor()
+            self.unload_idle_tabs()
+
+    def unload_idle_tabs(self):
+        """
+        Unload the editors idle the longest while loaded editors hold more than MAX_LOADED_BYTES
+        """
+
+        loaded_tabs = [tab for tab in self.tabs_by_path.values() if tab.loaded]
+        loaded_bytes = sum(tab.loaded_bytes for tab in loaded_tabs)
+        if loaded_bytes <= MAX_LOADED_BYTES:
+            return
+
+        idle_since = time.monotonic() - IDLE_UNLOAD_SECONDS
+        for tab in sorted(loaded_tabs, key=lambda tab: tab.last_active):
+            if loaded_bytes <= MAX_LOADED_BYTES or tab.last_active > idle_since:
+                break
+            if tab is self.active_tab or not tab.changes_saved:
+                continue
+
+            loaded_bytes -= tab.loaded_bytes
+            tab.unload_editor()
 
     def close_tab(self, index):
         # Check if changes are saved
@@ -29,4 +110,60 @@ class PreviewArea(QTabWidget):
                     return
 
         # Close the tab when the close button is clicked
-        self.removeTab(index)
\ No newline at end of file
+        self.removeTab(index)
+        if isinstance(widget, TextEditTab):
+            self.forget_tab(widget)
+
+    def forget_tab(self, tab):
+        if self.tabs_by_path.get(tab_key(tab.file_path)) is tab:
+            del self.tabs_by_path[tab_key(tab.file_path)]
+        if tab is self.active_tab:
+            self.active_tab = None
+        tab.close_file()
+
+    def paths_moved(self, moves):
+        """
+        Point the tabs of moved files, or of files inside moved folders, at their new paths
+
+        :param moves: (old path, new path) pairs
+        """
+
+        moved = [(tab_key(old), len(os.path.abspath(old)), new) for old, new in moves]
+        for key, tab in list(self.tabs_by_path.items()):
+            for old_key, old_length, new in moved:
+                if key == old_key or key.startswith(os.path.join(old_key, '')):
+                    del self.tabs_by_path[key]
+                    tab.set_file_path(new + os.path.abspath(tab.file_path)[old_length:])
+                    self.tabs_by_path[tab_key(tab.file_path)] = tab
+                    break
+
+    def paths_removed(self, paths):
+        """
+        Close the tabs of deleted files, or of files inside deleted folders, unless they have unsaved changes
+        """
+
+        keys = [tab_key(path) for path in paths]
+        for key, tab in list(self.tabs_by_path.items()):
+            if tab.changes_saved and any(key == removed or key.startswith(os.path.join(removed, '')) for removed in keys):
+                self.removeTab(self.indexOf(tab))
+                self.forget_tab(tab)
+
+    def paths_rewritten(self, paths):
+        """
+        Reload the tabs of files rewritten on disk, tabs with unsaved changes keep them
+        """
+
+        keys = {tab_key(path) for path in paths}
+        for key, tab in self.tabs_by_path.items():
+            if key in keys and tab.loaded and tab.changes_saved:
+                tab.unload_editor()
+                if tab is self.active_tab:
+                    tab.load_editor()
+
+    def clear(self):
+        for tab in self.tabs_by_path.values():
+            tab.close_file()
+        self.tabs_by_path.clear()
+        self.active_tab = None
+
+        super().clear()
@@ -0,0 +1,114 @@
+import os
+from PySide6.QtWidgets import *
+from PySide6.QtCore import *
+from AppFile import singleton
+from AppFile.Utility import searchIndex
+from AppFile.Utility.workerUtility import Worker
+
+# Milliseconds typing has to pause before the query runs
+SEARCH_DELAY_MS = 150
+# Characters of a matching line shown in the result list
+MAX_PREVIEW_CHARS = 200
+
+
+class SearchArea(QWidget):
+    """
+    Full-text search over the opened folder, activating a result opens the file at the matching line
+
+    Queries are words and "quoted phrases" that must all occur in one line, tag:<name> keeps only files with
+    that tag.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.query_edit = QLineEdit(self)
+        self.query_edit.setPlaceholderText('search: words, "a phrase", tag:name')
+        self.query_edit.setClearButtonEnabled(True)
+        self.status_label = QLabel(self)
+        self.result_list = QListWidget(self)
+        self.result_list.setUniformItemSizes(True)
+
+        v_layout = QVBoxLayout()
+        v_layout.addWidget(self.query_edit)
+        v_layout.addWidget(self.status_label)
+        v_layout.addWidget(self.result_list)
+        self.setLayout(v_layout)
+
+        self.workers = set()
+        # Only the results of the latest query are shown
+        self.query_generation = 0
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.run_search)
+
+        self.query_edit.textChanged.connect(self.search_timer.start)
+        self.query_edit.returnPressed.connect(self.run_search)
+        self.result_list.itemActivated.connect(self.open_result)
+
+    def run_search(self):
+        self.search_timer.stop()
+        self.query_generation += 1
+        generation = self.query_generation
+        query = self.query_edit.text()
+        index = searchIndex.current_index()
+
+        if index is None or not query.strip():
+            self.result_list.clear()
+            self.status_label.setText('' if index is not None else 'no folder opened')
+            return
+
+        def search_task(progress, cancel_event):
+            return index.search(query), index.syncing
+
+        worker = Worker(search_task)
+        worker.signals.finished.connect(lambda result: self.show_results(generation, index, *result))
+        worker.signals.finished.connect(lambda result: self.workers.discard(worker))
+        worker.signals.failed.connect(lambda message: self.search_failed(generation, message))
+        worker.signals.failed.connect(lambda message: self.workers.discard(worker))
+        self.workers.add(worker)
+        worker.start()
+
+    def show_results(self, generation, index, results, syncing):
+        if generation != self.query_generation:
+            return
+
+        self.result_list.clear()
+        for result in results:
+            rel_path = index.relative_path(result.path)
+            if result.text:
+                label = '%s:%d: %s' % (rel_path, result.line_number, result.text.strip()[:MAX_PREVIEW_CHARS])
+            else:
+                label = rel_path
+            item = QListWidgetItem(label)
+            item.setData(Qt.UserRole, (result.path, result.line_number))
+            item.setToolTip(result.path)
+            self.result_list.addItem(item)
+
+        status = '%d results' % len(results)
+        if len(results) >= searchIndex.DEFAULT_RESULT_LIMIT:
+            status = 'first %d results' % len(results)
+        if syncing:
+            status += ' (indexing)'
+        self.status_label.setText(status)
+
+    def search_failed(self, generation, message):
+        if generation == self.query_generation:
+            self.result_list.clear()
+            self.status_label.setText('search error: %s' % message)
+
+    def open_result(self, item):
+        main_win = singleton.SingletonMainWin()
+        path, line_number = item.data(Qt.UserRole)
+        if not os.path.isfile(path):
+            return
+
+        tab = main_win.preview_area.open_tab(path)
+        tab.show_line(line_number)
+
+    def root_dir_changed(self):
+        self.result_list.clear()
+        self.status_label.setText('')
+        self.query_edit.clear()
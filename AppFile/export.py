@@ -0,0 +1,229 @@
+"""
+Headless export entry point, runs exportUtility.Exporter without starting the Qt application
+
+    python -m AppFile.export <source_dir> <target_file> [--filter "<rule>"] [--include-meta]
+    python -m AppFile.export --batch jobs.json
+    python -m AppFile.export <source_dir> <target_file> --watch
+
+A batch file holds a JSON list of jobs, or one JSON job per line. Each job is an object with the keys
+"source", "target" and optionally "filter", "include_meta", "workers", "incremental" and "force"; options
+missing from a job are taken from the command line. Jobs sharing "source", "workers", "incremental" and "force" are
+exported together from a single walk of the source folder.
+
+A target whose inputs did not change since its last export is left as it is unless "force" is set.
+
+With --watch the targets are exported and then kept current, updated in place, until the process is interrupted.
+
+This module must not import PySide6 or AppFile.singleton.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from AppFile.Utility.exportUtility import Exporter
+from AppFile.Utility.exportWatcher import ExportWatcher
+
+# Seconds the main thread sleeps between checks for an interrupt while watching
+WATCH_JOIN_INTERVAL = 0.5
+# Errors of a failed export, reported per target
+EXPORT_ERRORS = (OSError, KeyError, TypeError, ValueError)
+
+
+def create_exporter(jobs: list[dict]) -> Exporter:
+    """
+    One exporter for all jobs, they must share "source", "workers", "incremental" and "force"
+    """
+
+    job = jobs[0]
+    return Exporter(job["source"], workers=job.get("workers", 0), incremental=job.get("incremental", False),
+                    force=job.get("force", False),
+                    targets=[(job["target"], job.get("filter") or "", job.get("include_meta", False)) for job in jobs])
+
+
+def run_jobs(jobs: list[dict]) -> Exporter:
+    """
+    Export all jobs from one walk, they must share "source", "workers", "incremental" and "force"
+    """
+
+    exporter = create_exporter(jobs)
+    exporter.export()
+    return exporter
+
+
+def watch_jobs(jobs: list[dict]) -> int:
+    """
+    Keep the targets of all jobs current until interrupted, with one watching thread per group of jobs
+    """
+
+    cancel_event = threading.Event()
+    threads = []
+    groups = group_jobs([{**job, "incremental": True} for job in jobs])
+    while groups:
+        group = groups.pop(0)
+        try:
+            watcher = ExportWatcher(create_exporter(group))
+        except EXPORT_ERRORS as e:
+            if len(group) > 1:
+                # Watch the jobs of the group one by one, so a bad job does not stop the others
+                groups[:0] = [[job] for job in group]
+            else:
+                print("failed %s: %s" % (group[0].get("target"), str(e) or type(e).__name__), file=sys.stderr)
+            continue
+
+        thread = threading.Thread(target=watcher.run, daemon=True,
+                                  args=(lambda updates, latency, status: print(status, flush=True), cancel_event))
+        thread.start()
+        threads.append(thread)
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(WATCH_JOIN_INTERVAL)
+    except KeyboardInterrupt:
+        cancel_event.set()
+        for thread in threads:
+            thread.join()
+
+    return 0 if threads else 1
+
+
+def group_jobs(jobs: list[dict]) -> list[list[dict]]:
+    """
+    Group the jobs that can be served by one walk, keeping the order of their first job
+    """
+
+    groups = {}
+    for job in jobs:
+        key = (job.get("source"), job.get("workers", 0), job.get("incremental", False), job.get("force", False))
+        groups.setdefault(key, []).append(job)
+
+    return list(groups.values())
+
+
+def job_error(job: dict) -> str | None:
+    """
+    :return: Why the job cannot be run, None if it can
+    """
+
+    if not isinstance(job, dict):
+        return "a job must be a JSON object"
+    for key in ("source", "target"):
+        if not isinstance(job.get(key), str) or not job[key]:
+            return 'no "%s" given' % key
+    workers = job.get("workers", 0)
+    if not isinstance(workers, int) or isinstance(workers, bool) or workers < 0:
+        return '"workers" must be a whole number of 0 or more'
+    for key in ("include_meta", "incremental", "force"):
+        if not isinstance(job.get(key, False), bool):
+            return '"%s" must be true or false' % key
+    if not isinstance(job.get("filter") or "", (str, list)):
+        return '"filter" must be a string or a list of tags'
+    if not os.path.isdir(job["source"]):
+        return "source is not a directory: %s" % job["source"]
+    if os.path.isdir(job["target"]):
+        return "target is a directory"
+    if not os.path.isdir(os.path.dirname(os.path.abspath(job["target"]))):
+        return "target directory does not exist"
+
+    return None
+
+
+def run_group(group: list[dict], stats: bool = False) -> int:
+    """
+    Export a group of jobs from one walk and print the outcome of each target
+
+    If the export fails, the jobs are exported again one by one, so only the targets that fail are reported.
+
+    :param stats: Also print the full report of the export as JSON
+    :return: Number of jobs that failed
+    """
+
+    try:
+        exporter = run_jobs(group)
+    except EXPORT_ERRORS as e:
+        if len(group) > 1:
+            return sum(run_group([job], stats) for job in group)
+        print("failed %s: %s" % (group[0].get("target"), str(e) or type(e).__name__), file=sys.stderr)
+        return 1
+
+    for target in exporter.targets:
+        state = "unchanged" if target in exporter.skipped_targets else "exported"
+        print("%s %s (%d bytes)" % (state, target.target_file, os.path.getsize(target.target_file)))
+    if stats:
+        print(json.dumps(exporter.stats.to_dict(), indent=2))
+
+    return 0
+
+
+def read_batch(batch_path: str) -> list[dict]:
+    with open(batch_path, "r") as f:
+        content = f.read()
+
+    if content.lstrip().startswith("["):
+        return json.loads(content)
+
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m AppFile.export", description="Export a CreatiView project folder")
+    parser.add_argument("source", nargs="?", help="directory to export")
+    parser.add_argument("target", nargs="?", help="file to export to")
+    parser.add_argument("-f", "--filter", default="", help='filter rule, e.g. "draft:file:not,chapter:dir" or '
+                        '"(chapter OR scene) AND NOT draft AND NOT path:notes/**"')
+    parser.add_argument("-m", "--include-meta", action="store_true", help="keep metadata headers in the export")
+    parser.add_argument("-w", "--workers", type=int, default=0, help="threads reading files ahead of the writer")
+    parser.add_argument("-i", "--incremental", action="store_true", help="reuse output of unchanged folders")
+    parser.add_argument("--force", action="store_true", help="export even if the inputs did not change")
+    parser.add_argument("--watch", action="store_true", help="keep the exports current until interrupted")
+    parser.add_argument("-b", "--batch", help="file with many export jobs to run in this process")
+    parser.add_argument("-s", "--stats", action="store_true", help="print the full report of each export as JSON")
+
+    args = parser.parse_args(argv)
+    if args.batch is None and (args.source is None or args.target is None):
+        parser.error("source and target are required unless --batch is given")
+
+    return args
+
+
+def main(argv: list[str] = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    defaults = {"source": args.source, "target": args.target, "filter": args.filter,
+                "include_meta": args.include_meta, "workers": args.workers, "incremental": args.incremental,
+                "force": args.force}
+    if args.batch is not None:
+        try:
+            jobs = [{**defaults, **job} if isinstance(job, dict) else job for job in read_batch(args.batch)]
+        except (OSError, ValueError) as e:
+            print("failed to read %s: %s" % (args.batch, e), file=sys.stderr)
+            return 1
+    else:
+        jobs = [defaults]
+
+    # A bad job is reported like a failed export, the others still run
+    failures = 0
+    valid_jobs = []
+    for number, job in enumerate(jobs, 1):
+        error = job_error(job)
+        if error is None:
+            valid_jobs.append(job)
+        else:
+            failures += 1
+            target = job.get("target") if isinstance(job, dict) else None
+            print("failed %s: %s" % (target or "job %d" % number, error), file=sys.stderr)
+
+    if args.watch:
+        status = watch_jobs(valid_jobs) if valid_jobs else 1
+        return 1 if failures else status
+
+    for group in group_jobs(valid_jobs):
+        failures += run_group(group, args.stats)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,14 @@
+import os
 from PySide6.QtCore import QDir
 
 from AppFile.Menu.exportMenu import AdvancedExportMenu
 from AppFile.Utility import fileUtility, exportUtility
+from AppFile.Utility.fileOperationQueue import DELETE, MOVE, FileOperationQueue
+from AppFile.Utility.tagEditUtility import TAG_EDIT
+from AppFile.Utility.workerUtility import Worker
 from AppFile.WorkArea.fileStructArea import *
 from AppFile.WorkArea.previewArea import PreviewArea
+from AppFile.WorkArea.searchArea import SearchArea
 
 APP_TITLE = 'CreatiView'
 
@@ -53,7 +58,7 @@ class SingletonMainWin(QMainWindow):
         root_dir = SingletonRootDir('M:/download/test')
         current_dir = SingletonCurrentDir(root_dir.absolutePath())
         sys_model = SingletonSysModel()
-        sys_model.setRootPath(QDir.currentPath())
+        sys_model.setRootPath(root_dir.absolutePath())
 
         # Menu Bar
         menu_bar = self.menuBar()
@@ -69,6 +74,25 @@ class SingletonMainWin(QMainWindow):
         # Status Bar
         self.setStatusBar(QStatusBar(self))
         self.statusBar().showMessage('status message')
+        self.status_progress = QProgressBar()
+        self.status_progress.setMaximumWidth(240)
+        self.status_progress.hide()
+        self.statusBar().addPermanentWidget(self.status_progress)
+        self.cancel_operations_button = QPushButton('cancel')
+        self.cancel_operations_button.hide()
+        self.statusBar().addPermanentWidget(self.cancel_operations_button)
+        self.watch_label = QLabel()
+        self.watch_label.hide()
+        self.statusBar().addPermanentWidget(self.watch_label)
+        self.stop_watch_button = QPushButton('stop watching')
+        self.stop_watch_button.hide()
+        self.statusBar().addPermanentWidget(self.stop_watch_button)
+
+        # At most one export is kept current while the project changes
+        self.export_watch = None
+
+        # File operations run in the background, one job at a time
+        self.file_operations = FileOperationQueue(self)
 
         # Signal Linkage
         open_folder_action.triggered.connect(fileUtility.open_folder)
@@ -77,23 +101,109 @@ class SingletonMainWin(QMainWindow):
         import_dir_action.triggered.connect(fileUtility.import_dir)
         #quick_export_action.triggered.connect(exportUtility.quick_export)
         advanced_export_action.triggered.connect(self.call_advanced_export)
+        self.file_operations.job_started.connect(self.file_operation_started)
+        self.file_operations.job_progress.connect(self.file_operation_progress)
+        self.file_operations.job_finished.connect(self.file_operation_finished)
+        self.cancel_operations_button.clicked.connect(self.file_operations.cancel_all)
+        self.stop_watch_button.clicked.connect(self.stop_watch)
 
         # Work Area Creation
         self.file_struct_area = FileStructArea()
+        self.search_area = SearchArea()
         self.preview_area = PreviewArea()
 
         # Display Work Area
+        left_split = QSplitter(Qt.Vertical)
+        left_split.addWidget(self.file_struct_area)
+        left_split.addWidget(self.search_area)
+        left_split.setSizes([3, 1])
         left_right_split = QSplitter(Qt.Horizontal)
-        left_right_split.addWidget(self.file_struct_area)
+        left_right_split.addWidget(left_split)
         left_right_split.addWidget(self.preview_area)
         left_right_split.setSizes([1,1])
         self.setCentralWidget(left_right_split)
 
     def delegate_root_dir_changed(self):
         self.file_struct_area.root_dir_changed()
+        self.search_area.root_dir_changed()
 
     def delegate_current_dir_changed(self):
         self.file_struct_area.current_dir_changed()
 
     def call_advanced_export(self):
         AdvancedExportMenu().exec()
+
+    def show_progress(self, message, done, total):
+        self.status_progress.setMaximum(max(total, 1))
+        self.status_progress.setValue(done)
+        self.status_progress.show()
+        self.statusBar().showMessage(message)
+
+    def clear_progress(self, message=''):
+        self.status_progress.hide()
+        self.statusBar().showMessage(message)
+
+    def watch_export(self, watcher):
+        """
+        Keep the targets of an ExportWatcher current in the background, in place of the watch running before
+        """
+
+        self.stop_watch()
+        worker = self.export_watch = Worker(watcher.run)
+        worker.signals.progress.connect(lambda updates, latency, status: self.watch_label.setText(status))
+        worker.signals.finished.connect(lambda result: self.watch_stopped(worker, ''))
+        worker.signals.failed.connect(lambda message: self.watch_stopped(worker, 'Watch stopped: %s' % message))
+        self.watch_label.setText(watcher.status())
+        self.watch_label.show()
+        self.stop_watch_button.show()
+        worker.start(dedicated=True)
+
+    def stop_watch(self):
+        if self.export_watch is not None:
+            self.export_watch.cancel()
+
+    def watch_stopped(self, worker, message):
+        if worker is not self.export_watch:
+            return
+
+        self.export_watch = None
+        self.watch_label.hide()
+        self.stop_watch_button.hide()
+        if message:
+            self.statusBar().showMessage(message)
+
+    def closeEvent(self, event):
+        # The watch has a thread of its own, let it finish the update it may be writing
+        watch = self.export_watch
+        self.stop_watch()
+        if watch is not None:
+            watch.wait()
+        super().closeEvent(event)
+
+    def file_operation_started(self, job):
+        self.cancel_operations_button.show()
+        self.show_progress(job.description, 0, len(job.items))
+
+    def file_operation_progress(self, job, done, total, bytes_copied):
+        message = '%s: %d of %d files' % (job.description, done, total)
+        if bytes_copied:
+            message += ', %.1f MB copied' % (bytes_copied / (1024 * 1024))
+        self.show_progress(message, done, total)
+
+    def file_operation_finished(self, job):
+        # Views are updated once per job rather than per file
+        if job.kind == MOVE:
+            self.preview_area.paths_moved(job.completed)
+        elif job.kind == DELETE:
+            self.preview_area.paths_removed([source for source, destination in job.completed])
+        elif job.kind == TAG_EDIT:
+            self.preview_area.paths_rewritten([path for path, _ in job.completed])
+        self.file_struct_area.paths_changed(
+            {os.path.dirname(path) for item in job.completed for path in item if path is not None})
+
+        if not self.file_operations.is_busy():
+            self.cancel_operations_button.hide()
+            self.clear_progress(job.summary())
+        if job.errors:
+            QMessageBox.warning(self, 'File Operation Error', '%s\n\n%s' % (
+                job.summary(), '\n'.join('%s: %s' % error for error in job.errors[:20])))
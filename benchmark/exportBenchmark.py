@@ -0,0 +1,207 @@
+"""
+Export benchmark, times exportUtility on synthetic project trees and writes the results as JSON
+
+    python -m benchmark.exportBenchmark [--shape wide --shape deep ...] [--output results.json]
+    python -m benchmark.exportBenchmark --compare old.json new.json
+
+Each shape is generated into a temporary directory and measured in its own process, so peak RSS is per shape.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_module
+import subprocess
+import sys
+import tempfile
+import time
+from benchmark.projectGenerator import SHAPES, generate_project
+from AppFile.Utility import exportUtility, tagFilter
+from AppFile.Utility.contextConfig import INI_NAME, context_config
+from AppFile.Utility.metadataCache import metadata_cache
+
+
+def _peak_rss_kb() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _clear_caches() -> None:
+    metadata_cache.clear()
+    context_config.clear()
+
+
+def _time_export(source_dir: str, target_file: str, counts: dict, **kwargs) -> dict:
+    # Measure the export itself, not the skip of an export whose inputs did not change
+    kwargs.setdefault("force", True)
+    exporter = exportUtility.Exporter(source_dir, target_file, **kwargs)
+    start = time.perf_counter()
+    exporter.export()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "seconds": elapsed,
+        "files_per_s": counts["files"] / elapsed,
+        "mb_per_s": exporter.bytes_written / elapsed / (1024 * 1024),
+        "bytes_written": exporter.bytes_written,
+        "phase_seconds": exporter.stats.phase_seconds,
+    }
+
+
+def _time_calls(function, arguments: list, repeat: int = 1) -> dict:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for argument in arguments:
+            function(argument)
+    elapsed = time.perf_counter() - start
+    calls = len(arguments) * repeat
+
+    return {"seconds": elapsed, "calls": calls, "calls_per_s": calls / elapsed if elapsed else None}
+
+
+def measure_shape(shape_name: str, work_dir: str) -> dict:
+    shape = SHAPES[shape_name]
+    source_dir = os.path.join(work_dir, "project")
+    target_file = os.path.join(work_dir, "export.txt")
+
+    counts = generate_project(source_dir, shape)
+
+    file_paths = []
+    context_dirs = []
+    for directory, dir_names, file_names in os.walk(source_dir):
+        file_paths.extend(os.path.join(directory, name) for name in file_names if name.endswith(".txt"))
+        if INI_NAME in file_names:
+            context_dirs.append(directory)
+
+    tags = shape.tags()
+    tag_filters = [["%s:file" % tags[0], "%s:all:not" % tags[-1]],
+                   ["%s:%s" % (tag, ("file", "dir", "all")[i % 3]) for i, tag in enumerate(tags)]]
+
+    metrics = {}
+
+    _clear_caches()
+    metrics["export_cold"] = _time_export(source_dir, target_file, counts)
+    metrics["export_warm"] = _time_export(source_dir, target_file, counts)
+    metrics["export_unchanged"] = _time_export(source_dir, target_file, counts, force=False)
+    metrics["export_filtered"] = _time_export(source_dir, target_file, counts, tag_filter=tag_filters[0])
+    _clear_caches()
+    metrics["export_parallel_cold"] = _time_export(source_dir, target_file, counts, workers=4)
+    # The three exports above from a single walk
+    metrics["export_multi_target"] = _time_export(source_dir, None, counts, targets=[
+        (os.path.join(work_dir, "export_%d.txt" % i), tag_filter, False)
+        for i, tag_filter in enumerate([None] + tag_filters)])
+
+    _clear_caches()
+    metrics["get_file_tags_cold"] = _time_calls(exportUtility.get_file_tags, file_paths)
+    metrics["get_file_tags_warm"] = _time_calls(exportUtility.get_file_tags, file_paths)
+    _clear_caches()
+    metrics["get_priority_cold"] = _time_calls(exportUtility.get_priority, context_dirs)
+    metrics["get_priority_warm"] = _time_calls(exportUtility.get_priority, context_dirs)
+    metrics["parse_tag_filter"] = _time_calls(tagFilter.parse_tag_filter, tag_filters, repeat=200)
+    metrics["compile_filter"] = _time_calls(tagFilter.compile_filter, tag_filters + [
+        "(%s OR %s:file) AND NOT %s AND NOT path:**/file_00?.txt" % (tags[0], tags[1], tags[-1])], repeat=200)
+
+    return {"shape": shape.to_dict(), "tree": counts, "metrics": metrics, "peak_rss_kb": _peak_rss_kb()}
+
+
+def _measure_in_child(shape_name: str, queue: multiprocessing.Queue) -> None:
+    with tempfile.TemporaryDirectory(prefix="creatiview_bench_") as work_dir:
+        queue.put(measure_shape(shape_name, work_dir))
+
+
+def run_shape(shape_name: str) -> dict:
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure_in_child, args=(shape_name, queue))
+    process.start()
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except queue_module.Empty:
+            # The child's traceback is on stderr already
+            if not process.is_alive():
+                raise RuntimeError("Measuring shape %s failed with exit code %s" % (shape_name, process.exitcode))
+    process.join()
+    return result
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(shape_names: list[str]) -> dict:
+    results = []
+    for shape_name in shape_names:
+        result = run_shape(shape_name)
+        export = result["metrics"]["export_cold"]
+        print("%-18s %7d files  %8.1f files/s  %7.1f MB/s  peak %s KB" % (
+            shape_name, result["tree"]["files"], export["files_per_s"], export["mb_per_s"], result["peak_rss_kb"]),
+            file=sys.stderr)
+        results.append(result)
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """
+    Print the old/new time ratio of every metric, > 1 means the new run is faster
+    """
+
+    with open(old_path) as f:
+        old = {result["shape"]["name"]: result for result in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {result["shape"]["name"]: result for result in json.load(f)["results"]}
+
+    for shape_name in sorted(old.keys() & new.keys()):
+        print(shape_name)
+        for metric_name, new_metric in new[shape_name]["metrics"].items():
+            old_metric = old[shape_name]["metrics"].get(metric_name)
+            if not old_metric or not old_metric.get("seconds") or not new_metric.get("seconds"):
+                continue
+
+            speedup = old_metric["seconds"] / new_metric["seconds"]
+            print("    %-22s %6.2fx" % (metric_name, speedup))
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmark.exportBenchmark", description=__doc__.split("\n")[1])
+    parser.add_argument("-s", "--shape", action="append", choices=sorted(SHAPES), help="shape to run, repeatable")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    report = run(args.shape or list(SHAPES))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import configparser
+import os
+import random
+from AppFile.Utility.contextConfig import BRANCH_TAGS, INI_NAME, CONFIG_HEADER, CONFIG_PRIORITY_NAME
+from AppFile.Utility.metadataCache import FILE_TAGS, FILE_NOTES, META_START_SIGNAL, META_END_SIGNAL
+
+WORDS = ["river", "lantern", "copper", "meadow", "signal", "harbor", "ember", "quiet", "orbit", "thistle",
+         "marble", "echo", "willow", "cinder", "atlas", "velvet"]
+
+
+class ProjectShape:
+    """
+    Parameters of a synthetic CreatiView project tree
+    """
+
+    def __init__(self, name: str, depth: int = 3, fan_out: int = 4, files_per_dir: int = 10,
+                 mean_file_size: int = 4 * 1024, file_size_sigma: float = 1.0, metadata_fraction: float = 0.5,
+                 tag_vocabulary: int = 20, tags_per_item: int = 2, context_density: float = 0.8, seed: int = 0):
+        """
+        :param name: Name of the shape in benchmark results
+        :param depth: Levels of folders below the root
+        :param fan_out: Child folders per folder
+        :param files_per_dir: .txt files per folder
+        :param mean_file_size: Median body size in bytes, sizes follow a log-normal distribution around it
+        :param file_size_sigma: Sigma of the log-normal file size distribution
+        :param metadata_fraction: Fraction of files starting with a #METADATA_START header
+        :param tag_vocabulary: Number of distinct tags used in headers and .context.ini files
+        :param tags_per_item: Maximum number of tags on one file or folder
+        :param context_density: Fraction of folders that are context folders
+        :param seed: Random seed, the same shape always generates the same tree
+        """
+
+        self.name = name
+        self.depth = depth
+        self.fan_out = fan_out
+        self.files_per_dir = files_per_dir
+        self.mean_file_size = mean_file_size
+        self.file_size_sigma = file_size_sigma
+        self.metadata_fraction = metadata_fraction
+        self.tag_vocabulary = tag_vocabulary
+        self.tags_per_item = tags_per_item
+        self.context_density = context_density
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+    def tags(self) -> list[str]:
+        return ["tag%d" % i for i in range(self.tag_vocabulary)]
+
+
+# Shapes run by default, from a quick smoke test to trees shaped like large real projects
+SHAPES = {
+    "small": ProjectShape("small", depth=2, fan_out=3, files_per_dir=5),
+    "wide": ProjectShape("wide", depth=2, fan_out=30, files_per_dir=20, mean_file_size=2 * 1024),
+    "deep": ProjectShape("deep", depth=8, fan_out=2, files_per_dir=5),
+    "many_small_files": ProjectShape("many_small_files", depth=3, fan_out=8, files_per_dir=40, mean_file_size=512),
+    "large_files": ProjectShape("large_files", depth=2, fan_out=3, files_per_dir=4, mean_file_size=2 * 1024 * 1024,
+                                file_size_sigma=0.5),
+    "tag_heavy": ProjectShape("tag_heavy", depth=3, fan_out=5, files_per_dir=15, metadata_fraction=1.0,
+                              tag_vocabulary=500, tags_per_item=8),
+}
+
+
+def _body(rnd: random.Random, size: int) -> str:
+    lines = []
+    length = 0
+    while length < size:
+        line = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(4, 14))) + "\n"
+        lines.append(line)
+        length += len(line)
+
+    return "".join(lines)
+
+
+def _header(rnd: random.Random, tags: list[str]) -> str:
+    return "%s------------------------------------------------------------------ \n %s: %s\n\n %s: %s \n " \
+           "------------------------------------------------------------------%s\n" % (
+               META_START_SIGNAL, FILE_TAGS, ", ".join(tags), FILE_NOTES, rnd.choice(WORDS), META_END_SIGNAL)
+
+
+def generate_project(root_dir: str, shape: ProjectShape) -> dict:
+    """
+    Write a project tree of the given shape into root_dir
+
+    :return: Counts of the generated tree: files, dirs, context_dirs and bytes
+    """
+
+    rnd = random.Random(shape.seed)
+    vocabulary = shape.tags()
+    counts = {"files": 0, "dirs": 0, "context_dirs": 0, "bytes": 0}
+
+    def sample_tags() -> list[str]:
+        return rnd.sample(vocabulary, rnd.randint(1, min(shape.tags_per_item, len(vocabulary))))
+
+    def generate_dir(directory: str, level: int) -> None:
+        os.makedirs(directory, exist_ok=True)
+        counts["dirs"] += 1
+
+        for i in range(shape.files_per_dir):
+            size = int(rnd.lognormvariate(0, shape.file_size_sigma) * shape.mean_file_size)
+            content = _body(rnd, size)
+            if rnd.random() < shape.metadata_fraction:
+                content = _header(rnd, sample_tags()) + content
+
+            data = content.encode()
+            with open(os.path.join(directory, "file_%03d.txt" % i), "wb") as f:
+                f.write(data)
+            counts["files"] += 1
+            counts["bytes"] += len(data)
+
+        if level >= shape.depth:
+            return
+
+        for i in range(shape.fan_out):
+            child_dir = os.path.join(directory, "folder_%03d" % i)
+            os.makedirs(child_dir, exist_ok=True)
+
+            if rnd.random() < shape.context_density:
+                config = configparser.ConfigParser()
+                config[CONFIG_HEADER] = {
+                    CONFIG_PRIORITY_NAME: str(rnd.randint(0, 9)),
+                    BRANCH_TAGS: ", ".join(sample_tags()),
+                }
+                with open(os.path.join(child_dir, INI_NAME), "w") as f:
+                    config.write(f)
+                counts["context_dirs"] += 1
+
+            generate_dir(child_dir, level + 1)
+
+    generate_dir(root_dir, 0)
+    return counts
@@ -0,0 +1,21 @@
+import os
+import pytest
+from AppFile.Utility.contextConfig import write_context_ini
+
+
+@pytest.fixture
+def make_tree():
+    """
+    :return: A function that writes folders of tagged files under root, with a context config per folder
+    """
+
+    def make(root, folders, files_per_folder):
+        for folder in range(folders):
+            directory = os.path.join(root, "folder_%03d" % folder)
+            os.makedirs(directory)
+            write_context_ini(directory, folder, ("tag_%d" % (folder % 3),))
+            for number in range(files_per_folder):
+                with open(os.path.join(directory, "file_%d.txt" % number), "w") as f:
+                    f.write("#METADATA_START\n %%Tag: t%d\n#METADATA_END\nbody %d\n" % (number, number))
+
+    return make
@@ -0,0 +1,53 @@
+import os
+from AppFile.Utility.contextConfig import INI_NAME, CONFIG_HEADER, context_config, edit_context_tags, \
+    parse_context_ini, write_context_ini
+
+
+def write_ini(directory, text):
+    with open(os.path.join(directory, INI_NAME), "w") as f:
+        f.write(text)
+
+
+def test_written_ini_round_trips(tmp_path):
+    write_context_ini(str(tmp_path), 3, ("red", "blue"))
+
+    assert parse_context_ini(str(tmp_path / INI_NAME)) == (3, frozenset({"red", "blue"}))
+    assert os.listdir(tmp_path) == [INI_NAME]
+
+
+def test_non_integer_priority_reads_as_default(tmp_path):
+    write_ini(tmp_path, "[%s]\npriority = high\ntags = red\n" % CONFIG_HEADER)
+
+    assert parse_context_ini(str(tmp_path / INI_NAME)) == (0, frozenset({"red"}))
+    assert context_config.get(str(tmp_path)).priority == 0
+
+
+def test_missing_priority_reads_as_default(tmp_path):
+    write_ini(tmp_path, "[%s]\ntags = red\n" % CONFIG_HEADER)
+
+    assert parse_context_ini(str(tmp_path / INI_NAME)) == (0, frozenset({"red"}))
+
+
+def test_editing_tags_keeps_the_rest_of_the_ini(tmp_path):
+    text = ("; written by hand\r\n[%s]\r\n# the order of this folder\r\npriority : 2\r\nTags = red,\r\n  blue\r\n"
+            "\r\n[other]\r\ntags = kept\r\n" % CONFIG_HEADER)
+    write_ini(tmp_path, text)
+
+    assert edit_context_tags(str(tmp_path), lambda tags: tags + ("green",))
+    with open(tmp_path / INI_NAME, newline="") as f:
+        assert f.read() == text.replace("Tags = red,\r\n  blue\r\n", "tags = red,blue,green\r\n")
+    assert parse_context_ini(str(tmp_path / INI_NAME)) == (2, frozenset({"red", "blue", "green"}))
+    assert os.listdir(tmp_path) == [INI_NAME]
+
+
+def test_editing_tags_adds_a_missing_option(tmp_path):
+    write_ini(tmp_path, "[%s]\npriority = 1 ; comment\n\n# trailing comment" % CONFIG_HEADER)
+
+    assert edit_context_tags(str(tmp_path), lambda tags: ("red",))
+    with open(tmp_path / INI_NAME) as f:
+        assert f.read() == "[%s]\npriority = 1 ; comment\ntags = red\n\n# trailing comment\n" % CONFIG_HEADER
+    assert not edit_context_tags(str(tmp_path), lambda tags: None)
+
+    write_ini(tmp_path, "[other]\nkey = value")
+    assert edit_context_tags(str(tmp_path), lambda tags: ("red",))
+    assert parse_context_ini(str(tmp_path / INI_NAME)) == (0, frozenset({"red"}))
@@ -0,0 +1,79 @@
+import json
+import pytest
+from AppFile import export
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / "project"
+    source.mkdir()
+    (source / "a.txt").write_text("a body")
+    return source
+
+
+def run_batch(tmp_path, jobs):
+    batch = tmp_path / "jobs.json"
+    batch.write_text(json.dumps(jobs))
+    return export.main(["--batch", str(batch)])
+
+
+def test_bad_jobs_are_reported_and_the_others_run(tmp_path, source, capsys):
+    good = tmp_path / "good.txt"
+    status = run_batch(tmp_path, [{"source": str(source)}, "not a job",
+                                  {"source": str(tmp_path / "missing"), "target": str(tmp_path / "x.txt")},
+                                  {"source": str(source), "target": str(good)}])
+
+    assert status == 1
+    assert good.read_text() == "a body\n"
+    err = capsys.readouterr().err
+    assert 'failed job 1: no "target" given' in err
+    assert "failed job 2: a job must be a JSON object" in err
+    assert "failed %s: source is not a directory" % (tmp_path / "x.txt") in err
+
+
+def test_unreadable_batch(tmp_path, capsys):
+    batch = tmp_path / "jobs.json"
+    batch.write_text("[{")
+
+    assert export.main(["--batch", str(batch)]) == 1
+    assert "failed to read" in capsys.readouterr().err
+
+
+def test_bad_target_fails_only_its_own_job(tmp_path, source, capsys):
+    first = tmp_path / "first.txt"
+    second = tmp_path / "second.txt"
+    status = run_batch(tmp_path, [{"source": str(source), "target": str(first)},
+                                  {"source": str(source), "target": str(tmp_path / "missing" / "x.txt")},
+                                  {"source": str(source), "target": str(tmp_path)},
+                                  {"source": str(source), "target": str(tmp_path / "bad.txt"), "filter": "(a"},
+                                  {"source": str(source), "target": str(second), "filter": "a"}])
+
+    assert status == 1
+    assert first.read_text() == "a body\n"
+    assert second.read_text() == ""
+    err = capsys.readouterr().err
+    assert "failed %s: target directory does not exist" % (tmp_path / "missing" / "x.txt") in err
+    assert "failed %s: target is a directory" % tmp_path in err
+    assert "failed %s" % (tmp_path / "bad.txt") in err
+    assert str(first) not in err and str(second) not in err
+
+
+@pytest.mark.parametrize("option, value, message", [
+    ("workers", "4", '"workers" must be a whole number of 0 or more'),
+    ("workers", -1, '"workers" must be a whole number of 0 or more'),
+    ("workers", True, '"workers" must be a whole number of 0 or more'),
+    ("incremental", "yes", '"incremental" must be true or false'),
+    ("force", 1, '"force" must be true or false'),
+    ("include_meta", None, '"include_meta" must be true or false'),
+    ("filter", 3, '"filter" must be a string or a list of tags'),
+])
+def test_badly_typed_option_fails_only_its_job(tmp_path, source, capsys, option, value, message):
+    bad = tmp_path / "bad.txt"
+    good = tmp_path / "good.txt"
+    status = run_batch(tmp_path, [{"source": str(source), "target": str(bad), option: value},
+                                  {"source": str(source), "target": str(good)}])
+
+    assert status == 1
+    assert good.read_text() == "a body\n"
+    assert not bad.exists()
+    assert "failed %s: %s" % (bad, message) in capsys.readouterr().err
@@ -0,0 +1,202 @@
+import os
+import shutil
+import pytest
+from AppFile.Utility.contextConfig import write_context_ini
+from AppFile.Utility import exportUtility
+from AppFile.Utility.exportUtility import Exporter, normalize_newlines
+from AppFile.Utility.metadataCache import META_HEADER_TEMPLATE, parse_header
+from AppFile.Utility.tagIndex import TagIndex
+
+
+def write_text(path, body, tags=None):
+    with open(path, "w", newline="") as f:
+        if tags is not None:
+            f.write(META_HEADER_TEMPLATE.format(", ".join(tags)))
+        f.write(body)
+
+
+def export(source_dir, target_file, use_index=False, **kwargs):
+    tag_index = TagIndex(source_dir) if use_index else None
+    try:
+        Exporter(source_dir, str(target_file), tag_index=tag_index, **kwargs).export()
+    finally:
+        if tag_index is not None:
+            tag_index.close()
+
+    with open(target_file, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def project(tmp_path):
+    source = tmp_path / "project"
+    source.mkdir()
+    write_text(source / "root.txt", "root body", ["red"])
+    for name, priority in (("second", 2), ("first", 1), ("skipped", -1)):
+        os.mkdir(source / name)
+        write_context_ini(str(source / name), priority, ("blue",))
+        write_text(source / name / "note.txt", "%s body" % name, ["green"])
+    os.mkdir(source / "plain")
+    write_text(source / "plain" / "note.txt", "plain body")
+    return source
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_priority_minus_one_folder_is_not_exported(project, tmp_path, use_index):
+    # What the original os.listdir walk wrote: plain folders and folders of priority -1 are left out
+    expected = b"root body\nfirst body\nsecond body\n"
+
+    assert export(str(project), tmp_path / "out.txt", use_index) == expected
+
+
+def test_filesystem_and_index_walks_agree(project, tmp_path):
+    for tag_filter in (None, "blue:dir", "green:file:not"):
+        assert export(str(project), tmp_path / "disk.txt", tag_filter=tag_filter, force=True) == \
+            export(str(project), tmp_path / "index.txt", True, tag_filter=tag_filter, force=True)
+
+
+def test_header_left_out_only_when_file_starts_with_signal(tmp_path):
+    source = tmp_path / "project"
+    source.mkdir()
+    write_text(source / "a.txt", "a body", ["red"])
+    decorated = "--#METADATA_START--\n %Tag: red\n--#METADATA_END--\nb body"
+    write_text(source / "b.txt", decorated)
+
+    assert export(str(source), tmp_path / "out.txt", tag_filter="red") == ("a body\n%s\n" % decorated).encode()
+
+
+@pytest.mark.parametrize("options", [{}, {"workers": 2}, {"incremental": True}, {"stream": True},
+                                     {"stream": True, "incremental": True}])
+@pytest.mark.parametrize("include_meta", [False, True])
+def test_line_ends_are_normalized(tmp_path, monkeypatch, options, include_meta):
+    options = dict(options)
+    if options.pop("stream", False):
+        # Every body is copied file to file, the normalizing copy reads it in small pieces
+        monkeypatch.setattr(exportUtility, "STREAM_THRESHOLD", 1)
+        monkeypatch.setattr(exportUtility, "DEFAULT_BUFFER_SIZE", 3)
+
+    source = tmp_path / "project"
+    source.mkdir()
+    header = "#METADATA_START\r\n %Tag: red\r\n#METADATA_END\r\n"
+    write_text(source / "a.txt", header + "one\r\ntwo\rthree\r\n\r")
+    write_text(source / "b.txt", "plain\nbody")
+
+    expected = b"one\ntwo\nthree\n\n\nplain\nbody\n"
+    if include_meta:
+        expected = b"#METADATA_START\n %Tag: red\n#METADATA_END\n" + expected
+    assert export(str(source), tmp_path / "out.txt", include_meta=include_meta,
+                  buffer_size=exportUtility.DEFAULT_BUFFER_SIZE, **options) == expected
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """
+    Nested context folders of several priorities and tags, with plain folders, untagged files and CRLF bodies
+    """
+
+    source = tmp_path / "tree"
+    source.mkdir()
+    for top in range(3):
+        top_dir = source / ("part_%d" % top)
+        top_dir.mkdir()
+        write_context_ini(str(top_dir), 3 - top, ("red",) if top % 2 else ("blue",))
+        for sub in range(3):
+            sub_dir = top_dir / ("chapter_%d" % sub)
+            sub_dir.mkdir()
+            if sub != 2:
+                write_context_ini(str(sub_dir), sub, ("draft",) if sub == 1 else ())
+            for number in range(4):
+                tags = [("red", "blue", "draft")[number % 3]] if number != 3 else None
+                newline = "\r\n" if number == 1 else "\n"
+                body = newline.join("part %d chapter %d file %d line %d" % (top, sub, number, line)
+                                    for line in range(number + 1))
+                write_text(top_dir / sub_dir / ("file_%d.txt" % number), body, tags)
+    write_text(source / "root.txt", "root body", ["red"])
+    return source
+
+
+FILTERS = [None, "red", "blue:dir,draft:file:not", "(red OR blue) AND NOT draft"]
+
+
+@pytest.mark.parametrize("tag_filter", FILTERS)
+@pytest.mark.parametrize("include_meta", [False, True])
+def test_every_export_path_matches_the_sequential_export(tree, tmp_path, monkeypatch, tag_filter, include_meta):
+    expected = export(str(tree), tmp_path / "sequential.txt", tag_filter=tag_filter, include_meta=include_meta)
+    assert expected
+
+    for name, use_index, options in (("parallel", False, {"workers": 3}),
+                                     ("index", True, {}),
+                                     ("parallel_index", True, {"workers": 2})):
+        assert export(str(tree), tmp_path / ("%s.txt" % name), use_index, tag_filter=tag_filter,
+                      include_meta=include_meta, **options) == expected, name
+
+    # The second incremental export is assembled from the chunks of the first
+    for run in range(2):
+        assert export(str(tree), tmp_path / "incremental.txt", tag_filter=tag_filter, include_meta=include_meta,
+                      incremental=True, force=True) == expected, run
+
+    monkeypatch.setattr(exportUtility, "STREAM_THRESHOLD", 1)
+    assert export(str(tree), tmp_path / "stream.txt", tag_filter=tag_filter, include_meta=include_meta) == expected
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_incremental_export_follows_changes(tree, tmp_path, use_index):
+    target = tmp_path / "incremental.txt"
+    export(str(tree), target, use_index, incremental=True)
+
+    write_text(tree / "part_0" / "chapter_1" / "file_0.txt", "changed body", ["blue"])
+    os.remove(tree / "part_1" / "chapter_0" / "file_2.txt")
+    shutil.rmtree(tree / "part_2" / "chapter_2")
+    os.mkdir(tree / "part_2" / "new")
+    write_context_ini(str(tree / "part_2" / "new"), 0, ())
+    write_text(tree / "part_2" / "new" / "added.txt", "added body")
+    write_context_ini(str(tree / "part_1"), 9, ("red",))
+
+    assert export(str(tree), target, use_index, incremental=True) == export(str(tree), tmp_path / "fresh.txt")
+
+
+def test_multi_target_export_matches_single_exports(tree, tmp_path):
+    targets = [(str(tmp_path / ("multi_%d.txt" % number)), tag_filter, number % 2 == 1)
+               for number, tag_filter in enumerate(FILTERS)]
+    exporter = Exporter(str(tree), targets=targets, workers=2)
+    exporter.export()
+
+    for number, (target_file, tag_filter, include_meta) in enumerate(targets):
+        with open(target_file, "rb") as f:
+            assert f.read() == export(str(tree), tmp_path / ("single_%d.txt" % number), tag_filter=tag_filter,
+                                      include_meta=include_meta)
+
+
+def test_unchanged_target_is_not_written_again(tree, tmp_path):
+    target = tmp_path / "out.txt"
+    export(str(tree), target)
+    mtime_ns = os.stat(target).st_mtime_ns
+
+    exporter = Exporter(str(tree), str(target))
+    exporter.export()
+    assert exporter.stats.targets_skipped == 1
+    assert os.stat(target).st_mtime_ns == mtime_ns
+
+    write_text(tree / "root.txt", "new root body", ["red"])
+    exporter = Exporter(str(tree), str(target))
+    exporter.export()
+    assert exporter.stats.targets_skipped == 0
+    assert target.read_bytes().startswith(b"new root body\n")
+
+
+def test_plan_lists_what_the_export_writes(tree, tmp_path):
+    target = tmp_path / "out.txt"
+    listing_cache = {}
+    manifest = Exporter(str(tree), str(target), "red").plan(listing_cache)[0]
+    output = export(str(tree), target, tag_filter="red")
+
+    bodies = [open(path, "rb").read() for path, size in manifest.files]
+    assert [len(body) for body in bodies] == [size + parse_header(body).body_offset for body, (path, size)
+                                              in zip(bodies, manifest.files)]
+    assert b"".join(normalize_newlines(body[parse_header(body).body_offset:]) + b"\n" for body in bodies) == output
+    assert manifest.excluded
+    assert not set(path for path, size in manifest.files) & set(path for path, rule in manifest.excluded)
+
+    # A plan with another filter is made from the cached listings
+    other = Exporter(str(tree), str(target), "blue").plan(listing_cache)[0]
+    assert other.files != manifest.files
@@ -0,0 +1,42 @@
+import threading
+import time
+from AppFile.Utility.exportUtility import Exporter
+from AppFile.Utility.exportWatcher import MAX_ERRORS, ExportWatcher
+
+
+def test_update_errors_do_not_end_the_watch(tmp_path, monkeypatch):
+    source = tmp_path / "project"
+    source.mkdir()
+    (source / "a.txt").write_text("a body")
+    target = tmp_path / "out.txt"
+    exporter = Exporter(str(source), str(target), incremental=True)
+    watcher = ExportWatcher(exporter, debounce=0.01, poll_interval=0.05)
+
+    update = exporter.update
+    failures = []
+
+    def failing_update():
+        if len(failures) <= MAX_ERRORS:
+            failures.append(1)
+            raise ValueError("header changed while read")
+        update()
+
+    monkeypatch.setattr(exporter, "update", failing_update)
+    statuses = []
+    cancel_event = threading.Event()
+    thread = threading.Thread(target=watcher.run, args=(lambda *args: statuses.append(args[2]), cancel_event))
+    thread.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not target.exists() and time.monotonic() < deadline:
+            # Each change is another failing update until the updates succeed again
+            (source / "a.txt").write_text("a body %d" % len(failures))
+            time.sleep(0.02)
+        assert thread.is_alive()
+    finally:
+        cancel_event.set()
+        thread.join()
+
+    assert target.read_text().startswith("a body")
+    assert len(watcher.errors) == MAX_ERRORS
+    assert any("header changed while read" in status for status in statuses)
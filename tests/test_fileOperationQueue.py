@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+import pytest
+from PySide6.QtCore import QCoreApplication, QThread
+from AppFile.Utility import tagIndex
+from AppFile.Utility.fileOperationQueue import DELETE, MOVE, FileOperation, FileOperationQueue
+
+
+@pytest.fixture(scope="module")
+def app():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def wait_for(app, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+
+class RaisingJob:
+    """
+    A job that raises something other than OperationCancelled once it is cancelled
+    """
+
+    kind = DELETE
+    description = "Raising"
+
+    def __init__(self):
+        self.items = []
+        self.completed = []
+        self.errors = []
+        self.cancelled = False
+        self.started = False
+
+    def summary(self):
+        return ""
+
+    def run(self, progress_callback, cancel_event):
+        self.started = True
+        cancel_event.wait(5)
+        raise ValueError("interrupted")
+
+
+def test_cancelled_job_that_raises_still_finishes(app, tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("a")
+    queue = FileOperationQueue()
+    finished = []
+    threads = []
+
+    def job_finished(job):
+        finished.append(job)
+        threads.append(QThread.currentThread())
+
+    queue.job_finished.connect(job_finished)
+
+    raising = RaisingJob()
+    queue.enqueue(raising)
+    assert wait_for(app, lambda: raising.started)
+    queue.worker.cancel()
+    delete = FileOperation(DELETE, [(str(path), None)])
+    queue.enqueue(delete)
+
+    assert wait_for(app, lambda: len(finished) == 2)
+    assert finished == [raising, delete]
+    assert raising.cancelled and raising.errors == []
+    assert not path.exists()
+    assert not queue.is_busy()
+    assert all(thread is app.thread() for thread in threads)
+
+
+def test_failed_job_is_reported(app, tmp_path):
+    queue = FileOperationQueue()
+    finished = []
+    queue.job_finished.connect(finished.append)
+
+    missing = FileOperation(DELETE, [(str(tmp_path / "missing.txt"), None)])
+    queue.enqueue(missing)
+
+    assert wait_for(app, lambda: finished == [missing])
+    assert len(missing.errors) == 1 and missing.completed == []
+
+
+def test_case_only_rename(tmp_path):
+    source = tmp_path / "Note.txt"
+    source.write_text("a")
+    destination = tmp_path / "note.txt"
+    case_insensitive = destination.exists()
+    if not case_insensitive:
+        destination.write_text("b")
+
+    operation = FileOperation(MOVE, [(str(source), str(destination))]).run()
+
+    if case_insensitive:
+        assert operation.errors == [] and os.listdir(tmp_path) == ["note.txt"]
+    else:
+        assert len(operation.errors) == 1 and sorted(os.listdir(tmp_path)) == ["Note.txt", "note.txt"]
+
+
+def test_cancelled_delete_updates_the_index(tmp_path, make_tree):
+    make_tree(tmp_path, 1, 4)
+    folder = tmp_path / "folder_000"
+    index = tagIndex.open_index(str(tmp_path))
+    try:
+        index.sync()
+        cancel_event = threading.Event()
+        operation = FileOperation(DELETE, [(str(folder), None)])
+        operation.run(lambda done, total, size: cancel_event.set(), cancel_event)
+
+        assert operation.cancelled and operation.completed == []
+        files, dirs = index.list_dir(str(folder))
+        remaining = sorted(name for name in os.listdir(folder) if name.endswith(".txt"))
+        assert len(remaining) == 3
+        assert sorted(os.path.basename(path) for path, header, size, mtime_ns in files) == remaining
+    finally:
+        index.close()
+        tagIndex._indexes.current = None
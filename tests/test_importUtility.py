@@ -0,0 +1,93 @@
+import os
+from AppFile.Utility.importUtility import DEFAULT_CONVERT_EXTENSIONS, Importer
+
+
+def import_tree(source, target, **kwargs):
+    importer = Importer(str(source), str(target), DEFAULT_CONVERT_EXTENSIONS, **kwargs)
+    return importer.run()
+
+
+def test_converted_file_does_not_replace_another_target(tmp_path):
+    source = tmp_path / "notes"
+    source.mkdir()
+    (source / "a.txt").write_text("a text")
+    (source / "a.md").write_text("a markdown")
+    (source / "b.rst").write_text("b rst")
+    (source / "b.md").write_text("b markdown")
+    (source / "c.md").write_text("c markdown")
+    (source / "c.txt").mkdir()
+    target = tmp_path / "project"
+    target.mkdir()
+
+    importer = import_tree(source, target, workers=4)
+
+    imported = target / "notes"
+    assert (imported / "a.txt").read_text() == "a text"
+    assert (imported / "b.txt").read_text() == "b markdown"
+    assert (imported / "c.txt").is_dir()
+    assert sorted(os.path.basename(path) for path, message in importer.errors) == ["a.md", "b.rst", "c.md"]
+    assert importer.files_copied == 2
+    assert sorted(os.listdir(imported)) == ["a.txt", "b.txt", "c.txt"]
+
+
+def test_completed_names_only_the_imported_tree(tmp_path):
+    source = tmp_path / "notes"
+    (source / "sub").mkdir(parents=True)
+    (source / "sub" / "a.md").write_bytes(b"one\r\ntwo")
+    target = tmp_path / "project"
+    target.mkdir()
+
+    importer = import_tree(source, target)
+
+    assert importer.completed == [(str(target / "notes"), None)]
+    assert importer.errors == []
+    assert (target / "notes" / "sub" / "a.txt").read_bytes() == b"one\ntwo"
+    assert os.listdir(target / "notes" / "sub") == ["a.txt"]
+
+    # Importing again finds every copy up to date
+    again = import_tree(source, target)
+    assert (again.files_copied, again.files_skipped) == (0, 1)
+
+
+def test_changed_file_replaces_its_copy(tmp_path):
+    source = tmp_path / "notes"
+    source.mkdir()
+    (source / "a.txt").write_text("first")
+    (source / "b.txt").write_text("same")
+    target = tmp_path / "project"
+    target.mkdir()
+    import_tree(source, target)
+
+    (source / "a.txt").write_text("second")
+    again = import_tree(source, target)
+
+    assert (again.files_copied, again.files_skipped) == (1, 1)
+    assert (target / "notes" / "a.txt").read_text() == "second"
+    assert again.bytes_copied == len("second")
+
+
+def test_conversion_streams_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr("AppFile.Utility.importUtility.DEFAULT_BUFFER_SIZE", 16)
+    source = tmp_path / "notes"
+    source.mkdir()
+    lines = ["line %02d é" % number for number in range(20)]
+    (source / "utf8.md").write_bytes(b"\xef\xbb\xbf" + "\r\n".join(lines).encode() + b"\r")
+    # Only the last line is not valid UTF-8, long after the first chunk was read
+    ascii_lines = ["line %02d" % number for number in range(20)]
+    (source / "latin.md").write_bytes("\r\n".join(ascii_lines + ["end é"]).encode("latin-1"))
+    (source / "binary.md").write_bytes(b"text\0")
+    target = tmp_path / "project"
+    target.mkdir()
+
+    importer = import_tree(source, target)
+
+    imported = target / "notes"
+    expected = "\n".join(lines).encode()
+    assert (imported / "utf8.txt").read_bytes() == expected + b"\n"
+    assert (imported / "latin.txt").read_text(encoding="utf-8") == "\n".join(ascii_lines + ["end é"])
+    assert (imported / "binary.md").read_bytes() == b"text\0"
+    assert (importer.files_copied, importer.files_converted) == (3, 2)
+    assert importer.bytes_copied == sum(os.path.getsize(imported / name) for name in os.listdir(imported))
+
+    again = import_tree(source, target)
+    assert (again.files_copied, again.files_skipped) == (0, 3)
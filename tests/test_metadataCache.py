@@ -0,0 +1,40 @@
+from AppFile.Utility.metadataCache import META_HEADER_TEMPLATE, header_end, parse_header
+
+
+def test_template_header():
+    head = (META_HEADER_TEMPLATE.format("red, blue") + "body\n").encode()
+    header = parse_header(head)
+
+    assert header.has_metadata
+    assert header.tags == ("red", "blue")
+    assert head[header.body_offset:] == b"body\n"
+
+
+def test_first_tag_line_counts():
+    head = b"#METADATA_START\n %Tag: red\n %Tag: blue\n#METADATA_END\nbody\n"
+
+    assert parse_header(head).tags == ("red",)
+
+
+def test_decorated_start_signal_has_tags_but_no_body_offset():
+    head = b"--- #METADATA_START ---\n %Tag: red\n--- #METADATA_END ---\nbody\n"
+    header = parse_header(head)
+
+    assert header.has_metadata
+    assert header.tags == ("red",)
+    # Exports keep a header that does not start with the signal itself
+    assert header.body_offset == 0
+    assert header_end(head) == head.index(b"body")
+
+
+def test_header_without_end_signal():
+    assert not parse_header(b"#METADATA_START\n %Tag: red\nbody\n").has_metadata
+    assert parse_header(b"#METADATA_START\n %Tag: red\nbody\n").body_offset == 0
+
+
+def test_no_header():
+    header = parse_header(b"just text\n%Tag: red\n")
+
+    assert not header.has_metadata
+    assert header.tags == ()
+    assert header.body_offset == 0
@@ -0,0 +1,76 @@
+import os
+import pytest
+from AppFile.Utility import searchIndex, tagIndex
+from AppFile.Utility.projectIndex import ProjectIndex, escape_like
+
+
+@pytest.mark.parametrize("module", [tagIndex, searchIndex])
+def test_opening_another_folder_during_a_sync(tmp_path, module, make_tree):
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    make_tree(first, 200, 5)
+    second.mkdir()
+
+    errors = []
+    index = module.open_index(str(first))
+    sync = index.sync
+
+    def recording_sync(*args):
+        try:
+            sync(*args)
+        except Exception as e:
+            errors.append(e)
+
+    index.sync = recording_sync
+    thread = index.sync_in_background()
+    try:
+        # Closes the first index while its sync is still running
+        assert module.open_index(str(second)) is not index
+        assert module.current_index() is not index
+        assert not thread.is_alive()
+        assert errors == []
+        index.update_path(str(first / "folder_000"))
+        index.remove_path(str(first / "folder_001"))
+        index.move_path(str(first / "folder_002"), str(first / "moved"))
+    finally:
+        module.open_index(str(second)).close()
+        module._indexes.current = None
+
+
+@pytest.mark.parametrize("module", [tagIndex, searchIndex])
+def test_index_for_and_notify(tmp_path, module, make_tree):
+    make_tree(tmp_path, 1, 1)
+    index = module.open_index(str(tmp_path))
+    try:
+        index.sync()
+        assert module.index_for(str(tmp_path / "folder_000")) is index
+        assert module.index_for(str(tmp_path.parent)) is None
+        assert index.relative_path(str(tmp_path / "folder_000")) == "folder_000"
+        assert index.absolute_path("") == str(tmp_path)
+
+        path = tmp_path / "folder_000" / "file_0.txt"
+        module.notify_moved(str(path), str(tmp_path / "file_0.txt"))
+        os.rename(path, tmp_path / "file_0.txt")
+        module.notify_changed(str(tmp_path / "file_0.txt"))
+        if module is tagIndex:
+            files, dirs = index.list_dir(str(tmp_path))
+            assert [(path, header.tags) for path, header, size, mtime_ns in files] == \
+                [(str(tmp_path / "file_0.txt"), ("t0",))]
+        else:
+            assert [result.path for result in index.search("body")] == [str(tmp_path / "file_0.txt")]
+    finally:
+        index.close()
+        module._indexes.current = None
+
+
+def test_escape_like():
+    assert escape_like("a_b%c\\") == "a\\_b\\%c\\\\"
+
+
+def test_an_index_must_implement_its_updates(tmp_path):
+    class Incomplete(ProjectIndex):
+        def sync(self, directory=None):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete(str(tmp_path))
@@ -0,0 +1,66 @@
+import os
+import pytest
+from AppFile.Utility.metadataCache import META_HEADER_TEMPLATE
+from AppFile.Utility.searchIndex import SearchIndex, parse_query
+
+
+@pytest.fixture
+def index(tmp_path):
+    (tmp_path / "notes").mkdir()
+    (tmp_path / "a.txt").write_text(META_HEADER_TEMPLATE.format("red") + "the quick fox\nslow turtle\nquick turtle")
+    (tmp_path / "notes" / "b.txt").write_text("a quick brown fox\n\nthe end")
+    (tmp_path / "other.md").write_text("quick")
+    index = SearchIndex(str(tmp_path))
+    index.sync()
+    yield index
+    index.close()
+
+
+def found(results):
+    return [(os.path.basename(result.path), result.line_number, result.text) for result in results]
+
+
+def test_parse_query():
+    assert parse_query('quick "brown fox" tag:red tag:') == ('"quick" AND "brown fox"', ["red"])
+    assert parse_query('say "hi') == ('"say" AND "hi"', [])
+    assert parse_query("tag:red") == ("", ["red"])
+
+
+def test_words_match_within_a_line(index):
+    # Line numbers count the five header lines of a.txt
+    assert found(index.search("quick")) == [("a.txt", 6, "the quick fox"), ("a.txt", 8, "quick turtle"),
+                                            ("b.txt", 1, "a quick brown fox")]
+    assert found(index.search("quick turtle")) == [("a.txt", 8, "quick turtle")]
+    assert found(index.search('"brown fox"')) == [("b.txt", 1, "a quick brown fox")]
+    assert found(index.search('"fox brown"')) == []
+    assert found(index.search("quick", limit=1)) == [("a.txt", 6, "the quick fox")]
+    assert index.search("") == []
+
+
+def test_tags_restrict_results(index):
+    assert found(index.search("fox tag:red")) == [("a.txt", 6, "the quick fox")]
+    assert found(index.search("tag:red")) == [("a.txt", 1, "")]
+    assert index.search("tag:blue") == []
+
+
+def test_changes_are_followed(index, tmp_path):
+    (tmp_path / "a.txt").write_text("nothing here")
+    index.update_path(str(tmp_path / "a.txt"))
+    assert found(index.search("quick")) == [("b.txt", 1, "a quick brown fox")]
+
+    os.rename(tmp_path / "notes", tmp_path / "moved")
+    index.move_path(str(tmp_path / "notes"), str(tmp_path / "moved"))
+    assert [result.path for result in index.search("brown")] == [str(tmp_path / "moved" / "b.txt")]
+
+    os.remove(tmp_path / "moved" / "b.txt")
+    index.sync()
+    assert index.search("quick") == []
+
+
+def test_large_file_is_indexed_up_to_the_limit(index, tmp_path, monkeypatch):
+    monkeypatch.setattr("AppFile.Utility.searchIndex.MAX_INDEXED_SIZE", 40)
+    (tmp_path / "big.txt").write_text("first needle\n" + "filler line\n" * 10 + "last needle\n")
+    index.update_path(str(tmp_path / "big.txt"))
+
+    assert found(index.search("needle")) == [("big.txt", 1, "first needle")]
+    assert found(index.search("filler")) == [("big.txt", 2, "filler line"), ("big.txt", 3, "filler line")]
@@ -0,0 +1,32 @@
+import os
+from AppFile.Utility.contextConfig import INI_NAME, parse_context_ini, write_context_ini
+from AppFile.Utility.metadataCache import META_HEADER_TEMPLATE
+from AppFile.Utility.tagEditUtility import ADD, RENAME, TagEditor
+
+
+def test_stale_temp_file_does_not_block_an_edit(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text(META_HEADER_TEMPLATE.format("red") + "body")
+    # Left behind by an edit that crashed
+    (tmp_path / "a.txt.tag-tmp").write_text("stale")
+
+    editor = TagEditor([str(tmp_path)], RENAME, "red", "blue").run()
+
+    assert editor.errors == []
+    assert editor.files_edited == 1
+    assert path.read_text() == META_HEADER_TEMPLATE.format("blue") + "body"
+    assert sorted(os.listdir(tmp_path)) == ["a.txt", "a.txt.tag-tmp"]
+
+
+def test_files_and_folders_get_the_tag(tmp_path):
+    folder = tmp_path / "chapter"
+    folder.mkdir()
+    write_context_ini(str(folder), 1, ("draft",))
+    (folder / "b.txt").write_text("no header")
+
+    editor = TagEditor([str(tmp_path)], ADD, "green", add_headers=True, workers=2).run()
+
+    assert editor.errors == []
+    assert (folder / "b.txt").read_text() == META_HEADER_TEMPLATE.format("green") + "no header"
+    assert parse_context_ini(str(folder / INI_NAME)) == (1, frozenset({"draft", "green"}))
+    assert sorted(os.listdir(folder)) == [INI_NAME, "b.txt"]
@@ -0,0 +1,61 @@
+import pytest
+from AppFile.Utility.tagFilter import FilterSyntaxError, TagFilter, compile_filter, is_expression
+
+
+@pytest.mark.parametrize("text", ["", "draft", "draft(old)", "draft(old):file:not", "red, blue:dir",
+                                  "(a OR b), c", "red,NOT", "AND", "path:dir", "ext:file:not", "rock(s) and roll"])
+def test_list_filters(text):
+    assert not is_expression(text)
+    TagFilter(text)
+
+
+@pytest.mark.parametrize("text", ["NOT draft", "a OR b", "(a OR b) AND NOT c", "NOT(draft)", "path:notes/**",
+                                  "ext:txt", "chapter:dir AND NOT path:drafts/**"])
+def test_expression_filters(text):
+    assert is_expression(text)
+    TagFilter(text)
+
+
+def test_tag_with_parentheses_is_a_list_item():
+    tag_filter = TagFilter("draft(old)")
+
+    assert tag_filter.accepts({"draft(old)"}, "file")
+    assert not tag_filter.accepts({"draft"}, "file")
+    assert TagFilter("draft(old):file:not").exclusion_rule({"draft(old)"}, "file") == "draft(old):file:not"
+
+
+def test_list_item_named_like_an_atom():
+    # The tag "path" on folders, as the list syntax has always read it
+    tag_filter = TagFilter("path:dir")
+
+    assert tag_filter.accepts({"path"}, "dir")
+    assert not tag_filter.accepts(set(), "dir")
+    assert tag_filter.accepts(set(), "file")
+
+
+def test_malformed_expression():
+    with pytest.raises(FilterSyntaxError):
+        TagFilter("(a OR b")
+
+
+@pytest.mark.parametrize("first, second", [
+    ("a OR b", "(b OR a)"),
+    ("a AND NOT c", "NOT c AND a"),
+    ("a AND a", "(a) AND (a OR a)"),
+    ("x:file:not, y", "y,x:file:not"),
+    ("y, y, x", " x ,y"),
+    ("", " , "),
+])
+def test_equivalent_filters_share_a_key(first, second):
+    assert compile_filter(first).key == compile_filter(second).key
+
+
+@pytest.mark.parametrize("first, second", [
+    ("a:file", "a:dir"),
+    ("a OR b", "a AND b"),
+    ("x:file:not", "x:dir:not"),
+    ("path:a/**", "path:b/**"),
+    ("a", "NOT a"),
+])
+def test_different_filters_have_different_keys(first, second):
+    assert compile_filter(first).key != compile_filter(second).key
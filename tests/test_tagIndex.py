@@ -0,0 +1,17 @@
+import os
+from AppFile.Utility import tagIndex
+
+
+def test_sync_indexes_the_tree(tmp_path, make_tree):
+    make_tree(tmp_path, 3, 2)
+    index = tagIndex.TagIndex(str(tmp_path))
+    try:
+        index.sync()
+        files, dirs = index.list_dir(str(tmp_path))
+        assert [os.path.basename(path) for path, record in dirs] == ["folder_000", "folder_001", "folder_002"]
+        assert [record.tags for path, record in dirs] == [{"tag_0"}, {"tag_1"}, {"tag_2"}]
+        files, dirs = index.list_dir(str(tmp_path / "folder_001"))
+        assert [(os.path.basename(path), header.tags) for path, header, size, mtime_ns in files] == \
+            [("file_0.txt", ("t0",)), ("file_1.txt", ("t1",))]
+    finally:
+        index.close()
@@ -0,0 +1,23 @@
+import os
+from PySide6.QtCore import QCoreApplication, QThreadPool
+from AppFile.Utility.workerUtility import Worker
+
+
+def test_dedicated_worker_leaves_the_pool_free():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QCoreApplication.instance() or QCoreApplication([])
+    results = []
+
+    def task(progress, cancel_event):
+        cancel_event.wait(5)
+        return "stopped"
+
+    worker = Worker(task)
+    worker.signals.finished.connect(results.append)
+    worker.start(dedicated=True)
+    assert QThreadPool.globalInstance().activeThreadCount() == 0
+
+    worker.cancel()
+    worker.wait()
+    app.processEvents()
+    assert results == ["stopped"]